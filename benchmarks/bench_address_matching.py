@@ -0,0 +1,109 @@
+# Compares the classification of unclassified deposits/withdrawals by the inverted AddressIndex with the former loops
+# over every account, address and ledger input/output, and the former list based address collection with a set.
+# Usage: python benchmarks/bench_address_matching.py [addresses per wallet] [ledger transactions]
+import json
+import random
+import sys
+import os
+import time
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from backends.firefly.address_index import AddressIndex
+
+wallets = 3
+
+
+def get_address(wallet, number):
+    return "bc1q%02d%012d" % (wallet, number)
+
+
+def get_account_address_mapping(address_count):
+    return {
+        "Wallet " + str(wallet): {
+            "addresses": {get_address(wallet, number) for number in range(address_count)},
+            "account": "wallet " + str(wallet),
+            "code": "BTC",
+        } for wallet in range(wallets)
+    }
+
+
+def get_ledger_transactions(address_count, transaction_count):
+    # most inputs are foreign addresses, one in four transactions touches a known wallet
+    generator = random.Random(42)
+    result = []
+    for number in range(transaction_count):
+        ins = [get_address(99, generator.randrange(10 ** 9)) for _ in range(3)]
+        if number % 4 == 0:
+            ins.append(get_address(generator.randrange(wallets), generator.randrange(address_count)))
+        result.append(ins)
+    return result
+
+
+def find_legacy(account_address_mapping, ledger_addresses, currency_code):
+    for account_name in account_address_mapping:
+        account_mapping = account_address_mapping.get(account_name)
+        if not account_mapping.get("code") == currency_code:
+            continue
+        for firefly_address in account_mapping.get("addresses"):
+            for ledger_address in ledger_addresses:
+                if firefly_address == ledger_address:
+                    return account_mapping
+    return None
+
+
+def collect_list(addresses):
+    result = []
+    for address in addresses:
+        if address not in result:
+            result.append(address)
+    return result
+
+
+def collect_set(addresses):
+    result = set()
+    for address in addresses:
+        result.add(address)
+    return result
+
+
+def timed(function, *args):
+    started = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - started, result
+
+
+def main(address_count, transaction_count):
+    account_address_mapping = get_account_address_mapping(address_count)
+    ledger_transactions = get_ledger_transactions(address_count, transaction_count)
+
+    legacy_seconds, legacy_matches = timed(
+        lambda: [find_legacy(account_address_mapping, ins, "BTC") for ins in ledger_transactions])
+    build_seconds, address_index = timed(AddressIndex, account_address_mapping)
+    index_seconds, index_matches = timed(
+        lambda: [address_index.find(ins, ("BTC", None)) for ins in ledger_transactions])
+    assert [match and match["account"] for match in legacy_matches] == \
+           [match and match["account"] for match in index_matches]
+
+    # every address shows up twice, like change outputs seen in several transactions of a wallet
+    seen_addresses = [get_address(0, number // 2) for number in range(address_count * 2)]
+    list_seconds, _ = timed(collect_list, seen_addresses)
+    set_seconds, _ = timed(collect_set, seen_addresses)
+
+    print(json.dumps({
+        "benchmark": "address_matching",
+        "addresses_per_wallet": address_count,
+        "wallets": wallets,
+        "ledger_transactions": transaction_count,
+        "matches": sum(1 for match in index_matches if match is not None),
+        "legacy_seconds": round(legacy_seconds, 4),
+        "index_build_seconds": round(build_seconds, 4),
+        "index_seconds": round(index_seconds, 4),
+        "speedup": round(legacy_seconds / (build_seconds + index_seconds), 1),
+        "collect_list_seconds": round(list_seconds, 4),
+        "collect_set_seconds": round(set_seconds, 4),
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10000,
+         int(sys.argv[2]) if len(sys.argv) > 2 else 200)
@@ -0,0 +1,105 @@
+# Compares the memory footprint of the slotted record models with the former plain __dict__ records.
+# "slotted_str" stores the raw amount strings in slots and isolates the saving of __slots__ from the cost of Decimal.
+# Usage: python benchmarks/bench_record_memory.py [count of trades]
+import gc
+import json
+import sys
+import os
+import tracemalloc
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from model.transaction import TradeData, TradingPair, TransactionType
+
+
+class LegacyTradingPair(object):
+    def __init__(self, from_coin, to_coin):
+        self.security = from_coin if from_coin != 'OPC' else 'OP'
+        self.currency = to_coin if to_coin != 'OPC' else 'OP'
+
+
+class LegacyTradeData(object):
+    def __init__(self, trading_platform, commission_amount, commission_asset, currency_amount, security_amount, trading_pair, type, trade_id, trade_time):
+        self.trading_platform = trading_platform
+        self.commission_amount = commission_amount
+        self.commission_asset = commission_asset
+        self.currency_amount = currency_amount
+        self.security_amount = security_amount
+        self.trading_pair = trading_pair
+        self.type = type
+        self.id = trade_id
+        self.time = trade_time
+
+
+class SlottedStrTradeData(object):
+    __slots__ = ('trading_platform', 'commission_amount', 'commission_asset', 'currency_amount', 'security_amount',
+                 'trading_pair', 'type', 'id', 'time')
+
+    def __init__(self, trading_platform, commission_amount, commission_asset, currency_amount, security_amount, trading_pair, type, trade_id, trade_time):
+        self.trading_platform = trading_platform
+        self.commission_amount = commission_amount
+        self.commission_asset = commission_asset
+        self.currency_amount = currency_amount
+        self.security_amount = security_amount
+        self.trading_pair = trading_pair
+        self.type = type
+        self.id = trade_id
+        self.time = trade_time
+
+
+def raw_trades(count):
+    # amounts arrive as strings from the exchange APIs
+    for trade_id in range(count):
+        yield (str(trade_id % 1000 / 10000), '%.8f' % (trade_id / 7), '%.8f' % (trade_id / 3), trade_id, 1500000000000 + trade_id * 1000)
+
+
+def measure(create_trades, count):
+    gc.collect()
+    tracemalloc.start()
+    trades = create_trades(count)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del trades
+    return current
+
+
+def create_legacy_trades(count):
+    pairs = [LegacyTradingPair('BTC', 'EUR'), LegacyTradingPair('ETH', 'BTC')]
+    return [
+        LegacyTradeData('Binance', commission, 'BNB', currency_amount, security_amount, pairs[trade_id % 2], TransactionType.BUY, trade_id, trade_time)
+        for commission, currency_amount, security_amount, trade_id, trade_time in raw_trades(count)
+    ]
+
+
+def create_slotted_str_trades(count):
+    pairs = [TradingPair('BTC', 'EUR'), TradingPair('ETH', 'BTC')]
+    return [
+        SlottedStrTradeData('Binance', commission, 'BNB', currency_amount, security_amount, pairs[trade_id % 2], TransactionType.BUY, trade_id, trade_time)
+        for commission, currency_amount, security_amount, trade_id, trade_time in raw_trades(count)
+    ]
+
+
+def create_trades(count):
+    pairs = [TradingPair('BTC', 'EUR'), TradingPair('ETH', 'BTC')]
+    return [
+        TradeData('Binance', commission, 'BNB', currency_amount, security_amount, pairs[trade_id % 2], TransactionType.BUY, trade_id, trade_time)
+        for commission, currency_amount, security_amount, trade_id, trade_time in raw_trades(count)
+    ]
+
+
+def main(count):
+    legacy_bytes = measure(create_legacy_trades, count)
+    slotted_str_bytes = measure(create_slotted_str_trades, count)
+    slotted_bytes = measure(create_trades, count)
+    print(json.dumps({
+        "benchmark": "record_memory",
+        "trades": count,
+        "legacy_bytes_per_trade": legacy_bytes / count,
+        "slotted_str_bytes_per_trade": slotted_str_bytes / count,
+        "slotted_decimal_bytes_per_trade": slotted_bytes / count,
+        "slots_saved_ratio": 1 - slotted_str_bytes / legacy_bytes,
+        "total_saved_ratio": 1 - slotted_bytes / legacy_bytes,
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -0,0 +1,193 @@
+import argparse
+import json
+import math
+import os
+import platform
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../tests')))
+
+from support.fake_firefly import FakeFirefly, FakeFireflyServer
+
+# Times every stage of SyncLogic.interval_processor's trade import separately against the synthetic exchange and the
+# local Firefly III stand-in, e.g.
+#   python benchmarks/bench_sync_pipeline.py --sizes 1000,10000 --output results.json
+#   python benchmarks/bench_sync_pipeline.py --baseline benchmarks/baseline.json --save-baseline
+#   python benchmarks/bench_sync_pipeline.py --baseline benchmarks/baseline.json
+# With --baseline the run fails when a stage got slower than the baseline by more than --tolerance.
+
+stages = ["pairs", "fetch", "collections", "mapping", "write"]
+pair_count = 10
+history_days = 10
+history_end = "2021-06-01"
+access_token = "benchmark"
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Benchmark the stages of the trade import.")
+    parser.add_argument("--sizes", default="1000,10000,100000", help="comma separated numbers of trades")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--baseline", help="baseline JSON to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="store the results as new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slow down per stage, 0.25 = 25%%")
+    parser.add_argument("--min-delta", type=float, default=0.05, help="slow downs below this many seconds are noise")
+    parser.add_argument("--firefly-latency-ms", type=float, default=0.0, help="latency of every Firefly III request")
+    parser.add_argument("--exchange-latency-ms", type=int, default=0, help="latency of every exchange request")
+    return parser.parse_args()
+
+
+def configure_environment(server: FakeFireflyServer, state_dir: str):
+    # config only reads the .env file, the benchmark settings are handed to it in place of that file when it is first
+    # imported; the plugin registry and the state directory read the environment
+    settings = {
+        "FIREFLY_HOST": server.api_url,
+        "FIREFLY_ACCESS_TOKEN": access_token,
+        "FIREFLY_VALIDATE_SSL": "false",
+        "FIREFLY_DEDUP_LEDGER": "false",
+        "SYNC_BEGIN_TIMESTAMP": "2021-01-01",
+        "SYNC_TRADES_INTERVAL": "daily",
+    }
+    os.environ.update({"SYNC_STATE_DIR": state_dir, "SYNTHETIC_ENABLED": "true"})
+    with patch("dotenv.dotenv_values", return_value=settings):
+        import config
+
+
+def seed_accounts(firefly: FakeFirefly, pairs, fund_key: str):
+    codes = []
+    for pair in pairs:
+        for code in (pair.security, pair.currency):
+            if code not in codes:
+                codes.append(code)
+    for code in codes:
+        firefly.add_account("Synthetic " + code, currency_code=code, notes=fund_key)
+    firefly.add_account("Synthetic fees", type="expense", notes=fund_key)
+    firefly.add_account("Synthetic revenue", type="revenue", notes=fund_key)
+
+
+@contextmanager
+def timed(timings: dict, stage: str):
+    started = time.perf_counter()
+    yield
+    timings[stage] = round(time.perf_counter() - started, 4)
+
+
+def run_size(size: int, server: FakeFireflyServer, exchange_latency_ms: int) -> dict:
+    from backends.exchanges.impls.synthetic import SyntheticClient, SyntheticConfig, get_synthetic_pairs
+    from importer.sync_logic import SyncLogic
+
+    server.firefly = FakeFirefly()
+    sync_logic = SyncLogic("Synthetic")
+    firefly = sync_logic.firefly
+    seed_accounts(server.firefly, get_synthetic_pairs(pair_count), firefly.get_acc_fund_key())
+
+    exchange_config = SyntheticConfig()
+    exchange_config.init()
+    exchange_config.pairs = pair_count
+    exchange_config.history_days = history_days
+    exchange_config.trades_per_day = int(math.ceil(size / (pair_count * history_days)))
+    exchange_config.history_end = to_utc_timestamp(history_end)
+    exchange_config.latency_ms = exchange_latency_ms
+    exchange = SyntheticClient(exchange_config)
+    from_timestamp, to_timestamp = exchange_config.get_history_begin(), exchange_config.history_end
+
+    timings = {}
+    with timed(timings, "pairs"):
+        firefly.account_index.invalidate()
+        list_of_trading_pairs = exchange.get_trading_pairs(firefly.get_symbols_and_codes())
+    with timed(timings, "fetch"):
+        trades = exchange.get_trades(from_timestamp, to_timestamp, list_of_trading_pairs)
+    with timed(timings, "collections"):
+        collections = firefly.get_firefly_account_collections_for_pairs(list_of_trading_pairs)
+    with timed(timings, "mapping"):
+        transaction_collections = [sync_logic.map_trade_to_transaction_collection(trade, collections) for trade in trades]
+    with timed(timings, "write"):
+        firefly.writer.reset_stats()
+        for transaction_collection in transaction_collections:
+            firefly.write_new_transaction(transaction_collection)
+        firefly.flush_writes()
+
+    total = sum(timings.values())
+    return {
+        "trades": len(trades),
+        "stages": timings,
+        "total_seconds": round(total, 4),
+        "trades_per_second": round(len(trades) / total, 1) if total > 0 else None,
+        "writer": firefly.writer.get_stats(),
+        "firefly_requests": dict(server.requests),
+    }
+
+
+def to_utc_timestamp(date: str) -> int:
+    return int(datetime.fromisoformat(date).replace(tzinfo=timezone.utc).timestamp() * 1000)
+
+
+def compare_with_baseline(results: dict, baseline: dict, tolerance: float, min_delta: float) -> list:
+    regressions = []
+    baseline_runs = {run["trades"]: run for run in baseline.get("runs", [])}
+    for run in results["runs"]:
+        baseline_run = baseline_runs.get(run["trades"])
+        if baseline_run is None:
+            continue
+        for stage in stages:
+            current, previous = run["stages"].get(stage), baseline_run["stages"].get(stage)
+            if current is None or previous is None:
+                continue
+            if current > previous * (1 + tolerance) and current - previous > min_delta:
+                regressions.append({"trades": run["trades"], "stage": stage, "baseline": previous, "current": current})
+    return regressions
+
+
+def main():
+    arguments = parse_arguments()
+    sizes = [int(size) for size in arguments.sizes.split(",") if size.strip()]
+    if arguments.baseline and not arguments.save_baseline and not os.path.exists(arguments.baseline):
+        print("The baseline " + arguments.baseline + " does not exist, store one with --save-baseline first.",
+              file=sys.stderr)
+        sys.exit(2)
+
+    with FakeFireflyServer(latency_seconds=arguments.firefly_latency_ms / 1000, access_token=access_token) as server, \
+            tempfile.TemporaryDirectory() as state_dir:
+        configure_environment(server, state_dir)
+        from backends.firefly.client_pool import client_pool
+        from backends.firefly.firefly_wrapper import FireflyWrapper
+        FireflyWrapper("Synthetic").connect()
+
+        results = {
+            "benchmark": "sync_pipeline",
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "runs": [],
+        }
+        for size in sizes:
+            server.requests.clear()
+            run = run_size(size, server, arguments.exchange_latency_ms)
+            print(json.dumps({"trades": run["trades"], "stages": run["stages"]}), file=sys.stderr)
+            results["runs"].append(run)
+        client_pool.close()
+
+    exit_code = 0
+    if arguments.baseline and not arguments.save_baseline:
+        with open(arguments.baseline) as baseline_file:
+            regressions = compare_with_baseline(results, json.load(baseline_file), arguments.tolerance, arguments.min_delta)
+        results["regressions"] = regressions
+        exit_code = 1 if regressions else 0
+
+    output = json.dumps(results, indent=2)
+    print(output)
+    if arguments.output:
+        with open(arguments.output, "w") as output_file:
+            output_file.write(output)
+    if arguments.baseline and arguments.save_baseline:
+        with open(arguments.baseline, "w") as baseline_file:
+            baseline_file.write(output)
+    sys.exit(exit_code)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,5 @@
 import abc
-from typing import List
+from typing import Iterator, List
 
 from model.savings import InterestData
 from model.transaction import TradingPair, TradeData
@@ -14,6 +14,10 @@ class ExchangeUnderMaintenanceException(ExchangeException):
     pass
 
 
+class ExchangeRateLimitException(ExchangeException):
+    pass
+
+
 class AbstractCryptoExchangeClient(metaclass=abc.ABCMeta):
     @classmethod
     def __subclasshook__(cls, subclass):
@@ -37,6 +41,18 @@ class AbstractCryptoExchangeClient(metaclass=abc.ABCMeta):
     def get_trades(self, from_timestamp: int, to_timestamp: int, list_of_trading_pairs: List[TradingPair]) -> List[TradeData]:
         raise NotImplementedError
 
+    def iter_trades(self, from_timestamp: int, to_timestamp: int, list_of_trading_pairs: List[TradingPair]) -> Iterator[TradeData]:
+        # exchanges which can page through their trades override this to stream them, see SYNC_STREAMING
+        yield from self.get_trades(from_timestamp, to_timestamp, list_of_trading_pairs)
+
+    def commit_cursors(self):
+        # exchanges which resume their trade history from a cursor persist it here, once all trades were stored
+        pass
+
+    def discard_cursors(self):
+        # called instead of commit_cursors when some trades could not be stored
+        pass
+
     @abc.abstractmethod
     def get_savings_interests(self, from_timestamp: int, to_timestamp: int, list_of_assets: List[str]) -> List[InterestData]:
         raise NotImplementedError
@@ -3,7 +3,7 @@ from backends.exchanges.exchange_interface import AbstractCryptoExchangeClient
 
 
 def get_specific_exchange_interface(trading_platform: str) -> AbstractCryptoExchangeClient:
-    for instance in exchanges.list_of_impl_meta_class_instances:
+    for instance in exchanges.get_impl_meta_class_instances():
         if trading_platform == instance.get_exchange_name():
             return instance.get_exchange_client()
 
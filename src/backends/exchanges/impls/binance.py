@@ -2,6 +2,8 @@ from __future__ import print_function
 
 import os
 import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 from binance.client import Client
 from binance.exceptions import BinanceAPIException
@@ -9,29 +11,47 @@ from datetime import datetime
 
 from backends.exchanges.exchange_interface import AbstractCryptoExchangeClient, AbstractCryptoExchangeClientModule, \
     ExchangeUnderMaintenanceException
+from backends.exchanges.product_index import load_product_index
+from backends.exchanges.rate_limiter import get_rate_limiter
 from model.savings import InterestData, InterestDue, SavingsType
 from model.transaction import TradeData, TransactionType, TradingPair
-from typing import List, Dict
+from typing import Dict, Iterator, List
 from model.withdrawal_deposit import WithdrawalData, DepositData
-from utils import to_ms, from_ms, human_readable_interval, human_readable_interval_ts, interval
+from storage.checkpoint_store import CheckpointStore
+from utils import to_ms, from_ms, human_readable_interval_ts, windows_ms
 import logging
 
 
 exchange_name = "Binance"
+# read by the plugin registry before importing this module, see backends/plugin_registry.py
+plugin_required_env = ['BINANCE_API_KEY', 'BINANCE_API_SECRET']
 
 one_day = 24 * 60 * 60
 
+# request weights of the used endpoints, see https://binance-docs.github.io/apidocs/spot/en/#account-trade-list-user_data
+my_trades_weight = 20
+max_trades_per_request = 1000
+history_weight = 1
+max_history_per_request = 1000
+default_weight = 1
+# Binance reports the weight used by this IP within the current minute in this header
+used_weight_header = 'X-MBX-USED-WEIGHT-1M'
+
 class Config(Dict):
     failed = False
     enabled = False
     initialized = False
     api_key = None
     api_secret = None
+    max_in_flight = 4
+    weight_budget = 1000
 
     def init(self):
         try:
             self.api_key =  os.environ['BINANCE_API_KEY']
             self.api_secret = os.environ['BINANCE_API_SECRET']
+            self.max_in_flight = int(os.environ.get('BINANCE_MAX_IN_FLIGHT', self.max_in_flight))
+            self.weight_budget = int(os.environ.get('BINANCE_WEIGHT_BUDGET', self.weight_budget))
             self.initialized = True
             self.enabled = True
         except Exception as e:
@@ -82,82 +102,158 @@ class ClientClass(AbstractCryptoExchangeClient):
 
     def __init__(self):
         self.log = logging.getLogger("[BINANCE]")
+        self.invalid_trading_pairs = []
+        self.rate_limiter = get_rate_limiter(exchange_name, self.config.weight_budget, weight_headers=[used_weight_header])
+        self.cursors = CheckpointStore()
+        # newest trade (id, time) streamed per symbol, persisted by commit_cursors once the trades are stored
+        self.pending_cursors = {}
+        self.cursors_lock = threading.Lock()
         self.connect()
 
-    def get_trading_pairs(self, list_of_symbols_and_codes: List[str]) -> List[TradingPair]:
-        binance_products = self.client.get_products().get('data')
-        potential_trading_pairs = []
+    def call_weighted(self, endpoint, weight, function, **kwargs):
+        return self.rate_limiter.call(endpoint, weight, function, headers_function=self.get_last_response_headers, **kwargs)
 
-        for symbol_or_code in list_of_symbols_and_codes:
-            for traded_symbol_or_code in list_of_symbols_and_codes:
-                if symbol_or_code == traded_symbol_or_code:
-                    continue
+    def get_last_response_headers(self):
+        return getattr(getattr(self.client, 'response', None), 'headers', None)
 
-                new_trading_pair = TradingPair(symbol_or_code, traded_symbol_or_code)
-                potential_trading_pairs.append(new_trading_pair)
-
-        result = []
-        for product in binance_products:
-            for potential_trading_pair in potential_trading_pairs:
-                if product.get('st') != 'TRADING':
-                    continue
-
-                if product.get('b') == potential_trading_pair.security and product.get('q') == potential_trading_pair.currency:
-                    result.append(potential_trading_pair)
-
-        unique_trading_pairs = set(dict.fromkeys(potential_trading_pairs)) - set(dict.fromkeys(result))
-        self.log.debug('discarding potential_trading_pairs: ' + str(list(map(lambda x: x.security + x.currency, unique_trading_pairs))))
+    def get_trading_pairs(self, list_of_symbols_and_codes: List[str]) -> List[TradingPair]:
+        product_index = load_product_index(exchange_name, self.get_tradable_products)
+        result = product_index.match(list_of_symbols_and_codes)
+        self.log.debug('matched ' + str(len(result)) + ' trading pairs out of ' + str(len(list_of_symbols_and_codes)) + ' symbols')
         return result
 
+    def get_tradable_products(self):
+        return [
+            (product.get('b'), product.get('q'))
+            for product in self.call_weighted('get_products', default_weight, self.client.get_products).get('data')
+            if product.get('st') == 'TRADING'
+        ]
+
     def get_trades(self, from_timestamp, to_timestamp, list_of_trading_pairs) -> List[TradeData]:
         self.log.debug("Get trades from " + human_readable_interval_ts(from_timestamp, to_timestamp))
         self.log.debug(self.get_trading_pair_message_log(list_of_trading_pairs))
 
+        # pairs are fetched concurrently, executor.map keeps the results in the order of the trading pairs
         list_of_trades: List[TradeData] = []
-        for trading_pair in list_of_trading_pairs:
-            symbol = trading_pair.security + trading_pair.currency
-
-            try:
-                if from_ms(to_timestamp - from_timestamp) - 1 > one_day:
-                    trades_total = self.client.get_my_trades(symbol=symbol)
-                    relevant_trades = []
-                    for trade in trades_total:
-                        if int(trade.get('time')) - from_timestamp >= 0:
-                            relevant_trades.append(trade)
-
-                    my_trades = relevant_trades
-                else:
-                    my_trades = self.client.get_my_trades(symbol=symbol, startTime=from_timestamp, endTime=to_timestamp)
-
-                if len(my_trades) > 0:
-                    self.log.debug("Found " + str(len(my_trades)) + " trades for " + symbol)
-                    list_of_trades.extend(transform_to_trade_data(my_trades, trading_pair))
-            except BinanceAPIException as e:
-                if e.status_code == 400 and e.code == -1100:
-                    self.log.debug("Invalid character found in trading pair: " + trading_pair)
-                    self.invalid_trading_pairs.append(trading_pair.security + trading_pair.currency)
-                    pass
-                elif e.status_code == 400 and e.code == -1121:
-                    self.log.debug("Invalid trading pair found: " + trading_pair)
-                    self.invalid_trading_pairs.append(trading_pair.security + trading_pair.currency)
-                    pass
-                else:
-                    self.log.error(e)
+        with ThreadPoolExecutor(max_workers=max(self.config.max_in_flight, 1)) as executor:
+            trades_by_pair = executor.map(lambda trading_pair: self.get_trades_for_pair(from_timestamp, to_timestamp, trading_pair),
+                                          list_of_trading_pairs)
+            for trades in trades_by_pair:
+                list_of_trades.extend(trades)
 
         return list_of_trades
 
+    def iter_trades(self, from_timestamp, to_timestamp, list_of_trading_pairs) -> Iterator[TradeData]:
+        # streams the trades pair by pair and page by page, each page is handed on before the next one is requested
+        self.log.debug("Stream trades from " + human_readable_interval_ts(from_timestamp, to_timestamp))
+        self.log.debug(self.get_trading_pair_message_log(list_of_trading_pairs))
+
+        for trading_pair in list_of_trading_pairs:
+            yield from self.iter_trades_for_pair(from_timestamp, to_timestamp, trading_pair)
+
+    def get_trades_for_pair(self, from_timestamp, to_timestamp, trading_pair) -> List[TradeData]:
+        return list(self.iter_trades_for_pair(from_timestamp, to_timestamp, trading_pair))
+
+    def iter_trades_for_pair(self, from_timestamp, to_timestamp, trading_pair):
+        symbol = trading_pair.security + trading_pair.currency
+
+        try:
+            found_trades = 0
+            for trade in self.iter_my_trades(symbol, from_timestamp, to_timestamp):
+                found_trades += 1
+                yield transform_trade(trade, trading_pair)
+
+            if found_trades > 0:
+                self.log.debug("Found " + str(found_trades) + " trades for " + symbol)
+        except BinanceAPIException as e:
+            if e.status_code == 400 and e.code == -1100:
+                self.log.debug("Invalid character found in trading pair: " + symbol)
+                self.invalid_trading_pairs.append(symbol)
+            elif e.status_code == 400 and e.code == -1121:
+                self.log.debug("Invalid trading pair found: " + symbol)
+                self.invalid_trading_pairs.append(symbol)
+            else:
+                self.log.error(e)
+
+    def iter_my_trades(self, symbol, from_timestamp, to_timestamp):
+        # Streams the raw trades of a symbol within [from_timestamp, to_timestamp) in ascending id order.
+        # Intervals of up to one day are queried by time, longer ones are walked by trade id, starting after the
+        # last trade id stored by a previous sync or at the very first trade of the symbol.
+        if from_ms(to_timestamp - from_timestamp) - 1 > one_day:
+            last_trade_id = self.get_trade_cursor(symbol, from_timestamp)
+            trades = self.iter_my_trades_by_id(symbol, 0 if last_trade_id is None else last_trade_id + 1, to_timestamp)
+        else:
+            trades = self.iter_my_trades_by_time(symbol, from_timestamp, to_timestamp)
+
+        newest_trade = None
+        for trade in trades:
+            if int(trade.get('time')) < from_timestamp:
+                continue
+            newest_trade = trade
+            yield trade
+
+        if newest_trade is not None:
+            with self.cursors_lock:
+                self.pending_cursors[symbol] = (newest_trade.get('id'), int(newest_trade.get('time')))
+
+    def get_trade_cursor(self, symbol, from_timestamp):
+        # a cursor at or after the begin of the interval, e.g. after SYNC_BEGIN_TIMESTAMP was moved back, would skip
+        # trades, the history is walked from the first trade then
+        last_trade_id = self.cursors.get_cursor(exchange_name, "trades:" + symbol)
+        last_trade_time = self.cursors.get_cursor(exchange_name, "trades_time:" + symbol)
+        if last_trade_id is None or last_trade_time is None or last_trade_time >= from_timestamp:
+            return None
+        return last_trade_id
+
+    def commit_cursors(self):
+        with self.cursors_lock:
+            pending_cursors, self.pending_cursors = self.pending_cursors, {}
+        for symbol, (trade_id, trade_time) in pending_cursors.items():
+            self.cursors.set_cursor(exchange_name, "trades:" + symbol, trade_id)
+            self.cursors.set_cursor(exchange_name, "trades_time:" + symbol, trade_time)
+
+    def discard_cursors(self):
+        with self.cursors_lock:
+            self.pending_cursors = {}
+
+    def iter_my_trades_by_id(self, symbol, from_id, to_timestamp):
+        while True:
+            trades = self.call_weighted('get_my_trades', my_trades_weight, self.client.get_my_trades,
+                                        symbol=symbol, fromId=from_id, limit=max_trades_per_request)
+            for trade in trades:
+                if int(trade.get('time')) >= to_timestamp:
+                    return
+                yield trade
+
+            if len(trades) < max_trades_per_request:
+                return
+            from_id = trades[-1].get('id') + 1
+
+    def iter_my_trades_by_time(self, symbol, from_timestamp, to_timestamp):
+        # Binance only accepts windows of up to 24 hours, a full window continues by trade id
+        window_begin = from_timestamp
+        while window_begin < to_timestamp:
+            window_end = min(window_begin + to_ms(one_day), to_timestamp)
+            trades = self.call_weighted('get_my_trades', my_trades_weight, self.client.get_my_trades, symbol=symbol,
+                                        startTime=window_begin, endTime=window_end - 1, limit=max_trades_per_request)
+            yield from trades
+
+            if len(trades) == max_trades_per_request:
+                yield from self.iter_my_trades_by_id(symbol, trades[-1].get('id') + 1, window_end)
+            window_begin = window_end
+
     def get_savings_interests(self, from_timestamp, to_timestamp) -> List[InterestData]:
         self.log.debug("Get interest from " + human_readable_interval_ts(from_timestamp, to_timestamp))
 
         result = []
 
-        lending_interest_history_daily = self.client.get_lending_interest_history(lendingType="DAILY", startTime=from_timestamp, endTime=to_timestamp, size=100)
+        lending_interest_history_daily = self.call_weighted('get_lending_interest_history', default_weight, self.client.get_lending_interest_history, lendingType="DAILY", startTime=from_timestamp, endTime=to_timestamp, size=100)
         result.extend(get_interests_from_data(lending_interest_history_daily, SavingsType.LENDING, InterestDue.DAILY))
 
-        lending_interest_history_activity = self.client.get_lending_interest_history(lendingType="ACTIVITY", startTime=from_timestamp, endTime=to_timestamp, size=100)
+        lending_interest_history_activity = self.call_weighted('get_lending_interest_history', default_weight, self.client.get_lending_interest_history, lendingType="ACTIVITY", startTime=from_timestamp, endTime=to_timestamp, size=100)
         result.extend(get_interests_from_data(lending_interest_history_activity, SavingsType.LENDING, InterestDue.ACTIVE))
 
-        lending_interest_history_fixed = self.client.get_lending_interest_history(lendingType="CUSTOMIZED_FIXED", startTime=from_timestamp, endTime=to_timestamp, size=100)
+        lending_interest_history_fixed = self.call_weighted('get_lending_interest_history', default_weight, self.client.get_lending_interest_history, lendingType="CUSTOMIZED_FIXED", startTime=from_timestamp, endTime=to_timestamp, size=100)
         result.extend(get_interests_from_data(lending_interest_history_fixed, SavingsType.LENDING, InterestDue.FIXED))
 
         return result
@@ -165,13 +261,7 @@ class ClientClass(AbstractCryptoExchangeClient):
     def get_withdrawals(self, from_timestamp: int, to_timestamp: int) -> List[WithdrawalData]:
         self.log.debug("Get withdrawals from " + human_readable_interval_ts(from_timestamp, to_timestamp))
 
-        all_withdrawal_history = []
-        for from_datetime, to_datetime in interval(from_timestamp, to_timestamp):
-            self.log.debug("Fetching page of withdrawals: " + human_readable_interval(from_datetime, to_datetime))
-            withdrawal_history = self.client.get_withdraw_history(startTime=to_ms(from_datetime.timestamp()),
-                                                                  endTime=to_ms(to_datetime.timestamp()),
-                                                                  limit=1000)
-            all_withdrawal_history.extend(withdrawal_history)
+        all_withdrawal_history = self.get_history(self.client.get_withdraw_history, "withdrawals", from_timestamp, to_timestamp)
 
         self.log.debug("Found " + str(len(all_withdrawal_history)) + " withdrawals")
 
@@ -190,13 +280,7 @@ class ClientClass(AbstractCryptoExchangeClient):
     def get_deposits(self, from_timestamp: int, to_timestamp: int) -> List[DepositData]:
         self.log.debug("Get deposits from " + human_readable_interval_ts(from_timestamp, to_timestamp))
 
-        all_deposit_history = []
-        for from_date, to_date in interval(from_timestamp, to_timestamp):
-            self.log.debug("Fetching page of deposits: " + human_readable_interval(from_date, to_date))
-            deposit_history = self.client.get_deposit_history(startTime=to_ms(from_date.timestamp()),
-                                                              endTime=to_ms(to_date.timestamp()),
-                                                              limit=1000)
-            all_deposit_history.extend(deposit_history)
+        all_deposit_history = self.get_history(self.client.get_deposit_history, "deposits", from_timestamp, to_timestamp)
 
         self.log.debug("Found " + str(len(all_deposit_history)) + " deposits")
         return [
@@ -210,13 +294,43 @@ class ClientClass(AbstractCryptoExchangeClient):
             ) for binance_deposit in all_deposit_history
         ]
 
+    def get_history(self, fetch_history, history_name, from_timestamp, to_timestamp):
+        # the 90 day windows are fetched concurrently, merged in window order and deduplicated by txId
+        windows = windows_ms(from_timestamp, to_timestamp)
+        with ThreadPoolExecutor(max_workers=max(self.config.max_in_flight, 1)) as executor:
+            pages = list(executor.map(lambda window: self.get_history_window(fetch_history, history_name, *window), windows))
+
+        result = []
+        seen_ids = set()
+        for page in pages:
+            for record in page:
+                record_id = record.get("txId") or record.get("id")
+                if record_id is not None and record_id in seen_ids:
+                    continue
+                seen_ids.add(record_id)
+                result.append(record)
+        return result
+
+    def get_history_window(self, fetch_history, history_name, begin, end):
+        self.log.debug("Fetching page of " + history_name + ": " + human_readable_interval_ts(begin, end + 1))
+        history = self.call_weighted(history_name, history_weight, fetch_history, startTime=begin, endTime=end, limit=max_history_per_request)
+        if len(history) < max_history_per_request or end - begin < 1000:
+            return history
+
+        # a full window may have been truncated by the limit, split it until every part fits into one request
+        middle = begin + (end - begin) // 2
+        self.log.debug("Splitting a full page of " + history_name + ": " + human_readable_interval_ts(begin, end + 1))
+        return self.get_history_window(fetch_history, history_name, begin, middle) + \
+            self.get_history_window(fetch_history, history_name, middle + 1, end)
+
     def connect(self):
         try:
             self.log.debug('Trying to connect to your account...')
             self.client = Client(self.config.api_key, self.config.api_secret)
-            self.log.debug(self.client.get_account_status())
+            account_status = self.call_weighted('get_account_status', default_weight, self.client.get_account_status)
+            self.log.debug(account_status)
 
-            if self.client.get_account_status().get('data') != 'Normal':
+            if account_status.get('data') != 'Normal':
                 self.log.error('Cannot access your account status.')
                 sys.exit(1)
 
@@ -267,13 +381,11 @@ def transform_sell_trade(sell, trading_pair) -> TradeData:
                            trading_pair, TransactionType.SELL, trade_id, trade_time)
 
 
-def transform_to_trade_data(my_trades, trading_pair) -> List[TradeData]:
-    result = []
+def transform_trade(trade, trading_pair) -> TradeData:
+    if trade.get('isBuyer'):
+        return transform_buy_trade(trade, trading_pair)
+    return transform_sell_trade(trade, trading_pair)
 
-    for trade in my_trades:
-        if trade.get('isBuyer'):
-            result.append(transform_buy_trade(trade, trading_pair))
-        else:
-            result.append(transform_sell_trade(trade, trading_pair))
 
-    return result
+def transform_to_trade_data(my_trades, trading_pair) -> List[TradeData]:
+    return [transform_trade(trade, trading_pair) for trade in my_trades]
@@ -1,6 +1,8 @@
 import os
 
 from backends.exchanges.exchange_interface import AbstractCryptoExchangeClient, AbstractCryptoExchangeClientModule
+from backends.exchanges.product_index import ProductIndex, load_cached_product_index, save_product_index
+from backends.exchanges.rate_limiter import get_rate_limiter
 from model.savings import InterestData
 from model.transaction import TradeData, TradingPair
 from typing import List, Dict
@@ -8,6 +10,10 @@ import cryptocom.exchange as cro
 from syncer import sync
 
 exchange_name = "Crypto.com"
+# read by the plugin registry before importing this module, see backends/plugin_registry.py
+plugin_required_env = ['CRYPTOCOM_API_KEY', 'CRYPTOCOM_API_SECRET']
+# the private history endpoints allow one request per second
+requests_per_second = 1
 
 
 class CryptoComConfig(Dict):
@@ -52,43 +58,39 @@ class CryptoComClient(AbstractCryptoExchangeClient):
     list_of_pairs: dict = {}
 
     def __init__(self):
-        pass
+        self.rate_limiter = get_rate_limiter(exchange_name, requests_per_second, period_seconds=1)
 
     @sync
     async def get_trading_pairs(self, list_of_symbols_and_codes):
         if not self.connected:
             await self.connect()
 
-        result = []
-        potential_trading_pairs = []
-        exchange_traded_pairs = await self.exchange.get_pairs()
+        product_index = load_cached_product_index(exchange_name)
+        if product_index is None:
+            await self.sync_list_of_pairs()
+            product_index = ProductIndex(
+                (traded_pair.base_coin.name, traded_pair.quote_coin.name) for traded_pair in self.list_of_pairs.values()
+            )
+            save_product_index(exchange_name, product_index)
 
-        for symbol_or_code in list_of_symbols_and_codes:
-            for traded_symbol_or_code in list_of_symbols_and_codes:
-                if symbol_or_code == traded_symbol_or_code:
-                    continue
-                new_trading_pair = TradingPair(symbol_or_code, traded_symbol_or_code)
-                potential_trading_pairs.append(new_trading_pair)
+        return product_index.match(list_of_symbols_and_codes)
 
-        for traded_pair in exchange_traded_pairs:
-            for potential_trading_pair in potential_trading_pairs:
-                if traded_pair.base_coin.name == potential_trading_pair.security and \
-                        traded_pair.quote_coin.name == potential_trading_pair.currency:
-                    result.append(potential_trading_pair)
-                    self.list_of_pairs.setdefault(traded_pair.name, traded_pair)
-
-        return result
+    async def sync_list_of_pairs(self):
+        for traded_pair in await self.rate_limiter.call_async('get_pairs', 1, self.exchange.get_pairs):
+            self.list_of_pairs.setdefault(traded_pair.name, traded_pair)
 
     @sync
     async def get_trades(self, from_timestamp, to_timestamp, list_of_trading_pairs) -> List[TradeData]:
         if not self.connected:
             await self.connect()
+        if len(self.list_of_pairs) == 0:
+            await self.sync_list_of_pairs()
         for trading_pair in list_of_trading_pairs:
             pair = self.list_of_pairs.get(trading_pair.security + "_" + trading_pair.currency)
             load_more = True
             page = 0
             while (load_more):
-                trades = await self.account.get_trades(pair, page)
+                trades = await self.rate_limiter.call_async('get_trades', 1, self.account.get_trades, pair, page)
                 if len(trades) < 200:
                     load_more = False
                 pass
@@ -101,8 +103,8 @@ class CryptoComClient(AbstractCryptoExchangeClient):
         load_more = True
         page = 0
         while (load_more):
-            interest_history = \
-                self.account.get_interest_history(start_ts=from_timestamp, end_ts=to_timestamp, page=page)
+            interest_history = await self.rate_limiter.call_async('get_interest_history', 1, self.account.get_interest_history,
+                                                                  start_ts=from_timestamp, end_ts=to_timestamp, page=page)
             if len(interest_history) < 20:
                 load_more = False
             pass
@@ -0,0 +1,267 @@
+import hashlib
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from typing import Dict, Iterator, List
+
+from backends.exchanges.exchange_interface import AbstractCryptoExchangeClient, AbstractCryptoExchangeClientModule
+from backends.exchanges.product_index import ProductIndex
+from backends.exchanges.rate_limiter import get_rate_limiter
+from model.savings import InterestData
+from model.transaction import TradeData, TransactionType, TradingPair
+from model.withdrawal_deposit import WithdrawalData, DepositData
+from utils import human_readable_interval_ts
+import logging
+
+
+exchange_name = "Synthetic"
+# read by the plugin registry before importing this module, see backends/plugin_registry.py
+plugin_enabled_env = 'SYNTHETIC_ENABLED'
+
+one_day_ms = 24 * 60 * 60 * 1000
+max_trades_per_request = 1000
+my_trades_weight = 20
+history_weight = 1
+
+securities = ['BTC', 'ETH', 'BNB', 'ADA', 'SOL', 'DOT', 'XRP', 'LTC', 'LINK', 'ATOM', 'AVAX', 'MATIC', 'DOGE', 'TRX']
+currencies = ['EUR', 'USDT', 'BTC']
+
+
+# Generates a deterministic trade, deposit and withdrawal history from a seed, so that the whole sync can be profiled
+# at production scale without API keys. The records of a day only depend on the seed and the day, not on the
+# queried interval, so repeated and overlapping syncs see the same data.
+class SyntheticConfig(Dict):
+    failed = False
+    enabled = False
+    initialized = False
+    seed = 42
+    pairs = 10
+    trades_per_day = 100
+    movements_per_day = 1
+    history_days = 365
+    history_end = None
+    latency_ms = 0
+    rate_limit_error_rate = 0.0
+    retry_after_seconds = 0.1
+    weight_budget = 6000
+    max_in_flight = 4
+
+    def init(self):
+        try:
+            if os.environ.get('SYNTHETIC_ENABLED', 'false').strip().lower() not in ('1', 'true', 'yes', 'on'):
+                return
+            self.seed = int(os.environ.get('SYNTHETIC_SEED', self.seed))
+            self.pairs = int(os.environ.get('SYNTHETIC_PAIRS', self.pairs))
+            self.trades_per_day = int(os.environ.get('SYNTHETIC_TRADES_PER_DAY', self.trades_per_day))
+            self.movements_per_day = int(os.environ.get('SYNTHETIC_MOVEMENTS_PER_DAY', self.movements_per_day))
+            self.history_days = int(os.environ.get('SYNTHETIC_HISTORY_DAYS', self.history_days))
+            history_end = os.environ.get('SYNTHETIC_HISTORY_END')
+            if history_end:
+                self.history_end = int(datetime.fromisoformat(history_end).replace(tzinfo=timezone.utc).timestamp() * 1000)
+            else:
+                self.history_end = (int(time.time() * 1000) // one_day_ms + 1) * one_day_ms
+            self.latency_ms = int(os.environ.get('SYNTHETIC_LATENCY_MS', self.latency_ms))
+            self.rate_limit_error_rate = float(os.environ.get('SYNTHETIC_RATE_LIMIT_ERROR_RATE', self.rate_limit_error_rate))
+            self.retry_after_seconds = float(os.environ.get('SYNTHETIC_RETRY_AFTER', self.retry_after_seconds))
+            self.weight_budget = int(os.environ.get('SYNTHETIC_WEIGHT_BUDGET', self.weight_budget))
+            self.max_in_flight = int(os.environ.get('SYNTHETIC_MAX_IN_FLIGHT', self.max_in_flight))
+            self.initialized = True
+            self.enabled = True
+        except Exception as e:
+            self.failed = True
+
+    def get_history_begin(self) -> int:
+        return self.history_end - self.history_days * one_day_ms
+
+
+class SyntheticRateLimitError(Exception):
+
+    def __init__(self, retry_after_seconds: float):
+        super().__init__("Too many requests")
+        self.status_code = 429
+        self.response = SimpleNamespace(headers={'Retry-After': str(retry_after_seconds)})
+
+
+@AbstractCryptoExchangeClientModule.register
+class SyntheticClientModule(AbstractCryptoExchangeClientModule):
+
+    def is_enabled(self) -> bool:
+        config = SyntheticConfig()
+        config.init()
+        return config.enabled
+
+    def get_exchange_name(self) -> str:
+        return exchange_name
+
+    def get_exchange_client(self) -> AbstractCryptoExchangeClient:
+        return SyntheticClient()
+
+    @staticmethod
+    def get_instance() -> AbstractCryptoExchangeClientModule:
+        return SyntheticClientModule()
+
+
+def get_synthetic_pairs(count: int) -> List[TradingPair]:
+    result = []
+    for security in securities + ['SYN' + str(i) for i in range(count)]:
+        for currency in currencies:
+            if security == currency:
+                continue
+            if len(result) == count:
+                return result
+            result.append(TradingPair(security, currency))
+    return result
+
+
+def get_random(seed: int, *keys) -> random.Random:
+    return random.Random(':'.join([str(seed)] + [str(key) for key in keys]))
+
+
+def get_hex_id(seed: int, *keys) -> str:
+    return hashlib.sha256(':'.join([str(seed)] + [str(key) for key in keys]).encode('utf-8')).hexdigest()
+
+
+def get_days(from_timestamp: int, to_timestamp: int) -> range:
+    return range(from_timestamp // one_day_ms, (to_timestamp - 1) // one_day_ms + 1)
+
+
+@AbstractCryptoExchangeClient.register
+class SyntheticClient(AbstractCryptoExchangeClient):
+
+    def __init__(self, config: SyntheticConfig = None):
+        self.log = logging.getLogger("[SYNTHETIC]")
+        if config is None:
+            config = SyntheticConfig()
+            config.init()
+        self.config = config
+        self.pairs = get_synthetic_pairs(config.pairs)
+        # commissions are paid in BNB only if BNB is traded, otherwise there would be no account for it
+        self.commission_in_bnb = any(pair.security == 'BNB' for pair in self.pairs)
+        self.rate_limiter = get_rate_limiter(exchange_name, config.weight_budget)
+        self.errors = random.Random(config.seed)
+        self.errors_lock = threading.Lock()
+
+    def simulate_request(self, result=None):
+        if self.config.latency_ms > 0:
+            time.sleep(self.config.latency_ms / 1000)
+        if self.config.rate_limit_error_rate > 0:
+            with self.errors_lock:
+                rate_limited = self.errors.random() < self.config.rate_limit_error_rate
+            if rate_limited:
+                raise SyntheticRateLimitError(self.config.retry_after_seconds)
+        return result
+
+    def request(self, endpoint: str, weight: int, result=None):
+        return self.rate_limiter.call(endpoint, weight, self.simulate_request, result)
+
+    def get_trading_pairs(self, list_of_symbols_and_codes: List[str]) -> List[TradingPair]:
+        products = self.request('get_products', 1, [(pair.security, pair.currency) for pair in self.pairs])
+        return ProductIndex(products).match(list_of_symbols_and_codes)
+
+    def get_trades(self, from_timestamp: int, to_timestamp: int, list_of_trading_pairs: List[TradingPair]) -> List[TradeData]:
+        self.log.debug("Get trades from " + human_readable_interval_ts(from_timestamp, to_timestamp))
+        list_of_trades: List[TradeData] = []
+        with ThreadPoolExecutor(max_workers=max(self.config.max_in_flight, 1)) as executor:
+            for trades in executor.map(lambda trading_pair: list(self.iter_trades_for_pair(from_timestamp, to_timestamp, trading_pair)),
+                                       list_of_trading_pairs):
+                list_of_trades.extend(trades)
+        return list_of_trades
+
+    def iter_trades(self, from_timestamp: int, to_timestamp: int, list_of_trading_pairs: List[TradingPair]) -> Iterator[TradeData]:
+        for trading_pair in list_of_trading_pairs:
+            yield from self.iter_trades_for_pair(from_timestamp, to_timestamp, trading_pair)
+
+    def iter_trades_for_pair(self, from_timestamp: int, to_timestamp: int, trading_pair: TradingPair) -> Iterator[TradeData]:
+        # the trades are handed out in pages like a real exchange, every page is one simulated request
+        page = []
+        for trade in self.generate_trades(from_timestamp, to_timestamp, trading_pair):
+            page.append(trade)
+            if len(page) == max_trades_per_request:
+                yield from self.request('get_my_trades', my_trades_weight, page)
+                page = []
+        yield from self.request('get_my_trades', my_trades_weight, page)
+
+    def generate_trades(self, from_timestamp: int, to_timestamp: int, trading_pair: TradingPair) -> Iterator[TradeData]:
+        pair_index = self.pairs.index(trading_pair) if trading_pair in self.pairs else None
+        if pair_index is None:
+            return
+        from_timestamp = max(from_timestamp, self.config.get_history_begin())
+        to_timestamp = min(to_timestamp, self.config.history_end)
+        for day in get_days(from_timestamp, to_timestamp):
+            for trade in self.generate_trades_of_day(day, pair_index, trading_pair):
+                if from_timestamp <= trade.time < to_timestamp:
+                    yield trade
+
+    def generate_trades_of_day(self, day: int, pair_index: int, trading_pair: TradingPair) -> List[TradeData]:
+        day_random = get_random(self.config.seed, 'trades', pair_index, day)
+        price = get_random(self.config.seed, 'price', trading_pair.security).uniform(1, 50000)
+        times = sorted(day * one_day_ms + day_random.randrange(one_day_ms) for _ in range(self.config.trades_per_day))
+        result = []
+        for number, trade_time in enumerate(times):
+            security_amount = round(day_random.uniform(0.001, 10), 8)
+            currency_amount = round(security_amount * price * day_random.uniform(0.95, 1.05), 8)
+            commission_asset = 'BNB' if day_random.random() < 0.5 and self.commission_in_bnb else trading_pair.currency
+            result.append(TradeData(
+                trading_platform=exchange_name,
+                commission_amount='{:.8f}'.format(currency_amount * 0.001),
+                commission_asset=commission_asset,
+                currency_amount='{:.8f}'.format(currency_amount),
+                security_amount='{:.8f}'.format(security_amount),
+                trading_pair=trading_pair,
+                type=TransactionType.BUY if day_random.random() < 0.5 else TransactionType.SELL,
+                id=day * self.config.trades_per_day + number,
+                time=trade_time,
+            ))
+        return result
+
+    def get_savings_interests(self, from_timestamp: int, to_timestamp: int, list_of_assets: List[str] = None) -> List[InterestData]:
+        return []
+
+    def get_withdrawals(self, from_timestamp: int, to_timestamp: int, list_of_assets: List[str] = None) -> List[WithdrawalData]:
+        return self.request('get_withdraw_history', history_weight, [
+            WithdrawalData(
+                trading_platform=exchange_name,
+                amount=movement['amount'],
+                asset=movement['asset'],
+                timestamp=movement['timestamp'],
+                target_address=movement['address'],
+                transaction_fee='{:.8f}'.format(float(movement['amount']) * 0.0005),
+                transaction_id=movement['transaction_id'],
+            ) for movement in self.generate_movements('withdrawals', from_timestamp, to_timestamp)
+        ])
+
+    def get_deposits(self, from_timestamp: int, to_timestamp: int, list_of_assets: List[str] = None) -> List[DepositData]:
+        return self.request('get_deposit_history', history_weight, [
+            DepositData(
+                trading_platform=exchange_name,
+                amount=movement['amount'],
+                asset=movement['asset'],
+                timestamp=movement['timestamp'],
+                target_address=movement['address'],
+                transaction_id=movement['transaction_id'],
+            ) for movement in self.generate_movements('deposits', from_timestamp, to_timestamp)
+        ])
+
+    def generate_movements(self, kind: str, from_timestamp: int, to_timestamp: int) -> Iterator[dict]:
+        from_timestamp = max(from_timestamp, self.config.get_history_begin())
+        to_timestamp = min(to_timestamp, self.config.history_end)
+        assets = sorted({pair.security for pair in self.pairs})
+        for day in get_days(from_timestamp, to_timestamp):
+            day_random = get_random(self.config.seed, kind, day)
+            for number in range(self.config.movements_per_day):
+                timestamp = day * one_day_ms + day_random.randrange(one_day_ms)
+                asset = day_random.choice(assets)
+                amount = '{:.8f}'.format(day_random.uniform(0.01, 5))
+                if not from_timestamp <= timestamp < to_timestamp:
+                    continue
+                yield {
+                    'timestamp': timestamp,
+                    'asset': asset,
+                    'amount': amount,
+                    'address': get_hex_id(self.config.seed, 'address', asset)[:40],
+                    'transaction_id': get_hex_id(self.config.seed, kind, day, number),
+                }
@@ -0,0 +1,79 @@
+import json
+import os
+import time
+from typing import Callable, Dict, Iterable, List, Set, Tuple
+
+from model.transaction import TradingPair
+from storage.paths import state_path
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+# Hash index of the (base, quote) products traded on an exchange.
+# Matching the Firefly III symbols against it is a set intersection per base symbol instead of comparing every
+# potential pair with every product.
+class ProductIndex(object):
+    def __init__(self, products: Iterable[Tuple[str, str]]):
+        self.quotes_by_base: Dict[str, Set[str]] = {}
+        for base, quote in products:
+            self.quotes_by_base.setdefault(base, set()).add(quote)
+
+    def get_products(self) -> List[Tuple[str, str]]:
+        return sorted((base, quote) for base, quotes in self.quotes_by_base.items() for quote in quotes)
+
+    def match(self, list_of_symbols_and_codes: List[str]) -> List[TradingPair]:
+        positions = {}
+        for symbol_or_code in list_of_symbols_and_codes:
+            positions.setdefault(symbol_or_code, len(positions))
+        symbols = set(positions.keys())
+
+        result = []
+        for base in positions:
+            quotes = self.quotes_by_base.get(base)
+            if quotes is None:
+                continue
+            for quote in sorted((quotes & symbols) - {base}, key=positions.get):
+                result.append(TradingPair(base, quote))
+        return result
+
+
+def get_cache_ttl() -> int:
+    # imported here, the exchange modules have to stay importable without the Firefly III settings
+    import config
+    return config.exchange_products_cache_ttl
+
+
+def get_cache_path(exchange: str) -> str:
+    return state_path("products_" + exchange.lower().replace('.', '_') + ".json")
+
+
+def load_cached_product_index(exchange: str, ttl_seconds: int = None):
+    ttl_seconds = get_cache_ttl() if ttl_seconds is None else ttl_seconds
+    path = get_cache_path(exchange)
+    try:
+        if time.time() - os.path.getmtime(path) > ttl_seconds:
+            return None
+        with open(path) as cache_file:
+            return ProductIndex(tuple(product) for product in json.load(cache_file))
+    except (OSError, ValueError):
+        return None
+
+
+def save_product_index(exchange: str, product_index: ProductIndex):
+    path = get_cache_path(exchange)
+    try:
+        with open(path + ".tmp", "w") as cache_file:
+            json.dump(product_index.get_products(), cache_file)
+        os.replace(path + ".tmp", path)
+    except OSError:
+        logger.warning("Cannot write the product cache of %s to %s", exchange, path, exc_info=True)
+
+
+def load_product_index(exchange: str, fetch_products: Callable[[], Iterable[Tuple[str, str]]], ttl_seconds: int = None) -> ProductIndex:
+    product_index = load_cached_product_index(exchange, ttl_seconds)
+    if product_index is None:
+        product_index = ProductIndex(fetch_products())
+        save_product_index(exchange, product_index)
+    return product_index
@@ -0,0 +1,219 @@
+import asyncio
+import logging
+import random
+import threading
+import time
+from typing import Callable, Dict, Iterable, Optional
+
+from backends.exchanges.exchange_interface import ExchangeRateLimitException
+import metrics
+
+
+logger = logging.getLogger(__name__)
+
+rate_limited_status_codes = (429, 418)
+
+
+def get_status_code(error: Exception) -> Optional[int]:
+    status_code = getattr(error, 'status_code', None) or getattr(error, 'status', None)
+    if status_code is None:
+        response = getattr(error, 'response', None)
+        status_code = getattr(response, 'status_code', None) or getattr(response, 'status', None)
+    return status_code if isinstance(status_code, int) else None
+
+
+def get_retry_after(error: Exception) -> Optional[float]:
+    # requests keeps the headers on error.response, aiohttp on the error itself
+    headers = getattr(getattr(error, 'response', None), 'headers', None) or getattr(error, 'headers', None)
+    if headers is None:
+        return None
+    retry_after = headers.get('Retry-After') or headers.get('retry-after')
+    try:
+        return max(float(retry_after), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+def is_rate_limited(error: Exception) -> bool:
+    return get_status_code(error) in rate_limited_status_codes
+
+
+class EndpointStats(object):
+
+    def __init__(self):
+        self.calls = 0
+        self.weight = 0
+        self.errors = 0
+        self.rate_limited = 0
+        self.retries = 0
+        self.waited_seconds = 0.0
+        self.call_seconds = 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "calls": self.calls,
+            "weight": self.weight,
+            "errors": self.errors,
+            "rate_limited": self.rate_limited,
+            "retries": self.retries,
+            "waited_seconds": round(self.waited_seconds, 3),
+            "avg_call_seconds": round(self.call_seconds / self.calls, 3) if self.calls else 0.0,
+        }
+
+
+# Token bucket shared by all calls of one exchange client. The bucket holds `capacity` request weight and refills
+# completely within `period_seconds`. Weight headers reported by the server correct the local estimate, and rate
+# limit responses (429/418) pause the whole bucket for Retry-After or an exponential backoff with jitter.
+# metrics_prefix picks the <prefix>_request_seconds and <prefix>_rate_limited_total metrics, labeled <prefix>=name.
+class RateLimiter(object):
+
+    def __init__(self, name: str, capacity: int, period_seconds: float = 60.0, weight_headers: Iterable[str] = (),
+                 max_retries: int = 5, backoff_seconds: float = 1.0, max_backoff_seconds: float = 60.0,
+                 time_function: Callable[[], float] = time.monotonic, sleep_function: Callable[[float], None] = time.sleep,
+                 metrics_prefix: str = 'exchange'):
+        self.name = name
+        self.request_seconds = getattr(metrics, metrics_prefix + '_request_seconds')
+        self.rate_limited_total = getattr(metrics, metrics_prefix + '_rate_limited_total')
+        self.metrics_labels = {metrics_prefix: name}
+        self.capacity = capacity
+        self.refill_per_second = capacity / period_seconds
+        self.weight_headers = list(weight_headers)
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self.time_function = time_function
+        self.sleep_function = sleep_function
+        self.lock = threading.Lock()
+        self.tokens = float(capacity)
+        self.updated_at = time_function()
+        self.blocked_until = 0.0
+        self.endpoints: Dict[str, EndpointStats] = {}
+
+    def refill(self, now: float):
+        self.tokens = min(float(self.capacity), self.tokens + (now - self.updated_at) * self.refill_per_second)
+        self.updated_at = now
+
+    def reserve(self, weight: int) -> float:
+        # takes the weight from the bucket and returns how many seconds the caller has to wait before sending
+        with self.lock:
+            now = self.time_function()
+            self.refill(now)
+            self.tokens -= weight
+            wait = max(self.blocked_until - now, 0.0)
+            if self.tokens < 0:
+                wait = max(wait, -self.tokens / self.refill_per_second)
+            return wait
+
+    def observe(self, headers):
+        if headers is None:
+            return
+        for header in self.weight_headers:
+            used_weight = headers.get(header) or headers.get(header.lower())
+            if used_weight is None:
+                continue
+            with self.lock:
+                self.refill(self.time_function())
+                self.tokens = min(self.tokens, float(self.capacity - int(used_weight)))
+            return
+
+    def back_off(self, attempt: int, retry_after: Optional[float]) -> float:
+        if retry_after is not None:
+            delay = retry_after
+        else:
+            backoff = min(self.backoff_seconds * (2 ** attempt), self.max_backoff_seconds)
+            delay = random.uniform(backoff / 2, backoff)
+        with self.lock:
+            self.blocked_until = max(self.blocked_until, self.time_function() + delay)
+        return delay
+
+    def count(self, endpoint: str, **amounts):
+        # the stats are updated from several worker threads at once
+        with self.lock:
+            stats = self.endpoints.setdefault(endpoint, EndpointStats())
+            for field, amount in amounts.items():
+                setattr(stats, field, getattr(stats, field) + amount)
+
+    def acquire(self, endpoint: str, weight: int = 1):
+        wait = self.reserve(weight)
+        self.count(endpoint, weight=weight, waited_seconds=wait)
+        if wait > 0:
+            self.sleep_function(wait)
+
+    async def acquire_async(self, endpoint: str, weight: int = 1):
+        wait = self.reserve(weight)
+        self.count(endpoint, weight=weight, waited_seconds=wait)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def handle_error(self, endpoint: str, error: Exception, attempt: int):
+        # raises when the error is not retried, otherwise backs off before the next attempt
+        if not is_rate_limited(error):
+            self.count(endpoint, errors=1)
+            raise error
+        self.count(endpoint, errors=1, rate_limited=1)
+        self.rate_limited_total.inc(endpoint=endpoint, **self.metrics_labels)
+        if attempt >= self.max_retries:
+            raise ExchangeRateLimitException(self.name + ": rate limit exceeded for " + endpoint) from error
+
+        delay = self.back_off(attempt, get_retry_after(error))
+        self.count(endpoint, retries=1)
+        logger.warning('%s: rate limited on %s (status %s), backing off for %.1fs', self.name, endpoint,
+                       get_status_code(error), delay)
+
+    def call(self, endpoint: str, weight: int, function: Callable, *args,
+             headers_function: Callable[[], Optional[dict]] = None, **kwargs):
+        attempt = 0
+        while True:
+            self.acquire(endpoint, weight)
+            started = time.perf_counter()
+            try:
+                result = function(*args, **kwargs)
+            except Exception as e:
+                self.handle_error(endpoint, e, attempt)
+                attempt += 1
+                continue
+            finally:
+                self.record_call(endpoint, time.perf_counter() - started)
+            if headers_function is not None:
+                self.observe(headers_function())
+            return result
+
+    async def call_async(self, endpoint: str, weight: int, function: Callable, *args, **kwargs):
+        attempt = 0
+        while True:
+            await self.acquire_async(endpoint, weight)
+            started = time.perf_counter()
+            try:
+                return await function(*args, **kwargs)
+            except Exception as e:
+                self.handle_error(endpoint, e, attempt)
+                attempt += 1
+            finally:
+                self.record_call(endpoint, time.perf_counter() - started)
+
+    def record_call(self, endpoint: str, seconds: float):
+        self.count(endpoint, calls=1, call_seconds=seconds)
+        self.request_seconds.observe(seconds, endpoint=endpoint, **self.metrics_labels)
+
+    def get_stats(self) -> Dict[str, dict]:
+        with self.lock:
+            return {endpoint: stats.as_dict() for endpoint, stats in self.endpoints.items()}
+
+    def log_stats(self, log: logging.Logger = logger):
+        for endpoint, stats in sorted(self.get_stats().items()):
+            log.info('%s %s: %d calls, weight %d, %d errors, %d rate limited, %d retries, waited %.1fs, avg %.3fs',
+                     self.name, endpoint, stats["calls"], stats["weight"], stats["errors"], stats["rate_limited"],
+                     stats["retries"], stats["waited_seconds"], stats["avg_call_seconds"])
+
+
+rate_limiters: Dict[str, RateLimiter] = {}
+rate_limiters_lock = threading.Lock()
+
+
+# Returns the rate limiter of an exchange, all clients of the same exchange share one bucket.
+def get_rate_limiter(name: str, capacity: int, **kwargs) -> RateLimiter:
+    with rate_limiters_lock:
+        rate_limiter = rate_limiters.get(name)
+        if rate_limiter is None:
+            rate_limiter = rate_limiters[name] = RateLimiter(name, capacity, **kwargs)
+        return rate_limiter
@@ -7,3 +7,37 @@ class AccountCollection(object):
 
     def __str__(self):
         return f"AccountCollection(security={self.security}, asset_account={self.asset_account}, expense_account={self.expense_account}, revenue_account={self.revenue_account})"
+
+
+# Account collections indexed by security and by the currency code/symbol of their asset account,
+# so every trade, withdrawal or deposit resolves its accounts with dict lookups.
+# Securities are normalised like the trading pairs (OPC is traded as OP), while the asset account may still be kept
+# in OPC, so commission assets fall back to the security of a collection.
+class AccountCollectionIndex(object):
+    def __init__(self, account_collections):
+        self.account_collections = list(account_collections)
+        self.by_security = {}
+        self.by_commission_asset = {}
+        for account_collection in self.account_collections:
+            self.by_security[account_collection.security] = account_collection
+            attributes = account_collection.asset_account.attributes
+            for currency in (attributes.currency_code, attributes.currency_symbol):
+                if currency is not None:
+                    self.by_commission_asset[currency] = account_collection
+        for account_collection in self.account_collections:
+            self.by_commission_asset.setdefault(account_collection.security, account_collection)
+
+    def get_by_security(self, security):
+        return self.by_security.get(security if security != 'OPC' else 'OP')
+
+    def get_by_commission_asset(self, commission_asset):
+        account_collection = self.by_commission_asset.get(commission_asset)
+        if account_collection is None and commission_asset == 'OPC':
+            account_collection = self.by_commission_asset.get('OP')
+        return account_collection
+
+    def __iter__(self):
+        return iter(self.account_collections)
+
+    def __len__(self):
+        return len(self.account_collections)
@@ -0,0 +1,108 @@
+import threading
+import time
+
+import metrics
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+# In-memory index over all Firefly III accounts, loaded with one listing and shared by every account lookup.
+class AccountIndex(object):
+    def __init__(self, load_accounts, ttl_seconds: int):
+        self.load_accounts = load_accounts
+        self.ttl_seconds = ttl_seconds
+        self.lock = threading.RLock()
+        self.loaded_at = None
+        self.accounts_by_type = {}
+        self.accounts_by_type_and_currency = {}
+        self.lookups = {}
+        self.loads = 0
+        self.hits = 0
+        self.misses = 0
+        # lookups since the last load which would each have listed the accounts in Firefly III without the index
+        self.saved_calls = 0
+
+    def is_stale(self) -> bool:
+        return self.loaded_at is None or time.monotonic() - self.loaded_at > self.ttl_seconds
+
+    def invalidate(self):
+        with self.lock:
+            self.loaded_at = None
+
+    def ensure_loaded(self) -> bool:
+        # returns whether the accounts had to be listed
+        with self.lock:
+            if not self.is_stale():
+                return False
+
+            accounts_by_type = {}
+            accounts_by_type_and_currency = {}
+            for account in self.load_accounts():
+                account_type = account.attributes.type
+                accounts_by_type.setdefault(account_type, []).append(account)
+                currencies = {account.attributes.currency_code, account.attributes.currency_symbol}
+                for currency in currencies:
+                    if currency is not None:
+                        accounts_by_type_and_currency.setdefault((account_type, currency), []).append(account)
+
+            self.accounts_by_type = accounts_by_type
+            self.accounts_by_type_and_currency = accounts_by_type_and_currency
+            self.lookups = {}
+            self.loads += 1
+            self.saved_calls = 0
+            self.loaded_at = time.monotonic()
+            return True
+
+    def count_saved_call(self, lookup: str):
+        self.saved_calls += 1
+        metrics.firefly_calls_saved_total.inc(lookup=lookup)
+
+    def get_accounts(self, account_type):
+        self.ensure_loaded()
+        return list(self.accounts_by_type.get(account_type, []))
+
+    def find_all(self, account_type, notes_keyword, security=None):
+        key = (account_type, notes_keyword, security)
+        with self.lock:
+            if not self.ensure_loaded():
+                self.count_saved_call("find_all")
+            if key in self.lookups:
+                self.hits += 1
+                return self.lookups.get(key)
+
+            self.misses += 1
+            if security is None:
+                candidates = self.accounts_by_type.get(account_type, [])
+            else:
+                candidates = self.accounts_by_type_and_currency.get((account_type, security), [])
+            result = [
+                account for account in candidates
+                if account.attributes.notes is not None and notes_keyword in account.attributes.notes
+            ]
+            self.lookups[key] = result
+            return result
+
+    def memoize(self, key, compute, lookup="memoize"):
+        # caches a value derived from the accounts until they are listed again, i.e. for one sync
+        with self.lock:
+            if not self.is_stale() and key in self.lookups:
+                self.hits += 1
+                self.count_saved_call(lookup)
+                return self.lookups.get(key)
+
+            self.misses += 1
+            result = compute()
+            self.lookups[key] = result
+            return result
+
+    def find(self, account_type, notes_keyword, security=None):
+        accounts = self.find_all(account_type, notes_keyword, security)
+        return accounts[0] if len(accounts) > 0 else None
+
+    def get_stats(self):
+        return {"loads": self.loads, "hits": self.hits, "misses": self.misses}
+
+    def log_stats(self, log=logger):
+        log.debug("Account index: %d loads, %d hits, %d misses, %d Firefly III account listings saved since the last load",
+                  self.loads, self.hits, self.misses, self.saved_calls)
@@ -0,0 +1,30 @@
+from typing import Iterable, Optional
+
+
+# Inverted index from public ledger address to the Firefly III account mappings of handle_unclassified_transactions
+# ({"addresses", "account", "code"}), built once per reclassification run. A ledger transaction is classified with
+# one lookup per input or output address instead of comparing it with every address of every account.
+class AddressIndex(object):
+    def __init__(self, account_address_mapping: dict):
+        self.accounts_by_address = {}
+        # the position keeps the order of the mapping, the first matching account wins like before
+        for position, account_mapping in enumerate(account_address_mapping.values()):
+            for address in account_mapping.get("addresses"):
+                accounts = self.accounts_by_address.setdefault(address, [])
+                if len(accounts) == 0 or accounts[-1][0] != position:
+                    accounts.append((position, account_mapping))
+
+    def find(self, ledger_addresses: Iterable[str], currency_codes: Iterable[str]) -> Optional[dict]:
+        currency_codes = set(currency_codes)
+        match = None
+        for ledger_address in ledger_addresses:
+            for position, account_mapping in self.accounts_by_address.get(ledger_address, ()):
+                if match is not None and position >= match[0]:
+                    break
+                if account_mapping.get("code") in currency_codes:
+                    match = (position, account_mapping)
+                    break
+        return None if match is None else match[1]
+
+    def __len__(self):
+        return len(self.accounts_by_address)
@@ -0,0 +1,120 @@
+import socket
+import threading
+import time
+from contextlib import contextmanager
+
+import firefly_iii_client
+from urllib3.connection import HTTPConnection
+
+import metrics
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class CallStats(object):
+    def __init__(self):
+        self.calls = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+
+    def record(self, latency):
+        self.calls += 1
+        self.total_latency += latency
+        self.max_latency = max(self.max_latency, latency)
+
+    def to_dict(self):
+        return {
+            "calls": self.calls,
+            "total_latency": self.total_latency,
+            "avg_latency": self.total_latency / self.calls if self.calls > 0 else 0.0,
+            "max_latency": self.max_latency,
+        }
+
+
+# One long-lived ApiClient (and with it one urllib3 connection pool) shared by every FireflyWrapper of the process.
+class FireflyClientPool(object):
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.configuration = None
+        self.api_client = None
+        self.clients_created = 0
+        self.clients_reused = 0
+        self.stats_by_call = {}
+
+    def configure(self, configuration: firefly_iii_client.Configuration, pool_size: int, keep_alive: bool):
+        configuration.connection_pool_maxsize = pool_size
+        if keep_alive:
+            configuration.socket_options = HTTPConnection.default_socket_options + [
+                (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+            ]
+        with self.lock:
+            self.configuration = configuration
+
+    def get_client(self) -> firefly_iii_client.ApiClient:
+        with self.lock:
+            if self.configuration is None:
+                raise Exception("The Firefly III client pool is not configured. Connect to Firefly III first.")
+            if self.api_client is None:
+                self.api_client = firefly_iii_client.ApiClient(self.configuration)
+                self.clients_created += 1
+            else:
+                self.clients_reused += 1
+            return self.api_client
+
+    @contextmanager
+    def client(self, call_name: str = "unknown"):
+        api_client = self.get_client()
+        started_at = time.perf_counter()
+        try:
+            yield api_client
+        finally:
+            latency = time.perf_counter() - started_at
+            with self.lock:
+                self.stats_by_call.setdefault(call_name, CallStats()).record(latency)
+            metrics.firefly_request_seconds.observe(latency, call=call_name)
+
+    def get_connection_stats(self):
+        # urllib3 counts every request and every new connection per host pool, the difference are reused connections
+        requests = 0
+        connections = 0
+        api_client = self.api_client
+        if api_client is not None:
+            pool_manager = api_client.rest_client.pool_manager
+            for key in list(pool_manager.pools.keys()):
+                pool = pool_manager.pools.get(key)
+                if pool is None:
+                    continue
+                requests += pool.num_requests
+                connections += pool.num_connections
+        return {"requests": requests, "connections": connections, "reused_connections": max(requests - connections, 0)}
+
+    def get_stats(self):
+        with self.lock:
+            calls = {call_name: stats.to_dict() for call_name, stats in self.stats_by_call.items()}
+            result = {
+                "clients_created": self.clients_created,
+                "clients_reused": self.clients_reused,
+                "calls": calls,
+            }
+        result.update(self.get_connection_stats())
+        return result
+
+    def log_stats(self):
+        stats = self.get_stats()
+        logger.info("Firefly III client: %d requests over %d connections (%d reused).",
+                    stats.get("requests"), stats.get("connections"), stats.get("reused_connections"))
+        for call_name, call_stats in sorted(stats.get("calls").items()):
+            logger.debug("Firefly III client: %s called %d times, avg %.3fs, max %.3fs", call_name,
+                         call_stats.get("calls"), call_stats.get("avg_latency"), call_stats.get("max_latency"))
+
+    def close(self):
+        with self.lock:
+            api_client = self.api_client
+            self.api_client = None
+        if api_client is not None:
+            api_client.rest_client.pool_manager.clear()
+
+
+client_pool = FireflyClientPool()
@@ -2,6 +2,7 @@ from __future__ import print_function
 
 import datetime
 import hashlib
+import re
 from typing import List
 
 import firefly_iii_client
@@ -9,7 +10,9 @@ import urllib3
 from firefly_iii_client import ApiException, TransactionTypeProperty
 
 import config
+import metrics
 
+from model.amount import format_amount
 from model.savings import InterestDue
 from model.transaction import TransactionType
 from model.withdrawal_deposit import WithdrawalData, DepositData
@@ -17,7 +20,14 @@ from model.withdrawal_deposit import WithdrawalData, DepositData
 import logging
 
 from backends.firefly.transaction_collection import TransactionCollection
-from backends.firefly.account_collection import AccountCollection
+from backends.firefly.account_collection import AccountCollection, AccountCollectionIndex
+from backends.firefly.client_pool import client_pool
+from backends.firefly.account_index import AccountIndex
+from backends.firefly.address_index import AddressIndex
+from backends.firefly.pagination import paginate
+from backends.firefly.transaction_writer import TransactionWriter, WriteStep, WriteOutcome
+from storage.dedup_ledger import DedupLedger, RECORD_TRADE, RECORD_COMMISSION, RECORD_WITHDRAWAL, RECORD_DEPOSIT, \
+    RECORD_INTEREST
 
 # Set up logger for this module
 logger = logging.getLogger(__name__)
@@ -30,14 +40,14 @@ SERVICE_IDENTIFICATION = "crypto-trades-firefly-iii"
 
 def api(func):
     def wrapper(*args, **kwargs):
-        with firefly_iii_client.ApiClient(firefly_config) as api_client:
+        with client_pool.client(func.__name__) as api_client:
             return func(args[0], api_client, *args[1:], **kwargs)
     return wrapper
 
 def api_service(service_class: type):
     def wrapper(func):
         def wrapper(*args, **kwargs):
-            with firefly_iii_client.ApiClient(firefly_config) as api_client:
+            with client_pool.client(func.__name__) as api_client:
                 return func(args[0], service_class(api_client), *args[1:], **kwargs)
         return wrapper
     return wrapper
@@ -46,6 +56,12 @@ class FireflyWrapper:
     def __init__(self, trading_platform):
         self.log = logging.getLogger("[" + trading_platform.upper() + "] [FIREFLY_WRAPPER]")
         self.trading_platform = trading_platform
+        self.account_index = AccountIndex(self.list_all_accounts, config.firefly_account_cache_ttl)
+        self.writer = TransactionWriter(self.store_transaction, config.firefly_write_workers, config.firefly_write_retries,
+                                        max_pending=config.firefly_write_queue_size, name=trading_platform,
+                                        debug=config.debug)
+        self.dedup_ledger = DedupLedger() if config.firefly_dedup_ledger else None
+        self.known_records_skipped = 0
 
     def default_key(self, key=None):
         if key is None:
@@ -97,8 +113,9 @@ class FireflyWrapper:
 
             configuration.verify_ssl = config.firefly_verify_ssl
             configuration.access_token = config.firefly_access_token
+            client_pool.configure(configuration, config.firefly_pool_size, config.firefly_keep_alive)
 
-            with firefly_iii_client.ApiClient(configuration) as api_client:
+            with client_pool.client("get_about") as api_client:
                 about = firefly_iii_client.AboutApi(api_client).get_about()
                 logger.info(f"Connected to Firefly III {about.data.version}")
 
@@ -112,62 +129,87 @@ class FireflyWrapper:
 
 
     @api_service(firefly_iii_client.AccountsApi)
-    def get_symbols_and_codes(self, accounts_api: firefly_iii_client.AccountsApi):
-        asset_accounts = []
+    def list_all_accounts(self, accounts_api: firefly_iii_client.AccountsApi, account_type=None):
+        return list(paginate(accounts_api.list_account, limit=config.firefly_page_size, type=account_type))
 
-        try:
-            accounts = []
-
-            paging = True
-            page = 1
-            while paging:
-                get_accounts_response = accounts_api.list_account(page=page)
 
-                accounts.extend(get_accounts_response.data)
-
-                if get_accounts_response.meta.pagination.total_pages > page:
-                    page += 1
-                else:
-                    paging = False
+    def get_symbols_and_codes(self):
+        # computed once per sync, the account index drops it when the accounts are listed again
+        return list(self.account_index.memoize(("symbols_and_codes", self.get_acc_fund_key()),
+                                               self.find_symbols_and_codes, lookup="symbols_and_codes"))
 
-            for account in accounts:
-                if account.attributes.type == 'asset':
-                    asset_accounts.append(account)
 
-            list_of_symbols_and_codes = []
-            relevant_accounts = []
-
-            notes_identifier = self.get_acc_fund_key()
-
-            for account in asset_accounts:
-                notes = account.attributes.notes
-                if notes is not None:
-                    if notes_identifier in notes:
-                        relevant_accounts.append(account)
+    def find_symbols_and_codes(self):
+        try:
+            relevant_accounts = self.account_index.find_all('asset', self.get_acc_fund_key())
 
             logger.info(f"{self.trading_platform}: {len(relevant_accounts)} relevant accounts found within your Firefly III instance.")
             for relevant_account in relevant_accounts:
                 logger.info(f'{self.trading_platform}:   - "{relevant_account.attributes.name}"')
 
+            # exact matches only, a substring check would drop e.g. "BTC" once "WBTC" is known
+            symbols_and_codes = {}
             for account in relevant_accounts:
-                if not any(account.attributes.currency_code in s for s in list_of_symbols_and_codes):
-                    list_of_symbols_and_codes.append(account.attributes.currency_code if account.attributes.currency_code != 'OPC' else 'OP')
-                if not any(account.attributes.currency_symbol in s for s in list_of_symbols_and_codes):
-                    list_of_symbols_and_codes.append(account.attributes.currency_symbol if account.attributes.currency_symbol != 'OPC' else 'OP')
+                for code in (account.attributes.currency_code, account.attributes.currency_symbol):
+                    if code is not None:
+                        symbols_and_codes.setdefault(code if code != 'OPC' else 'OP')
 
-            return list_of_symbols_and_codes
+            return tuple(symbols_and_codes)
         except Exception as e:
             logger.error('There was an error getting the accounts', exc_info=config.debug)
             exit(-601)
 
 
-    @api_service(firefly_iii_client.TransactionsApi)
-    def write_new_received_interest_as_transaction(self, tx_api: firefly_iii_client.TransactionsApi, received_interest, account_collection):
+    def store_transaction(self, new_transaction: firefly_iii_client.TransactionStore):
+        with client_pool.client("store_transaction") as api_client:
+            firefly_iii_client.TransactionsApi(api_client).store_transaction(new_transaction)
+
+
+    def flush_writes(self):
+        return self.writer.flush()
+
+
+    def is_known_record(self, kind, external_id):
+        if self.dedup_ledger is None or not self.dedup_ledger.contains(self.trading_platform, kind, external_id):
+            return False
+        self.known_records_skipped += 1
+        metrics.records_total.inc(exchange=self.trading_platform, kind=kind, outcome="known")
+        return True
+
+
+    def remember_record(self, kind, external_id):
+        def on_result(result):
+            if self.dedup_ledger is not None and result.outcome in (WriteOutcome.CREATED, WriteOutcome.DUPLICATE):
+                self.dedup_ledger.add(self.trading_platform, kind, external_id)
+        return on_result
+
+
+    def log_dedup_stats(self, log=logger):
+        if self.known_records_skipped > 0:
+            log.info("Skipped %d records already known from the local dedup ledger.", self.known_records_skipped)
+        self.known_records_skipped = 0
+
+
+    def get_received_interest_id(self, received_interest):
+        return self.hash_unclassifiable(received_interest.amount, received_interest.date, None,
+                                        received_interest.currency, [received_interest.due.name])
+
+
+    def write_new_received_interest_as_transaction(self, received_interest, account_collection):
+        interest_id = self.get_received_interest_id(received_interest)
+        if self.is_known_record(RECORD_INTEREST, interest_id):
+            return
+        new_transaction = self.build_received_interest_transaction(received_interest, account_collection)
+        self.writer.submit([WriteStep(f"received interest in {received_interest.currency}", new_transaction,
+                                      self.remember_record(RECORD_INTEREST, interest_id), RECORD_INTEREST)])
+
+
+    def build_received_interest_transaction(self, received_interest, account_collection):
         list_inner_transactions = []
 
         currency_code = account_collection.asset_account.attributes.currency_code
         currency_symbol = account_collection.asset_account.attributes.currency_symbol
-        amount = received_interest.amount
+        amount = format_amount(received_interest.amount)
         description = self.trading_platform + " | INTEREST | Currency: " + currency_code
 
         if received_interest.due == InterestDue.DAILY:
@@ -199,29 +241,15 @@ class FireflyWrapper:
         )
         # split.import_hash_v2 = hash_transaction(split.amount, split.date, split.description, "", split.source_name, split.destination_name, split.tags)
         list_inner_transactions.append(split)
-        new_transaction = firefly_iii_client.TransactionStore(apply_rules=False, transactions=list_inner_transactions, error_if_duplicate_hash=True)
-
-        try:
-            logger.info(f"{self.trading_platform}:   - Writing a new received interest.")
-            tx_api.store_transaction(new_transaction)
-        except ApiException as e:
-            if e.status == 422 and "Duplicate of transaction" in e.body:
-                logger.warning(f"{self.trading_platform}:   - Duplicate received interest detected.")
-            else:
-                message: str = f"{self.trading_platform}:   - There was an unknown error writing a new received interest."
-                logger.error(message, exc_info=config.debug)
-        except Exception as e:
-            message: str = f"{self.trading_platform}:   - There was an unknown error writing a new received interest."
-            logger.error(message, exc_info=config.debug)
+        return firefly_iii_client.TransactionStore(apply_rules=False, transactions=list_inner_transactions, error_if_duplicate_hash=True)
 
 
-    @api_service(firefly_iii_client.TransactionsApi)
-    def write_commission(self, tx_api: firefly_iii_client.TransactionsApi, transaction_collection: TransactionCollection):
+    def build_commission_transaction(self, transaction_collection: TransactionCollection):
         list_inner_transactions = []
 
         currency_code = transaction_collection.from_commission_account.currency_code
         currency_symbol = transaction_collection.from_commission_account.currency_symbol
-        amount = transaction_collection.trade_data.commission_amount
+        amount = format_amount(transaction_collection.trade_data.commission_amount)
         description = self.trading_platform + " | FEE | Currency: " + currency_code
 
         tags = [self.trading_platform.lower()]
@@ -246,17 +274,7 @@ class FireflyWrapper:
         )
         # split.import_hash_v2 = hash_transaction(split.amount, split.date, split.description, split.external_id, split.source_name, split.destination_name, split.tags)
         list_inner_transactions.append(split)
-        new_transaction = firefly_iii_client.TransactionStore(apply_rules=False, transactions=list_inner_transactions, error_if_duplicate_hash=True)
-
-        try:
-            tx_api.store_transaction(new_transaction)
-            logger.info(f"Successfully wrote a new paid commission #{transaction_collection.trade_data.id}")
-        except ApiException as e:
-            if e.status == 422 and "Duplicate of transaction" in e.body:
-                logger.debug(f"Duplicate commission transaction #{transaction_collection.trade_data.id}")
-            else:
-                message: str = f"There was an unknown error writing a new paid commission. Here's the trade id: '{transaction_collection.trade_data.id}'"
-                logger.error(message, exc_info=config.debug)
+        return firefly_iii_client.TransactionStore(apply_rules=False, transactions=list_inner_transactions, error_if_duplicate_hash=True)
 
 
     def hash_unclassifiable(self, amount, date, external_id, currency_code: str, tags: List[str]):
@@ -278,80 +296,55 @@ class FireflyWrapper:
 
 
 
-    @api_service(firefly_iii_client.AccountsApi)
-    def get_accounts_from_firefly(self, accounts_api: firefly_iii_client.AccountsApi, supported_blockchain, account_type, notes_keywords):
-        result = []
+    def get_accounts_from_firefly(self, supported_blockchain, account_type, notes_keywords):
         try:
-            accounts = []
-            page = 0
-            load_again = True
-            while load_again:
-                new_accounts = accounts_api.list_account(page=page).data
-                accounts.extend(new_accounts)
-                if len(new_accounts) < 50:
-                    load_again = False
-                else:
-                    page += 1
-
-            for account in accounts:
-                if account.attributes.type == account_type and \
-                        account.attributes.notes is not None and \
-                        notes_keywords in account.attributes.notes and \
-                        (account.attributes.currency_code == supported_blockchain or
-                        account.attributes.currency_symbol == supported_blockchain):
-                    result.append(account)
+            return self.account_index.find_all(account_type, notes_keywords, supported_blockchain)
         except Exception:
             logger.error('There was an error getting the accounts from Firefly III', exc_info=config.debug)
             exit(-604)
-        return result
 
 
-    @api_service(firefly_iii_client.TransactionsApi)
-    def get_transactions(self, tx_api: firefly_iii_client.TransactionsApi, notes_keyword, supported_blockchains):
+    def get_transactions(self, notes_keyword, supported_blockchains):
+        transactions, _ = self.get_transactions_since(notes_keyword, supported_blockchains)
+        return transactions
+
+
+    @api_service(firefly_iii_client.SearchApi)
+    def get_transactions_since(self, search_api: firefly_iii_client.SearchApi, notes_keyword, supported_blockchains,
+                               after_id=None, start_date=None):
+        # Firefly III filters by notes (and date) on the server, only transaction ids above after_id are examined.
+        # Returns the matching transactions and the highest examined transaction id, the next high-water mark.
+        query = 'notes_contains:"' + notes_keyword + '"'
+        if start_date is not None:
+            query += ' date_after:' + start_date
+        currency_codes = {supported_blockchains.get(s).get_currency_code() for s in supported_blockchains}
+
         result = []
+        highest_id = None
         try:
-            transactions = []
-            page = 0
-            load_next = True
-            while load_next:
-                next_transactions = tx_api.list_transaction(type="all", page=page).data
-                transactions.extend(next_transactions)
-                if len(next_transactions) < 50:
-                    load_next = False
-                else:
-                    page += 1
-            for transaction in transactions:
+            for transaction in paginate(search_api.search_transactions, limit=config.firefly_page_size, query=query):
+                transaction_id = int(transaction.id)
+                if after_id is not None and transaction_id <= after_id:
+                    continue
+                highest_id = transaction_id if highest_id is None else max(highest_id, transaction_id)
                 for inner_transaction in transaction.attributes.transactions:
                     if inner_transaction.notes is not None and \
                             notes_keyword in inner_transaction.notes and \
-                            (any(inner_transaction.currency_code == supported_blockchains.get(s).get_currency_code() for s in supported_blockchains) or
-                            any(inner_transaction.currency_symbol == supported_blockchains.get(s).get_currency_code() for s in supported_blockchains)):
+                            (inner_transaction.currency_code in currency_codes or inner_transaction.currency_symbol in currency_codes):
                         result.append(transaction)
                         break
         except Exception as e:
             logger.error('There was an error getting the transactions from Firefly III', exc_info=config.debug)
             exit(-604)
-        return result
+        return result, highest_id
 
 
-    @api_service(firefly_iii_client.AccountsApi)
-    def get_account_from_firefly(self, accounts_api: firefly_iii_client.AccountsApi, security, account_type, notes_keywords):
+    def get_account_from_firefly(self, security, account_type, notes_keywords):
         try:
-            accounts = accounts_api.list_account().data
-
-            for account in accounts:
-                if account.attributes.type == account_type and \
-                        account.attributes.notes is not None and \
-                        notes_keywords in account.attributes.notes:
-                    if security is None:
-                        return account
-                    else:
-                        if account.attributes.currency_code == security or account.attributes.currency_symbol == security:
-                            return account
+            return self.account_index.find(account_type, notes_keywords, security)
         except Exception as e:
             logger.error('There was an error getting the accounts from Firefly III', exc_info=config.debug)
             exit(-604)
-        return None
 
     def get_firefly_accounts_for_crypto_currency(self, supported_blockchain, identifier):
         return self.get_accounts_from_firefly(supported_blockchain, 'asset', identifier)
@@ -384,70 +377,71 @@ class FireflyWrapper:
         return AccountCollection(security, asset_account, expense_account, revenue_account)
 
     def get_firefly_account_collections_for_pairs(self, list_of_trading_pairs):
-        result = []
-
-        relevant_securities = []
+        relevant_securities = {}
         for trading_pair in list_of_trading_pairs:
-            if any(trading_pair.security in s for s in relevant_securities):
-                continue
-            relevant_securities.append(trading_pair.security)
+            relevant_securities.setdefault(trading_pair.security)
         for trading_pair in list_of_trading_pairs:
-            if any(trading_pair.currency in s for s in relevant_securities):
-                continue
-            relevant_securities.append(trading_pair.currency)
-        for relevant_security in relevant_securities:
-            result.append(self.create_firefly_account_collection(relevant_security))
+            relevant_securities.setdefault(trading_pair.currency)
 
-        return result
+        return AccountCollectionIndex(
+            self.create_firefly_account_collection(relevant_security) for relevant_security in relevant_securities
+        )
 
-    def import_received_interests(self, received_interests, firefly_account_collections):
+    def import_received_interests(self, received_interests, firefly_account_collections: AccountCollectionIndex):
         for received_interest in received_interests:
-            for account_collection in firefly_account_collections:
-                if received_interest.currency == account_collection.security:
-                    self.write_new_received_interest_as_transaction(received_interest, account_collection)
+            account_collection = firefly_account_collections.get_by_security(received_interest.currency)
+            if account_collection is not None:
+                self.write_new_received_interest_as_transaction(received_interest, account_collection)
+        self.flush_writes()
 
 
 
-    def import_withdrawals(self, withdrawals: List[WithdrawalData], firefly_account_collections):
+    def import_withdrawals(self, withdrawals: List[WithdrawalData], firefly_account_collections: AccountCollectionIndex):
         for withdrawal in withdrawals:
-            for account_collection in firefly_account_collections:
-                if withdrawal.asset == account_collection.security:
-                    self.write_new_withdrawal(withdrawal, account_collection)
+            account_collection = firefly_account_collections.get_by_security(withdrawal.asset)
+            if account_collection is not None:
+                self.write_new_withdrawal(withdrawal, account_collection)
+        self.flush_writes()
 
 
 
-    def import_deposits(self, deposits, firefly_account_collections):
+    def import_deposits(self, deposits, firefly_account_collections: AccountCollectionIndex):
         for deposit in deposits:
-            for account_collection in firefly_account_collections:
-                if deposit.asset == account_collection.security:
-                    self.write_new_deposit(deposit, account_collection)
+            account_collection = firefly_account_collections.get_by_security(deposit.asset)
+            if account_collection is not None:
+                self.write_new_deposit(deposit, account_collection)
+        self.flush_writes()
 
 
-    def get_relevant_firefly_deposit_account(self, transaction_data, account_address_mapping):
-        for account_name in account_address_mapping:
-            account_mapping = account_address_mapping.get(account_name)
-            if not account_mapping.get("code") == transaction_data.get("firefly").attributes.transactions[0].currency_code and not account_mapping.get("code") == transaction_data.get("firefly").attributes.transactions[0].currency_symbol:
-                continue
-            for firefly_address in account_mapping.get("addresses"):
-                for ledger_addresses in transaction_data.get("ledger").ins:
-                    if firefly_address == ledger_addresses:
-                        return account_mapping
-        return None
-
+    def get_relevant_firefly_deposit_account(self, transaction_data, address_index: AddressIndex):
+        [inner_transaction] = transaction_data.get("firefly").attributes.transactions
+        return address_index.find(transaction_data.get("ledger").ins,
+                                  (inner_transaction.currency_code, inner_transaction.currency_symbol))
 
-    def get_relevant_firefly_withdrawal_account(self, transaction_data, account_address_mapping):
-        for account_name in account_address_mapping:
-            account_mapping = account_address_mapping.get(account_name)
-            if not account_mapping.get("code") == transaction_data.get("firefly").attributes.transactions[0].currency_code and not account_mapping.get("code") == transaction_data.get("firefly").attributes.transactions[0].currency_symbol:
-                continue
-            for firefly_address in account_mapping.get("addresses"):
-                for ledger_addresses in transaction_data.get("ledger").outs:
-                    if firefly_address == ledger_addresses:
-                        return account_mapping
-        return None
 
-    @api_service(firefly_iii_client.TransactionsApi)
-    def write_new_transaction(self, tx_api: firefly_iii_client.TransactionsApi, transaction_collection):
+    def get_relevant_firefly_withdrawal_account(self, transaction_data, address_index: AddressIndex):
+        [inner_transaction] = transaction_data.get("firefly").attributes.transactions
+        return address_index.find(transaction_data.get("ledger").outs,
+                                  (inner_transaction.currency_code, inner_transaction.currency_symbol))
+
+    def get_trade_record_id(self, ticker, trade_id):
+        # trade ids are only unique within a trading pair, e.g. on Binance, so the ledger keeps them by ticker
+        return ticker + ":" + str(trade_id)
+
+    def write_new_transaction(self, transaction_collection):
+        trade_id = transaction_collection.trade_data.id
+        trading_pair = transaction_collection.trade_data.trading_pair
+        record_id = self.get_trade_record_id(trading_pair.security + trading_pair.currency, trade_id)
+        if self.is_known_record(RECORD_TRADE, record_id):
+            return
+        self.writer.submit([
+            WriteStep(f"trade #{trade_id}", self.build_trade_transaction(transaction_collection),
+                      self.remember_record(RECORD_TRADE, record_id), RECORD_TRADE),
+            WriteStep(f"paid commission #{trade_id}", self.build_commission_transaction(transaction_collection),
+                      self.remember_record(RECORD_COMMISSION, record_id), RECORD_COMMISSION),
+        ])
+
+    def build_trade_transaction(self, transaction_collection):
             list_inner_transactions = []
             if transaction_collection.trade_data.type == TransactionType.BUY:
                 type_string = "BUY"
@@ -465,8 +459,8 @@ class FireflyWrapper:
                 foreign_currency_code = transaction_collection.to_ff_account.currency_code
                 foreign_currency_symbol = transaction_collection.to_ff_account.currency_symbol
 
-            amount = transaction_collection.trade_data.security_amount
-            foreign_amount = float(transaction_collection.trade_data.currency_amount)
+            amount = format_amount(transaction_collection.trade_data.security_amount)
+            foreign_amount = transaction_collection.trade_data.currency_amount
             tags = [self.trading_platform.lower()]
             if config.debug:
                 tags.append('dev')
@@ -493,25 +487,21 @@ class FireflyWrapper:
             )
             # split.import_hash_v2 = hash_transaction(split.amount, split.var_date, split.description, split.external_id, split.source_name, split.destination_name, split.tags)
             list_inner_transactions.append(split)
-            new_transaction = firefly_iii_client.TransactionStore(apply_rules=False, transactions=list_inner_transactions, error_if_duplicate_hash=True)
+            return firefly_iii_client.TransactionStore(apply_rules=False, transactions=list_inner_transactions, error_if_duplicate_hash=True)
 
-            try:
-                tx_api.store_transaction(new_transaction)
-                self.write_commission(transaction_collection)
-                logger.info(f"Successfully wrote a new trade #'{transaction_collection.trade_data.id}'")
-            except ApiException as e:
-                if e.status == 422 and "Duplicate of transaction" in e.body:
-                    logger.debug(f"Duplicated transaction #{transaction_collection.trade_data.id}")
-                else:
-                    message: str = f"Unknown error when writing a new trade #'{transaction_collection.trade_data.id}'"
-                    logger.error(message, exc_info=config.debug)
+    def write_new_withdrawal(self, withdrawal, account_collection):
+        if self.is_known_record(RECORD_WITHDRAWAL, withdrawal.transaction_id):
+            return
+        new_transaction = self.build_withdrawal_transaction(withdrawal, account_collection)
+        self.writer.submit([WriteStep(f"withdrawal '{withdrawal.transaction_id}'", new_transaction,
+                                      self.remember_record(RECORD_WITHDRAWAL, withdrawal.transaction_id), RECORD_WITHDRAWAL)])
 
-    @api_service(firefly_iii_client.TransactionsApi)
-    def write_new_withdrawal(self, tx_api: firefly_iii_client.TransactionsApi, withdrawal, account_collection):
+
+    def build_withdrawal_transaction(self, withdrawal, account_collection):
         list_inner_transactions = []
         currency_code = account_collection.asset_account.attributes.currency_code
         currency_symbol = account_collection.asset_account.attributes.currency_symbol
-        amount = withdrawal.amount
+        amount = format_amount(withdrawal.amount)
         tags = [self.trading_platform.lower()]
         description = self.trading_platform + " | WITHDRAWAL (unclassified) | Security: " + withdrawal.asset
 
@@ -533,25 +523,22 @@ class FireflyWrapper:
         )
         # split.import_hash_v2 = hash_unclassifiable(split.amount, split.date, split.external_id, trading_platform, currency_code, split.tags)
         list_inner_transactions.append(split)
-        new_transaction = firefly_iii_client.TransactionStore(apply_rules=False, transactions=list_inner_transactions, error_if_duplicate_hash=True)
+        return firefly_iii_client.TransactionStore(apply_rules=False, transactions=list_inner_transactions, error_if_duplicate_hash=True)
 
-        try:
-            logger.info(f"Writing a new withdrawal.")
-            tx_api.store_transaction(new_transaction)
-        except ApiException as e:
-            if e.status == 422 and "Duplicate of transaction" in e.body:
-                logger.warning(f"Duplicate withdrawal transaction detected. Here's the transaction id: '{withdrawal.transaction_id}'")
-            else:
-                message: str = f"There was an unknown error writing a new withdrawal. Here's the transaction id: '{withdrawal.transaction_id}'"
-                logger.error(message, exc_info=config.debug)
 
+    def write_new_deposit(self, deposit: DepositData, account_collection):
+        if self.is_known_record(RECORD_DEPOSIT, deposit.transaction_id):
+            return
+        new_transaction = self.build_deposit_transaction(deposit, account_collection)
+        self.writer.submit([WriteStep(f"deposit '{deposit.transaction_id}'", new_transaction,
+                                      self.remember_record(RECORD_DEPOSIT, deposit.transaction_id), RECORD_DEPOSIT)])
 
-    @api_service(firefly_iii_client.TransactionsApi)
-    def write_new_deposit(self, tx_api: firefly_iii_client.TransactionsApi, deposit: DepositData, account_collection):
+
+    def build_deposit_transaction(self, deposit: DepositData, account_collection):
         list_inner_transactions = []
         currency_code = account_collection.asset_account.attributes.currency_code
         currency_symbol = account_collection.asset_account.attributes.currency_symbol
-        amount = deposit.amount
+        amount = format_amount(deposit.amount)
         tags = [self.trading_platform.lower()]
         description = self.trading_platform + " | DEPOSIT (unclassified) | Security: " + deposit.asset
 
@@ -573,17 +560,7 @@ class FireflyWrapper:
         )
         # split.import_hash_v2 = hash_unclassifiable(split.amount, split.date, split.external_id, trading_platform, currency_code, split.tags)
         list_inner_transactions.append(split)
-        new_transaction = firefly_iii_client.TransactionStore(apply_rules=False, transactions=list_inner_transactions, error_if_duplicate_hash=True)
-
-        try:
-            logger.info(f"Writing a new deposit.")
-            tx_api.store_transaction(new_transaction)
-        except ApiException as e:
-            if e.status == 422 and "Duplicate of transaction" in e.body:
-                logger.warning(f"{self.trading_platform}:   - Duplicate deposit transaction detected. Here's the trade id: '{deposit.transaction_id}'")
-            else:
-                message: str = f"There was an unknown error writing a new deposit. Here's the transaction id: '{deposit.transaction_id}'"
-                logger.error(message, exc_info=config.debug)
+        return firefly_iii_client.TransactionStore(apply_rules=False, transactions=list_inner_transactions, error_if_duplicate_hash=True)
 
 
     @api_service(firefly_iii_client.TransactionsApi)
@@ -678,16 +655,79 @@ class FireflyWrapper:
             logger.error(message, exc_info=config.debug)
 
 
+    def get_record_kind_from_description(self, description):
+        if not description.startswith(self.trading_platform + " | "):
+            return None
+        if " | BUY | " in description or " | SELL | " in description:
+            return RECORD_TRADE
+        if " | FEE | " in description:
+            return RECORD_COMMISSION
+        if " | WITHDRAWAL" in description:
+            return RECORD_WITHDRAWAL
+        if " | DEPOSIT" in description:
+            return RECORD_DEPOSIT
+        return None
+
+
+    @api_service(firefly_iii_client.TransactionsApi)
+    def rebuild_dedup_ledger(self, tx_api: firefly_iii_client.TransactionsApi):
+        if self.dedup_ledger is None:
+            logger.warning("The local dedup ledger is disabled, nothing to rebuild.")
+            return 0
+
+        records = set()
+        # the ticker of a trade is part of its description, the one of its commission is taken from the trades with
+        # the same external id and date (all of them, if trades of several pairs share both)
+        tickers_of_trades = {}
+        commissions = []
+        for transaction in paginate(tx_api.list_transaction, limit=config.firefly_page_size, type="all"):
+            for inner_transaction in transaction.attributes.transactions:
+                if inner_transaction.notes is None or SERVICE_IDENTIFICATION not in inner_transaction.notes:
+                    continue
+                kind = self.get_record_kind_from_description(inner_transaction.description)
+                if kind == RECORD_TRADE:
+                    ticker = re.search(r" \| Ticker (\S+)$", inner_transaction.description)
+                    if ticker is None or not inner_transaction.external_id:
+                        continue
+                    tickers_of_trades.setdefault((inner_transaction.external_id, inner_transaction.var_date), set()) \
+                        .add(ticker.group(1))
+                    records.add((self.trading_platform, kind,
+                                 self.get_trade_record_id(ticker.group(1), inner_transaction.external_id)))
+                elif kind == RECORD_COMMISSION:
+                    commissions.append(inner_transaction)
+                elif kind is not None:
+                    records.add((self.trading_platform, kind, inner_transaction.external_id))
+        for commission in commissions:
+            for ticker in tickers_of_trades.get((commission.external_id, commission.var_date), ()):
+                records.add((self.trading_platform, RECORD_COMMISSION, self.get_trade_record_id(ticker, commission.external_id)))
+
+        self.dedup_ledger.clear(self.trading_platform)
+        self.dedup_ledger.add_many(records)
+        logger.info(f"{self.trading_platform}: rebuilt the local dedup ledger with {self.dedup_ledger.count(self.trading_platform)} records.")
+        return len(records)
+
+
     def rewrite_unclassified_transactions(self, transactions, account_address_mapping):
+        # returns the Firefly III ids of the rewritten transactions, the others did not match any account
         logger.info("Rewriting %d deposits/withdrawals.", len(transactions))
+        address_index = AddressIndex(account_address_mapping)
+        rewritten_ids = set()
 
         for transaction in transactions:
             transaction_data = transactions.get(transaction)
             [inner_transaction] = transaction_data.get("firefly").attributes.transactions
             if self.trading_platform + " | DEPOSIT (unclassified) | Security: " in inner_transaction.description:
-                relevant_firefly_account = self.get_relevant_firefly_deposit_account(transaction_data, account_address_mapping)
-                self.rewrite_unclassified_deposit_transaction(transaction_data, relevant_firefly_account)
+                relevant_firefly_account = self.get_relevant_firefly_deposit_account(transaction_data, address_index)
+                rewrite_function = self.rewrite_unclassified_deposit_transaction
             elif self.trading_platform + " | WITHDRAWAL (unclassified) | Security: " in inner_transaction.description:
-                relevant_firefly_account = self.get_relevant_firefly_withdrawal_account(transaction_data, account_address_mapping)
-                self.rewrite_unclassified_withdrawal_transaction(transaction_data, relevant_firefly_account)
+                relevant_firefly_account = self.get_relevant_firefly_withdrawal_account(transaction_data, address_index)
+                rewrite_function = self.rewrite_unclassified_withdrawal_transaction
+            else:
+                continue
+            if relevant_firefly_account is None:
+                logger.debug(f"No account matches the addresses of transaction '{inner_transaction.external_id}'")
+                continue
+            rewrite_function(transaction_data, relevant_firefly_account)
+            rewritten_ids.add(int(transaction_data.get("firefly").id))
+        return rewritten_ids
 
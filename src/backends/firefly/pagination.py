@@ -0,0 +1,19 @@
+from typing import Callable, Iterator
+
+
+# Streams the items of a paginated Firefly III list endpoint, e.g. paginate(accounts_api.list_account, limit=500, type='asset').
+# Filters which are None are not sent, so the server defaults apply.
+def paginate(list_function: Callable, limit: int = None, **filters) -> Iterator:
+    parameters = {name: value for name, value in filters.items() if value is not None}
+    if limit is not None:
+        parameters['limit'] = limit
+
+    page = 1
+    while True:
+        response = list_function(page=page, **parameters)
+        for item in response.data:
+            yield item
+
+        if len(response.data) == 0 or page >= response.meta.pagination.total_pages:
+            return
+        page += 1
@@ -0,0 +1,184 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from enum import Enum
+from typing import Callable, List
+
+import metrics
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class WriteOutcome(Enum):
+    CREATED = "created"
+    DUPLICATE = "duplicate"
+    ERROR = "error"
+    SKIPPED = "skipped"
+
+
+class WriteStep(object):
+    def __init__(self, label: str, payload, on_result: Callable = None, kind: str = "record"):
+        self.label = label
+        self.payload = payload
+        self.on_result = on_result
+        self.kind = kind
+
+
+class WriteResult(object):
+    def __init__(self, label: str, outcome: WriteOutcome, attempts: int, error: Exception = None):
+        self.label = label
+        self.outcome = outcome
+        self.attempts = attempts
+        self.error = error
+
+
+def is_duplicate_error(error) -> bool:
+    return getattr(error, 'status', None) == 422 and "Duplicate of transaction" in str(getattr(error, 'body', None) or '')
+
+
+def is_retryable_error(error) -> bool:
+    status = getattr(error, 'status', None)
+    return status is not None and (status == 429 or status >= 500)
+
+
+def get_retry_after(error):
+    headers = getattr(error, 'headers', None) or {}
+    try:
+        return float(headers.get('Retry-After'))
+    except (TypeError, ValueError):
+        return None
+
+
+# Queues TransactionStore payloads and stores them with bounded concurrency.
+# The steps of one submitted job are written in order, a step is only written if the one before was created,
+# e.g. the commission of a trade is only written if the trade itself is new.
+# At most max_pending jobs are queued, submit blocks until the workers caught up, which keeps streaming imports flat.
+# Finished jobs are dropped right away, only the outcome counts and the failed writes are kept until the next flush.
+class TransactionWriter(object):
+    def __init__(self, store_function: Callable, max_workers: int = 4, max_retries: int = 3, backoff_seconds: float = 1.0,
+                 max_pending: int = 1000, name: str = "firefly", debug: bool = False):
+        self.store_function = store_function
+        self.name = name
+        # tracebacks of failed writes are only logged with DEBUG, like everywhere else; the writes run outside of the
+        # except block, so the traceback is handed over with the error
+        self.debug = debug
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.executor = ThreadPoolExecutor(max_workers=max(max_workers, 1), thread_name_prefix="firefly-writer")
+        self.queue_slots = threading.BoundedSemaphore(max(max_pending, 1))
+        self.lock = threading.Lock()
+        self.pending = set()
+        self.errors: List[WriteResult] = []
+        self.reset_stats()
+
+    def reset_stats(self):
+        with self.lock:
+            self.started_at = None
+            self.finished_at = None
+            self.outcomes = {outcome: 0 for outcome in WriteOutcome}
+
+    def submit(self, steps: List[WriteStep]):
+        self.queue_slots.acquire()
+        with self.lock:
+            if self.started_at is None:
+                self.started_at = time.perf_counter()
+            future = self.executor.submit(self.write_steps, steps)
+            self.pending.add(future)
+        future.add_done_callback(self.finish)
+        return future
+
+    def finish(self, future):
+        with self.lock:
+            self.pending.discard(future)
+        self.queue_slots.release()
+        if future.exception() is not None:
+            logger.error("Writing a job failed", exc_info=future.exception())
+
+    def write_steps(self, steps: List[WriteStep]) -> List[WriteResult]:
+        results = []
+        previous_created = True
+        for step in steps:
+            if previous_created:
+                result = self.store(step)
+            else:
+                result = WriteResult(step.label, WriteOutcome.SKIPPED, 0)
+            previous_created = result.outcome == WriteOutcome.CREATED
+            results.append(result)
+
+            with self.lock:
+                self.outcomes[result.outcome] += 1
+                if result.outcome == WriteOutcome.ERROR:
+                    self.errors.append(result)
+            metrics.records_total.inc(exchange=self.name, kind=step.kind, outcome=result.outcome.value)
+            self.log_result(result)
+            if step.on_result is not None:
+                step.on_result(result)
+        return results
+
+    def store(self, step: WriteStep) -> WriteResult:
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                self.store_function(step.payload)
+                return WriteResult(step.label, WriteOutcome.CREATED, attempt)
+            except Exception as e:
+                if is_duplicate_error(e):
+                    return WriteResult(step.label, WriteOutcome.DUPLICATE, attempt)
+                if not is_retryable_error(e) or attempt > self.max_retries:
+                    return WriteResult(step.label, WriteOutcome.ERROR, attempt, e)
+
+                delay = get_retry_after(e)
+                if delay is None:
+                    delay = self.backoff_seconds * 2 ** (attempt - 1) * (1 + random.random())
+                logger.debug(f"Retrying {step.label} in {delay:.2f}s after status {getattr(e, 'status', None)}")
+                time.sleep(delay)
+
+    def log_result(self, result: WriteResult):
+        if result.outcome == WriteOutcome.CREATED:
+            logger.info(f"Successfully wrote a new {result.label}")
+        elif result.outcome == WriteOutcome.DUPLICATE:
+            logger.debug(f"Duplicate {result.label}")
+        elif result.outcome == WriteOutcome.ERROR:
+            logger.error(f"Unknown error when writing a new {result.label}: {result.error}", exc_info=result.error if self.debug else False)
+
+    def flush(self) -> List[WriteResult]:
+        # waits for the queued jobs and returns the writes which failed since the last flush
+        with self.lock:
+            pending = list(self.pending)
+        wait(pending)
+
+        with self.lock:
+            errors, self.errors = self.errors, []
+            if self.started_at is not None:
+                self.finished_at = time.perf_counter()
+        return errors
+
+    def get_stats(self):
+        with self.lock:
+            records = sum(count for outcome, count in self.outcomes.items() if outcome != WriteOutcome.SKIPPED)
+            elapsed = 0.0
+            if self.started_at is not None and self.finished_at is not None:
+                elapsed = self.finished_at - self.started_at
+            result = {outcome.value: count for outcome, count in self.outcomes.items()}
+        result.update({
+            "records": records,
+            "seconds": elapsed,
+            "records_per_second": records / elapsed if elapsed > 0 else 0.0,
+        })
+        return result
+
+    def log_stats(self, log=logger):
+        stats = self.get_stats()
+        if stats.get("records") == 0:
+            return
+        log.info("Wrote %d records in %.2fs (%.1f records/sec): %d created, %d duplicates, %d errors, %d skipped",
+                 stats.get("records"), stats.get("seconds"), stats.get("records_per_second"),
+                 stats.get("created"), stats.get("duplicate"), stats.get("error"), stats.get("skipped"))
+
+    def close(self):
+        self.flush()
+        self.executor.shutdown(wait=True)
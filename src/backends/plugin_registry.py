@@ -0,0 +1,110 @@
+import ast
+import os
+import threading
+import time
+from importlib import import_module
+from pkgutil import iter_modules
+from typing import Dict, List, Optional
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Module level constants an impl module may declare to be skipped without importing it, e.g.
+#   plugin_required_env = ['BINANCE_API_KEY', 'BINANCE_API_SECRET']
+#   plugin_enabled_env = 'SYNTHETIC_ENABLED'
+# The constants are read with ast from the source, so they have to be plain literals.
+metadata_names = ('plugin_required_env', 'plugin_enabled_env')
+
+
+class PluginMetadata(object):
+    def __init__(self, required_env: List[str] = None, enabled_env: Optional[str] = None):
+        self.required_env = required_env or []
+        self.enabled_env = enabled_env
+
+    def is_enabled(self) -> bool:
+        if any(not os.environ.get(env_var_name) for env_var_name in self.required_env):
+            return False
+        if self.enabled_env is not None:
+            return os.environ.get(self.enabled_env, 'false').strip().lower() in ('1', 'true', 'yes', 'on')
+        return True
+
+
+def read_plugin_metadata(path: str) -> Optional[PluginMetadata]:
+    # None when the module declares no metadata, it is imported to ask its module class then
+    with open(path, encoding='utf-8') as source_file:
+        tree = ast.parse(source_file.read(), filename=path)
+    values = {}
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and len(node.targets) == 1 and isinstance(node.targets[0], ast.Name) \
+                and node.targets[0].id in metadata_names:
+            values[node.targets[0].id] = ast.literal_eval(node.value)
+    if len(values) == 0:
+        return None
+    return PluginMetadata(values.get('plugin_required_env'), values.get('plugin_enabled_env'))
+
+
+# Discovers the module classes in the impls package of a backend package on first use. Modules whose metadata says
+# they are disabled are not imported, so their client libraries are not loaded either.
+class PluginRegistry(object):
+    def __init__(self, package_name: str, package_dir: str, module_class: type):
+        self.package_name = package_name
+        self.impls_dir = os.path.join(package_dir, "impls")
+        self.module_class = module_class
+        self.lock = threading.Lock()
+        self.classes = None
+        self.instances = None
+        # module name -> (outcome, seconds)
+        self.timings: Dict[str, tuple] = {}
+
+    def discover(self):
+        classes, instances = [], []
+        started = time.perf_counter()
+        for (_, module_name, _) in iter_modules([self.impls_dir]):
+            module_started = time.perf_counter()
+            try:
+                metadata = read_plugin_metadata(os.path.join(self.impls_dir, module_name + ".py"))
+            except (OSError, SyntaxError, ValueError) as e:
+                logger.warning("Cannot read the plugin metadata of %s.impls.%s: %s", self.package_name, module_name, e)
+                metadata = None
+            if metadata is not None and not metadata.is_enabled():
+                self.timings[module_name] = ("disabled", time.perf_counter() - module_started)
+                continue
+
+            try:
+                module = import_module(f"{self.package_name}.impls.{module_name}")
+            except Exception as e:
+                logger.error("Cannot load %s.impls.%s: %s", self.package_name, module_name, e)
+                self.timings[module_name] = ("failed", time.perf_counter() - module_started)
+                continue
+            for attribute_name in dir(module):
+                attribute = getattr(module, attribute_name)
+                if not isinstance(attribute, type) or attribute is self.module_class \
+                        or attribute.__module__ != module.__name__ or not issubclass(attribute, self.module_class):
+                    continue
+                classes.append(attribute)
+                instances.append(attribute.get_instance())
+            self.timings[module_name] = ("imported", time.perf_counter() - module_started)
+
+        self.classes, self.instances = classes, instances
+        self.log_timings(time.perf_counter() - started)
+
+    def ensure_discovered(self):
+        with self.lock:
+            if self.instances is None:
+                self.discover()
+
+    def get_classes(self) -> list:
+        self.ensure_discovered()
+        return self.classes
+
+    def get_instances(self) -> list:
+        self.ensure_discovered()
+        return self.instances
+
+    def log_timings(self, total_seconds: float):
+        breakdown = ", ".join(
+            "%s %s in %.3fs" % (module_name, outcome, seconds)
+            for module_name, (outcome, seconds) in sorted(self.timings.items(), key=lambda item: -item[1][1])
+        )
+        logger.info("Discovered %s plugins in %.3fs: %s", self.package_name, total_seconds, breakdown or "none")
@@ -1,27 +1,18 @@
-import os
-from pkgutil import iter_modules
 from pathlib import Path
-from importlib import import_module
 from typing import List
 
 from backends.public_ledgers.api import SupportedBlockchainExplorer, SupportedBlockchainModule
+from backends.plugin_registry import PluginRegistry
 
-available_explorer: List[SupportedBlockchainModule] = []
+# the modules in impls are only imported on first use, and only when their plugin metadata says they are enabled
+registry = PluginRegistry(__name__, str(Path(__file__).resolve().parent), SupportedBlockchainModule)
 
-package_dir = Path(__file__).resolve().parent
-package_dir = os.path.join(package_dir, "impls")
-for (_, module_name, _) in iter_modules([package_dir]):
 
-    # import the module and iterate through its attributes
-    module = import_module(f"{__name__}.impls.{module_name}")
-    for attribute_name in dir(module):
-        attribute = getattr(module, attribute_name)
+def get_available_explorers() -> List[SupportedBlockchainModule]:
+    return [ledger_module for ledger_module in registry.get_instances() if ledger_module.is_enabled()]
 
-        try:
-            if issubclass(attribute, SupportedBlockchainModule) and not attribute_name == 'SupportedBlockchainModule':
-                ledger_module = attribute()
-                if ledger_module.is_enabled():
-                        available_explorer.append(attribute.get_instance())
-        except:
-            pass
-pass
+
+def __getattr__(name):
+    if name == 'available_explorer':
+        return get_available_explorers()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
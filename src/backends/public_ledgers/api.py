@@ -1,5 +1,5 @@
 import abc
-from typing import List
+from typing import Dict, Iterable, List
 
 from model.ledger_transaction import LedgerTransaction
 
@@ -45,6 +45,10 @@ class SupportedBlockchainExplorer(metaclass=abc.ABCMeta):
     def get_transaction_from_ledger(self, tx_id, timeout=25) -> LedgerTransaction:
         raise NotImplementedError
 
+    def get_transactions_from_ledger(self, tx_ids: Iterable[str], timeout=25) -> Dict[str, LedgerTransaction]:
+        # one lookup after the other, explorers override this to resolve a whole batch concurrently
+        return {tx_id: self.get_transaction_from_ledger(tx_id, timeout=timeout) for tx_id in dict.fromkeys(tx_ids)}
+
 
 class SupportedBlockchainModule(metaclass=abc.ABCMeta):
 
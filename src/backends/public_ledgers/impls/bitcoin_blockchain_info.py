@@ -1,19 +1,26 @@
+from typing import Dict, Iterable
+
 from syncer import sync
 import aiohttp
 
 from backends.public_ledgers.api import SupportedBlockchainExplorer, SupportedBlockchainModule
+from backends.public_ledgers.ledger_client import resolve_transactions
 from model.ledger_transaction import LedgerTransaction
+from storage.ledger_cache import LedgerCache
 
 # Module config
 name = "Bitcoin"
 currency_code = "BTC"
 address_identifier = "xpub"
 address_regular_expression = r"xpub=\"([a-zA-Z0-9]*)\""
+# read by the plugin registry before importing this module, always enabled
+plugin_required_env = []
 
 # Backend config
 base_url = "https://blockchain.info"
 address_uri = "/multiaddr?active="
 transaction_uri = "/rawtx/"
+host = "blockchain.info"
 
 
 @SupportedBlockchainModule.register
@@ -36,6 +43,9 @@ class BitcoinModule(SupportedBlockchainModule):
 @SupportedBlockchainExplorer.register
 class BitcoinExplorer(SupportedBlockchainExplorer):
 
+    def __init__(self, ledger_cache: LedgerCache = None):
+        self.ledger_cache = ledger_cache if ledger_cache is not None else LedgerCache()
+
     def get_address_identifier(self) -> str:
         return address_identifier
 
@@ -45,7 +55,9 @@ class BitcoinExplorer(SupportedBlockchainExplorer):
     @sync
     async def get_tx_addresses_from_address(self, address: str, timeout=25):
         timeout = aiohttp.ClientTimeout(timeout)
-        addresses = []
+        # the ledger lists the newest transactions first, so only the ones added since the last pass have to be walked
+        addresses, seen_transactions = self.ledger_cache.get_addresses(name, address)
+        walked_transactions = 0
 
         async with aiohttp.ClientSession(timeout=timeout) as session:
             page = 0
@@ -58,20 +70,28 @@ class BitcoinExplorer(SupportedBlockchainExplorer):
                                                  page_size * page))
                 resp_json = await resp.json()
                 new_transactions = resp_json.get("txs")
+                total_transactions = resp_json.get("wallet", {}).get("n_tx")
+                if page == 0 and (total_transactions is None or total_transactions < seen_transactions):
+                    # unknown or rewritten history, walk all of it again
+                    addresses, seen_transactions = set(), 0
+                if total_transactions is not None:
+                    unseen_transactions = max(total_transactions - seen_transactions - walked_transactions, 0)
+                    new_transactions = new_transactions[:unseen_transactions]
                 for transaction in new_transactions:
                     for transaction_input in transaction.get("inputs"):
-                        if "xpub" in transaction_input.get("prev_out") and not transaction_input.get("prev_out").get(
-                                "addr") in addresses:
-                            addresses.append(transaction_input.get("prev_out").get("addr"))
+                        if "xpub" in transaction_input.get("prev_out"):
+                            addresses.add(transaction_input.get("prev_out").get("addr"))
                     for transaction_output in transaction.get("out"):
-                        if "xpub" in transaction_output and not transaction_output.get("addr") in addresses:
-                            addresses.append(transaction_output.get("addr"))
+                        if "xpub" in transaction_output:
+                            addresses.add(transaction_output.get("addr"))
+                walked_transactions += len(new_transactions)
                 if len(new_transactions) < page_size:
                     load_next = False
                 else:
                     page += 1
 
-        return addresses
+        self.ledger_cache.put_addresses(name, address, addresses, seen_transactions + walked_transactions)
+        return list(addresses)
 
     def get_blockchain_name(self) -> str:
         return name
@@ -81,16 +101,30 @@ class BitcoinExplorer(SupportedBlockchainExplorer):
 
     @sync
     async def get_transaction_from_ledger(self, tx_id, timeout=25) -> LedgerTransaction:
+        ledger_transaction = self.ledger_cache.get_transaction(name, tx_id)
+        if ledger_transaction is not None:
+            return ledger_transaction
         timeout = aiohttp.ClientTimeout(timeout)
         async with aiohttp.ClientSession(timeout=timeout) as session:
-            resp = await session.request(method="get", url=base_url + transaction_uri + tx_id)
-            resp_json = await resp.json()
-            return LedgerTransaction(
-                txId=tx_id,
-                ins=[
-                    address.get("prev_out").get("addr") for address in resp_json.get("inputs")
-                ],
-                outs=[
-                    address.get("addr") for address in resp_json.get("out")
-                ]
-            )
+            ledger_transaction = await fetch_transaction(session, tx_id)
+        self.ledger_cache.put_transactions(name, {tx_id: ledger_transaction})
+        return ledger_transaction
+
+    @sync
+    async def get_transactions_from_ledger(self, tx_ids: Iterable[str], timeout=25) -> Dict[str, LedgerTransaction]:
+        return await resolve_transactions(name, host, tx_ids, fetch_transaction, self.ledger_cache, timeout)
+
+
+async def fetch_transaction(session: aiohttp.ClientSession, tx_id: str) -> LedgerTransaction:
+    resp = await session.request(method="get", url=base_url + transaction_uri + tx_id)
+    resp_json = await resp.json()
+    return LedgerTransaction(
+        txId=tx_id,
+        ins=[
+            address.get("prev_out").get("addr") for address in resp_json.get("inputs")
+        ],
+        outs=[
+            address.get("addr") for address in resp_json.get("out")
+        ],
+        confirmed=resp_json.get("block_height") is not None
+    )
@@ -1,10 +1,12 @@
-from typing import List
+from typing import Dict, Iterable, List
 
 from syncer import sync
 import aiohttp
 
 from backends.public_ledgers import SupportedBlockchainModule, SupportedBlockchainExplorer
+from backends.public_ledgers.ledger_client import resolve_transactions
 from model.ledger_transaction import LedgerTransaction
+from storage.ledger_cache import LedgerCache
 
 
 # Module config
@@ -12,11 +14,14 @@ name = "Neo"
 currency_code = "NEO"
 address_identifier = "address"
 address_regular_expression = r"address=\"([a-zA-Z0-9]*)\""
+# read by the plugin registry before importing this module, always enabled
+plugin_required_env = []
 
 # Backend config
 base_url = "https://neoscan.io"
 last_transactions_uri = "/api/main_net/v1/get_last_transactions_by_address/{address}/{page}"
 get_transaction_uri = "/api/main_net/v1/get_transaction/"
+host = "neoscan.io"
 
 
 @SupportedBlockchainModule.register
@@ -39,6 +44,9 @@ class NeoExplorerModule(SupportedBlockchainModule):
 @SupportedBlockchainExplorer.register
 class NeoExplorer(SupportedBlockchainExplorer):
 
+    def __init__(self, ledger_cache: LedgerCache = None):
+        self.ledger_cache = ledger_cache if ledger_cache is not None else LedgerCache()
+
     def get_tx_addresses_from_address(self, address: str, timeout=25) -> List[str]:
         return [address]
 
@@ -56,18 +64,32 @@ class NeoExplorer(SupportedBlockchainExplorer):
 
     @sync
     async def get_transaction_from_ledger(self, tx_id, timeout=25) -> LedgerTransaction:
+        ledger_transaction = self.ledger_cache.get_transaction(name, tx_id)
+        if ledger_transaction is not None:
+            return ledger_transaction
         timeout = aiohttp.ClientTimeout(timeout)
         async with aiohttp.ClientSession(timeout=timeout) as session:
-            resp = await session.request(method="get", url=base_url + get_transaction_uri + tx_id)
-            resp_json = await resp.json()
-            return LedgerTransaction(
-                txId=resp_json.get("txid"),
-                ins=[
-                    in_address.get("address_hash")
-                    for in_address in resp_json.get("vin")
-                ],
-                outs=[
-                    in_address.get("address_hash")
-                    for in_address in resp_json.get("vouts")
-                ]
-            )
+            ledger_transaction = await fetch_transaction(session, tx_id)
+        self.ledger_cache.put_transactions(name, {tx_id: ledger_transaction})
+        return ledger_transaction
+
+    @sync
+    async def get_transactions_from_ledger(self, tx_ids: Iterable[str], timeout=25) -> Dict[str, LedgerTransaction]:
+        return await resolve_transactions(name, host, tx_ids, fetch_transaction, self.ledger_cache, timeout)
+
+
+async def fetch_transaction(session: aiohttp.ClientSession, tx_id: str) -> LedgerTransaction:
+    resp = await session.request(method="get", url=base_url + get_transaction_uri + tx_id)
+    resp_json = await resp.json()
+    return LedgerTransaction(
+        txId=resp_json.get("txid"),
+        ins=[
+            in_address.get("address_hash")
+            for in_address in resp_json.get("vin")
+        ],
+        outs=[
+            in_address.get("address_hash")
+            for in_address in resp_json.get("vouts")
+        ],
+        confirmed=resp_json.get("block_height") is not None
+    )
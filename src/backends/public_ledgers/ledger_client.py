@@ -0,0 +1,50 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, Iterable
+
+import aiohttp
+
+import config
+from backends.exchanges.rate_limiter import get_rate_limiter
+from model.ledger_transaction import LedgerTransaction
+from storage.ledger_cache import LedgerCache
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+# Resolves many transaction ids over one pooled aiohttp session, at most LEDGER_MAX_CONCURRENCY at a time and within
+# the rate limit of the host. Transactions found in the ledger cache are not requested again, confirmed ones which had to
+# be requested are added to it. Transactions which cannot be resolved are logged and left out of the result.
+async def resolve_transactions(chain: str, host: str, tx_ids: Iterable[str],
+                               fetch_transaction: Callable[[aiohttp.ClientSession, str], Awaitable[LedgerTransaction]],
+                               ledger_cache: LedgerCache = None, timeout=25) -> Dict[str, LedgerTransaction]:
+    unique_tx_ids = list(dict.fromkeys(tx_id for tx_id in tx_ids if tx_id))
+    cached = ledger_cache.get_transactions(chain, unique_tx_ids) if ledger_cache is not None else {}
+    unique_tx_ids = [tx_id for tx_id in unique_tx_ids if tx_id not in cached]
+    if len(unique_tx_ids) == 0:
+        return cached
+
+    # ledger hosts are reported as ledger_request_seconds{ledger=host}, apart from the exchanges
+    rate_limiter = get_rate_limiter(host, max(config.ledger_requests_per_second, 1), period_seconds=1,
+                                    metrics_prefix='ledger')
+    max_concurrency = max(config.ledger_max_concurrency, 1)
+    semaphore = asyncio.Semaphore(max_concurrency)
+    connector = aiohttp.TCPConnector(limit=max_concurrency)
+
+    async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(timeout), connector=connector,
+                                     raise_for_status=True) as session:
+        async def resolve(tx_id):
+            async with semaphore:
+                return await rate_limiter.call_async('transaction', 1, fetch_transaction, session, tx_id)
+
+        ledger_transactions = await asyncio.gather(*(resolve(tx_id) for tx_id in unique_tx_ids), return_exceptions=True)
+
+    result = {}
+    for tx_id, ledger_transaction in zip(unique_tx_ids, ledger_transactions):
+        if isinstance(ledger_transaction, Exception):
+            logger.error('Cannot get transaction %s from %s: %s', tx_id, host, ledger_transaction)
+            continue
+        result[tx_id] = ledger_transaction
+    if ledger_cache is not None:
+        ledger_cache.put_transactions(chain, result)
+    return {**cached, **result}
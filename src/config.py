@@ -18,12 +18,41 @@ def get_env_bool(env_var_name, default=True) -> bool:
     return default
 
 
+def get_env_int(env_var_name, default) -> int:
+    value = config.get(env_var_name)
+    if value is None or value.strip() == '':
+        return default
+    try:
+        return int(value.strip())
+    except ValueError:
+        return default
+
+
 debug = get_env_bool('DEBUG', False)
 firefly_host = config['FIREFLY_HOST']
 firefly_verify_ssl = get_env_bool('FIREFLY_VALIDATE_SSL')
 firefly_access_token = config['FIREFLY_ACCESS_TOKEN']
+firefly_pool_size = get_env_int('FIREFLY_POOL_SIZE', 10)
+firefly_keep_alive = get_env_bool('FIREFLY_KEEP_ALIVE')
+firefly_account_cache_ttl = get_env_int('FIREFLY_ACCOUNT_CACHE_TTL', 600)
+firefly_page_size = get_env_int('FIREFLY_PAGE_SIZE', 500)
+firefly_write_workers = get_env_int('FIREFLY_WRITE_WORKERS', 4)
+firefly_write_retries = get_env_int('FIREFLY_WRITE_RETRIES', 3)
+firefly_dedup_ledger = get_env_bool('FIREFLY_DEDUP_LEDGER')
+firefly_write_queue_size = get_env_int('FIREFLY_WRITE_QUEUE_SIZE', 1000)
+firefly_incremental_reclassify = get_env_bool('FIREFLY_INCREMENTAL_RECLASSIFY')
+
+exchange_products_cache_ttl = get_env_int('EXCHANGE_PRODUCTS_CACHE_TTL', 86400)
+
+ledger_max_concurrency = get_env_int('LEDGER_MAX_CONCURRENCY', 4)
+ledger_requests_per_second = get_env_int('LEDGER_REQUESTS_PER_SECOND', 2)
+ledger_cache_max_entries = get_env_int('LEDGER_CACHE_MAX_ENTRIES', 100000)
 
 sync_begin_timestamp = config['SYNC_BEGIN_TIMESTAMP']
 sync_inverval = config['SYNC_TRADES_INTERVAL']
+sync_streaming = get_env_bool('SYNC_STREAMING', False)
+
+metrics_port = get_env_int('METRICS_PORT', 0)
+metrics_host = config.get('METRICS_HOST') or '127.0.0.1'
 
 logging.basicConfig(level=logging.DEBUG if debug else logging.INFO, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
@@ -1,15 +1,19 @@
 import config as config
+import metrics
 import backends.firefly.firefly_wrapper as firefly_wrapper
-from model.transaction import TradeData, TransactionType
+from model.transaction import TransactionType
 from backends.exchanges import exchange_interface_factory
 from backends.firefly.firefly_wrapper import TransactionCollection
-from typing import List
+from backends.firefly.transaction_writer import WriteOutcome
+from backends.firefly.client_pool import client_pool
 import re
-from backends.public_ledgers import available_explorer
+import backends.public_ledgers as public_ledgers
 import logging
-from datetime import datetime
+from datetime import datetime, timedelta
 from utils import from_ms
 from enum import Enum
+from storage.checkpoint_store import CheckpointStore, STREAM_TRADES, STREAM_DEPOSITS, STREAM_WITHDRAWALS
+from storage.dedup_ledger import RECORD_TRADE, RECORD_DEPOSIT, RECORD_WITHDRAWAL
 
 class IntervalEnum(Enum):
     HOURLY = "hourly"
@@ -17,54 +21,72 @@ class IntervalEnum(Enum):
     DEBUG = "debug"
 
 class SyncLogic:
+    # the streams imported by interval_processor, each of them is checkpointed on its own
+    streams = [STREAM_TRADES, STREAM_WITHDRAWALS, STREAM_DEPOSITS]
+    # high-water mark of the Firefly III transaction ids already examined for reclassification
+    reclassify_cursor = "unclassified_transactions"
+
     def __init__(self, trading_platform):
         self.trading_platform = trading_platform
         self.log = logging.getLogger("[" + trading_platform.upper() + "] [SYNC_LOGIC]")
         self.firefly = firefly_wrapper.FireflyWrapper(trading_platform)
+        self.checkpoints = CheckpointStore()
+        self.trade_write_errors = 0
+
+    def augment_transaction_collection_with_firefly_accounts(self, transaction_collection, account_collection_index):
+        trade_data = transaction_collection.trade_data
+        security_collection = account_collection_index.get_by_security(trade_data.trading_pair.security)
+        currency_collection = account_collection_index.get_by_security(trade_data.trading_pair.currency)
+
+        if trade_data.type is TransactionType.BUY:
+            to_collection, from_collection = security_collection, currency_collection
+        elif trade_data.type is TransactionType.SELL:
+            to_collection, from_collection = currency_collection, security_collection
+        else:
+            to_collection, from_collection = None, None
 
-    def get_transaction_collections_from_trade_data(self, list_of_trades: List[TradeData]):
-        return list(map(lambda trade: TransactionCollection(trade, None, None, None, None), list_of_trades))
+        if to_collection is not None:
+            transaction_collection.to_ff_account = to_collection.asset_account.attributes
+        if from_collection is not None:
+            transaction_collection.from_ff_account = from_collection.asset_account.attributes
 
-    def augment_transaction_collection_with_firefly_accounts(self, transaction_collection, firefly_account_collection):
-        if transaction_collection.trade_data.type is TransactionType.BUY:
-            if firefly_account_collection.security == transaction_collection.trade_data.trading_pair.security:
-                transaction_collection.to_ff_account = firefly_account_collection.asset_account.attributes
-            if firefly_account_collection.security == transaction_collection.trade_data.trading_pair.currency:
-                transaction_collection.from_ff_account = firefly_account_collection.asset_account.attributes
+        commission_collection = account_collection_index.get_by_security(trade_data.commission_asset)
+        if commission_collection is not None:
+            transaction_collection.commission_account = commission_collection.expense_account.attributes
 
-        elif transaction_collection.trade_data.type is TransactionType.SELL:
-            if firefly_account_collection.security == transaction_collection.trade_data.trading_pair.currency:
-                transaction_collection.to_ff_account = firefly_account_collection.asset_account.attributes
-            if firefly_account_collection.security == transaction_collection.trade_data.trading_pair.security:
-                transaction_collection.from_ff_account = firefly_account_collection.asset_account.attributes
+        from_commission_collection = account_collection_index.get_by_commission_asset(trade_data.commission_asset)
+        if from_commission_collection is not None:
+            transaction_collection.from_commission_account = from_commission_collection.asset_account.attributes
 
-        else:
-            pass
+    def step(self, stream, step):
+        # times a numbered step of an import, exposed as sync_step_seconds
+        return metrics.sync_step_seconds.time(exchange=self.trading_platform, stream=stream, step=step)
 
-        commission_asset = transaction_collection.trade_data.commission_asset
-        if firefly_account_collection.security == commission_asset:
-            transaction_collection.commission_account = firefly_account_collection.expense_account.attributes
-
-        if commission_asset in firefly_account_collection.asset_account.attributes.currency_symbol \
-                or commission_asset in firefly_account_collection.asset_account.attributes.currency_code:
-            transaction_collection.from_commission_account = firefly_account_collection.asset_account.attributes
+    def count_fetched(self, kind, count):
+        metrics.records_total.inc(count, exchange=self.trading_platform, kind=kind, outcome="fetched")
 
     def log_initial_message(self, from_timestamp, to_timestamp, init, component):
         from_date = datetime.fromtimestamp(from_ms(from_timestamp))
         to_date = datetime.fromtimestamp(from_ms(to_timestamp))
         message = "Importing " + ("all historical " if init else "") + component + " from " + str(from_date) + " to " + str(to_date)
         if not init:
-            epochs_to_calculate = self.get_epochs_differences(from_timestamp, to_timestamp, config.sync_inverval)
+            epochs_to_calculate = self.get_epochs_differences(from_timestamp, to_timestamp, IntervalEnum(config.sync_inverval))
             message += ", " + str(epochs_to_calculate) + " intervals."
 
         self.log.debug(message)
 
     def handle_deposits(self, from_timestamp, to_timestamp, init, exchange_interface,
                         firefly_account_collections):
+        if from_timestamp >= to_timestamp:
+            self.log.debug("Deposits are already imported up to " + str(datetime.fromtimestamp(from_ms(from_timestamp))))
+            return
+
         self.log_initial_message(from_timestamp, to_timestamp, init, "deposits")
 
         self.log.debug("1. Get deposits from exchange")
-        deposits = exchange_interface.get_deposits(from_timestamp, to_timestamp)
+        with self.step(STREAM_DEPOSITS, "fetch"):
+            deposits = exchange_interface.get_deposits(from_timestamp, to_timestamp)
+        self.count_fetched(RECORD_DEPOSIT, len(deposits))
         self.log.debug(deposits)
 
         if len(deposits) == 0:
@@ -72,22 +94,30 @@ class SyncLogic:
             return
 
         self.log.debug("2. Import deposits to Firefly III")
-        self.firefly.import_deposits(deposits, firefly_account_collections)
+        with self.step(STREAM_DEPOSITS, "write"):
+            self.firefly.import_deposits(deposits, firefly_account_collections)
 
 
     def handle_withdrawals(self, from_timestamp, to_timestamp, init, exchange_interface,
                         firefly_account_collections):
+        if from_timestamp >= to_timestamp:
+            self.log.debug("Withdrawals are already imported up to " + str(datetime.fromtimestamp(from_ms(from_timestamp))))
+            return
+
         self.log_initial_message(from_timestamp, to_timestamp, init, "withdrawals")
 
         self.log.debug("1. Get received withdrawals from exchange")
-        withdrawals = exchange_interface.get_withdrawals(from_timestamp, to_timestamp)
+        with self.step(STREAM_WITHDRAWALS, "fetch"):
+            withdrawals = exchange_interface.get_withdrawals(from_timestamp, to_timestamp)
+        self.count_fetched(RECORD_WITHDRAWAL, len(withdrawals))
 
         if len(withdrawals) == 0:
             self.log.debug("No new withdrawals found.")
             return
 
         self.log.debug("2. Import withdrawals to Firefly III")
-        self.firefly.import_withdrawals(withdrawals, firefly_account_collections)
+        with self.step(STREAM_WITHDRAWALS, "write"):
+            self.firefly.import_withdrawals(withdrawals, firefly_account_collections)
 
 
     def handle_interests(self, from_timestamp, to_timestamp, init, exchange_interface,
@@ -107,41 +137,83 @@ class SyncLogic:
 
     def handle_trades(self, from_timestamp, to_timestamp, init, exchange_interface):
         self.log_initial_message(from_timestamp, to_timestamp, init, "trades")
+        self.trade_write_errors = 0
 
         self.log.debug("1. Get eligible symbols from existing asset accounts within Firefly III")
-        self.log.debug('symbols: ' + str(self.firefly.get_symbols_and_codes()))
-        list_of_trading_pairs = exchange_interface.get_trading_pairs(
-            self.firefly.get_symbols_and_codes())
+        with self.step(STREAM_TRADES, "symbols"):
+            list_of_symbols_and_codes = self.firefly.get_symbols_and_codes()
+        self.log.debug('symbols: ' + str(list_of_symbols_and_codes))
+        with self.step(STREAM_TRADES, "pairs"):
+            list_of_trading_pairs = exchange_interface.get_trading_pairs(list_of_symbols_and_codes)
+
+        with self.step(STREAM_TRADES, "collections"):
+            firefly_account_collections = self.firefly.get_firefly_account_collections_for_pairs(list_of_trading_pairs)
+
+        if from_timestamp >= to_timestamp:
+            self.log.debug("Trades are already imported up to " + str(datetime.fromtimestamp(from_ms(from_timestamp))))
+        elif config.sync_streaming:
+            self.stream_trades(from_timestamp, to_timestamp, exchange_interface, list_of_trading_pairs, firefly_account_collections)
+        else:
+            self.import_trades(from_timestamp, to_timestamp, exchange_interface, list_of_trading_pairs, firefly_account_collections)
+
+        return firefly_account_collections
+
 
+    def map_trade_to_transaction_collection(self, trade_data, firefly_account_collections):
+        transaction_collection = TransactionCollection(trade_data, None, None, None, None)
+        self.augment_transaction_collection_with_firefly_accounts(transaction_collection, firefly_account_collections)
+
+        if transaction_collection.from_commission_account is None:
+            raise Exception(f"No commission account found for asset {transaction_collection.trade_data.commission_asset}.")
+        return transaction_collection
+
+
+    def import_trades(self, from_timestamp, to_timestamp, exchange_interface, list_of_trading_pairs, firefly_account_collections):
         self.log.debug("2. Get trades from crypto currency exchange")
-        list_of_trade_data = exchange_interface.get_trades(from_timestamp, to_timestamp, list_of_trading_pairs)
-        firefly_account_collections = self.firefly.get_firefly_account_collections_for_pairs(list_of_trading_pairs)
+        with self.step(STREAM_TRADES, "fetch"):
+            list_of_trade_data = exchange_interface.get_trades(from_timestamp, to_timestamp, list_of_trading_pairs)
+        self.count_fetched(RECORD_TRADE, len(list_of_trade_data))
 
         if len(list_of_trade_data) == 0:
             self.log.debug("No trades to import.")
-            are_transactions_to_import = False
-        else:
-            are_transactions_to_import = True
+            return
 
-        if are_transactions_to_import:
-            self.log.debug("4. Map transactions to Firefly III accounts and prepare import")
-            new_transaction_collections = self.get_transaction_collections_from_trade_data(list_of_trade_data)
+        self.log.debug("4. Map transactions to Firefly III accounts and prepare import")
+        with self.step(STREAM_TRADES, "mapping"):
+            new_transaction_collections = [
+                self.map_trade_to_transaction_collection(trade_data, firefly_account_collections)
+                for trade_data in list_of_trade_data
+            ]
 
+        self.log.debug("5. Import new trades as transactions to Firefly III")
+        with self.step(STREAM_TRADES, "write"):
             for transaction_collection in new_transaction_collections:
-                for firefly_account_collection in firefly_account_collections:
-                    self.augment_transaction_collection_with_firefly_accounts(transaction_collection, firefly_account_collection)
+                self.firefly.write_new_transaction(transaction_collection)
+            self.count_trade_write_errors(self.firefly.flush_writes())
 
-                if transaction_collection.from_commission_account is None:
-                    raise Exception(f"No commission account found for asset {transaction_collection.trade_data.commission_asset}.")
+        self.log.debug("6. Finish import and going to sleep")
 
-            self.log.debug("5. Import new trades as transactions to Firefly III")
 
-            for transaction_collection in new_transaction_collections:
-                self.firefly.write_new_transaction(transaction_collection)
+    def stream_trades(self, from_timestamp, to_timestamp, exchange_interface, list_of_trading_pairs, firefly_account_collections):
+        # trades are mapped lazily while the exchange pages through them and the writer queue applies back pressure,
+        # so memory stays flat and the first trades are written while older pages are still fetched
+        self.log.debug("2. Stream trades from crypto currency exchange to Firefly III")
+        trades = exchange_interface.iter_trades(from_timestamp, to_timestamp, list_of_trading_pairs)
+        transaction_collections = (
+            self.map_trade_to_transaction_collection(trade_data, firefly_account_collections) for trade_data in trades
+        )
 
-            self.log.debug("6. Finish import and going to sleep")
+        count_of_trades = 0
+        with self.step(STREAM_TRADES, "stream"):
+            for transaction_collection in transaction_collections:
+                self.firefly.write_new_transaction(transaction_collection)
+                count_of_trades += 1
+            self.count_trade_write_errors(self.firefly.flush_writes())
+        self.count_fetched(RECORD_TRADE, count_of_trades)
 
-        return firefly_account_collections
+        if count_of_trades == 0:
+            self.log.debug("No trades to import.")
+        self.log.debug("3. Finished streaming " + str(count_of_trades) + " trades")
 
 
     def get_x_pub_of_account(self, account, expression):
@@ -156,11 +228,23 @@ class SyncLogic:
         result = {}
         for supported_blockchain in supported_blockchains:
             client = supported_blockchains.get(supported_blockchain)
+            matching_transactions = []
             for firefly_transaction in firefly_transactions:
                 [inner_transaction] = firefly_transaction.attributes.transactions
                 if inner_transaction.currency_code == client.get_currency_code() or inner_transaction.currency_symbol == client.get_currency_code():
-                    ledger_transaction = client.get_transaction_from_ledger(inner_transaction.external_id)
-                    result.setdefault(inner_transaction.external_id, {"firefly": firefly_transaction, "ledger": ledger_transaction, "code": client.get_currency_code()})
+                    matching_transactions.append((inner_transaction.external_id, firefly_transaction))
+            if len(matching_transactions) == 0:
+                continue
+            # one batch per blockchain, the explorer resolves it concurrently within its rate limit
+            with self.step(self.reclassify_cursor, "ledger"):
+                ledger_transactions = client.get_transactions_from_ledger(
+                    [external_id for external_id, _ in matching_transactions])
+            for external_id, firefly_transaction in matching_transactions:
+                ledger_transaction = ledger_transactions.get(external_id)
+                # unconfirmed transactions may still change, they are classified by a later pass
+                if ledger_transaction is None or not ledger_transaction.confirmed:
+                    continue
+                result.setdefault(external_id, {"firefly": firefly_transaction, "ledger": ledger_transaction, "code": client.get_currency_code()})
 
         return result
 
@@ -168,7 +252,7 @@ class SyncLogic:
     def handle_unclassified_transactions(self):
         # 1. get accounts with xPub in notes and get addresses from xPub
         supported_blockchains = {}
-        for explorer_module in available_explorer:
+        for explorer_module in public_ledgers.get_available_explorers():
             supported_blockchains.setdefault(explorer_module.get_blockchain_name(), explorer_module.get_blockchain_explorer())
         account_collections = [
             self.firefly.create_firefly_account_collection(security)
@@ -186,20 +270,74 @@ class SyncLogic:
                 addresses = explorer\
                     .get_tx_addresses_from_address(address=x_pub_of_account)
                 account_address_mapping\
-                    .setdefault(account.attributes.name, {"addresses": addresses, "account": account.attributes, "code": explorer.get_currency_code()})
-        # 2. get transactions with crypto-trades-firefly-iii:unclassified-transaction in notes
-        firefly_transactions = self.firefly.get_transactions("unclassified-transaction", supported_blockchains)
+                    .setdefault(account.attributes.name, {"addresses": set(addresses), "account": account.attributes, "code": explorer.get_currency_code()})
+        # 2. get transactions with crypto-trades-firefly-iii:unclassified-transaction in notes, which were created since the last pass
+        after_id = None
+        if config.firefly_incremental_reclassify:
+            after_id = self.checkpoints.get_cursor(self.trading_platform, self.reclassify_cursor)
+        start_date = (datetime.fromisoformat(config.sync_begin_timestamp) - timedelta(days=1)).strftime('%Y-%m-%d')
+        firefly_transactions, highest_id = self.firefly.get_transactions_since(
+            self.firefly.get_withdrawal_unclassified_key(), supported_blockchains, after_id, start_date)
+        self.log.debug("Examining " + str(len(firefly_transactions)) + " unclassified transactions after id " + str(after_id))
         transactions = self.get_transactions_from_blockchain(firefly_transactions, supported_blockchains)
         # 3. rewrite transactions in Firefly-III
-        self.firefly.rewrite_unclassified_transactions(transactions, account_address_mapping) #, account_collections)
+        rewritten_ids = self.firefly.rewrite_unclassified_transactions(transactions, account_address_mapping) #, account_collections)
+        if config.firefly_incremental_reclassify and highest_id is not None:
+            # transactions which could not be resolved in the ledger or matched to an account are examined again
+            # by the next pass, so the high-water mark stays below the lowest of them
+            unresolved_ids = [int(t.id) for t in firefly_transactions if int(t.id) not in rewritten_ids]
+            if len(unresolved_ids) > 0:
+                self.log.info(str(len(unresolved_ids)) + " unclassified transactions are left for the next pass")
+                highest_id = min(highest_id, min(unresolved_ids) - 1)
+            self.checkpoints.set_cursor(self.trading_platform, self.reclassify_cursor, highest_id)
+
+    def get_stream_begin(self, stream, from_timestamp):
+        committed_timestamp = self.checkpoints.get(self.trading_platform, stream)
+        if committed_timestamp is None or committed_timestamp < from_timestamp:
+            return from_timestamp
+        return committed_timestamp
+
+    def count_trade_write_errors(self, write_results):
+        self.trade_write_errors += sum(1 for result in write_results if result.outcome == WriteOutcome.ERROR)
+
+    def commit_stream(self, stream, to_timestamp):
+        self.checkpoints.commit(self.trading_platform, stream, to_timestamp)
+
+    def commit_trades(self, exchange_interface, to_timestamp):
+        # the trades checkpoint and the trade cursors of the exchange only move once every trade of the interval was
+        # stored, otherwise the next sync imports the interval again from the previous checkpoint
+        if self.trade_write_errors == 0:
+            exchange_interface.commit_cursors()
+            self.commit_stream(STREAM_TRADES, to_timestamp)
+        else:
+            self.log.warning(str(self.trade_write_errors) + " trades could not be stored, they are imported again by the next sync")
+            exchange_interface.discard_cursors()
 
     def interval_processor(self, from_timestamp, to_timestamp, init):
+        with metrics.sync_interval_seconds.time(exchange=self.trading_platform):
+            return self.process_interval(from_timestamp, to_timestamp, init)
+
+    def process_interval(self, from_timestamp, to_timestamp, init):
+        self.firefly.writer.reset_stats()
+        # accounts are listed once per sync, every lookup afterwards is served from the index
+        self.firefly.account_index.invalidate()
         exchange_interface = exchange_interface_factory.get_specific_exchange_interface(self.trading_platform)
-        trades = self.handle_trades(from_timestamp, to_timestamp, init, exchange_interface)
-        # self.handle_interests(from_timestamp, to_timestamp, init, exchange_interface, trades)
-        self.handle_withdrawals(from_timestamp, to_timestamp, init, exchange_interface, trades)
-        self.handle_deposits(from_timestamp, to_timestamp, init, exchange_interface, trades)
+        trades = self.handle_trades(self.get_stream_begin(STREAM_TRADES, from_timestamp), to_timestamp, init, exchange_interface)
+        self.commit_trades(exchange_interface, to_timestamp)
+        # self.handle_interests(self.get_stream_begin(STREAM_INTERESTS, from_timestamp), to_timestamp, init, exchange_interface, trades)
+        # self.commit_stream(STREAM_INTERESTS, to_timestamp)
+        self.handle_withdrawals(self.get_stream_begin(STREAM_WITHDRAWALS, from_timestamp), to_timestamp, init, exchange_interface, trades)
+        self.commit_stream(STREAM_WITHDRAWALS, to_timestamp)
+        self.handle_deposits(self.get_stream_begin(STREAM_DEPOSITS, from_timestamp), to_timestamp, init, exchange_interface, trades)
+        self.commit_stream(STREAM_DEPOSITS, to_timestamp)
         # self.handle_unclassified_transactions()
+        client_pool.log_stats()
+        self.firefly.account_index.log_stats(self.log)
+        self.firefly.writer.log_stats(self.log)
+        self.firefly.log_dedup_stats(self.log)
+        rate_limiter = getattr(exchange_interface, 'rate_limiter', None)
+        if rate_limiter is not None:
+            rate_limiter.log_stats(self.log)
 
         return "ok"
 
@@ -0,0 +1,129 @@
+import logging
+import threading
+import time
+from typing import Callable, Dict, List
+
+
+logger = logging.getLogger(__name__)
+
+
+# Timestamp of the next wall-clock boundary of the interval, e.g. the next full hour for hourly syncs.
+def get_next_boundary(now: float, interval_seconds: int) -> float:
+    return (int(now // interval_seconds) + 1) * interval_seconds
+
+
+class ScheduledExchange(object):
+
+    def __init__(self, name: str, syncer):
+        self.name = name
+        self.syncer = syncer
+        # Runs only happen on the thread of the exchange, one after the other.
+        self.running = False
+        self.thread = None
+        self.next_run = None
+        self.last_started = None
+        self.last_duration = None
+        self.last_error = None
+        self.runs = 0
+        self.skipped_runs = 0
+
+    def run(self, function: Callable):
+        self.running = True
+        try:
+            self.last_started = time.time()
+            function()
+            self.last_error = None
+        except Exception as e:
+            self.last_error = str(e)
+            logger.error('%s: sync failed: %s', self.name, str(e), exc_info=True)
+        finally:
+            self.last_duration = time.time() - self.last_started
+            self.runs += 1
+            self.running = False
+
+    def get_status(self) -> dict:
+        return {
+            "next_run": self.next_run,
+            "last_started": self.last_started,
+            "last_duration": self.last_duration,
+            "last_error": self.last_error,
+            "running": self.running,
+            "runs": self.runs,
+            "skipped_runs": self.skipped_runs,
+        }
+
+
+# Runs every exchange syncer on its own thread, aligned to wall-clock interval boundaries,
+# so that a slow exchange never delays the others. The boundaries a sync overran are skipped.
+# wait_function(seconds) returns True once the scheduler is stopped, tests pass it together with a fake time_function.
+class SyncScheduler(object):
+
+    def __init__(self, interval_seconds: int, time_function: Callable[[], float] = time.time,
+                 wait_function: Callable[[float], bool] = None):
+        self.interval_seconds = interval_seconds
+        self.time_function = time_function
+        self.stop_event = threading.Event()
+        self.wait_function = wait_function if wait_function is not None else self.stop_event.wait
+        self.exchanges: List[ScheduledExchange] = []
+
+    def add(self, name: str, syncer) -> ScheduledExchange:
+        exchange = ScheduledExchange(name, syncer)
+        self.exchanges.append(exchange)
+        return exchange
+
+    def start(self):
+        for exchange in self.exchanges:
+            exchange.thread = threading.Thread(target=self.exchange_loop, args=(exchange,),
+                                               name='sync-' + exchange.name, daemon=True)
+            exchange.thread.start()
+
+    def exchange_loop(self, exchange: ScheduledExchange):
+        logger.info('Initial sync of %s', exchange.name)
+        try:
+            exchange.run(exchange.syncer.initial_sync)
+        except SystemExit as e:
+            exchange.last_error = 'exit ' + str(e.code)
+            logger.error('%s: initial sync aborted with exit code %s. No further syncs are scheduled.', exchange.name, e.code)
+            return
+
+        while not self.stop_event.is_set():
+            exchange.next_run = get_next_boundary(self.time_function(), self.interval_seconds)
+            logger.info('%s: next sync will happen at %s', exchange.name,
+                        time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(exchange.next_run)))
+            if self.wait_function(max(0.0, exchange.next_run - self.time_function())):
+                break
+
+            logger.info('Syncing %s', exchange.name)
+            try:
+                exchange.run(exchange.syncer.sync)
+            except SystemExit as e:
+                exchange.last_error = 'exit ' + str(e.code)
+                logger.error('%s: sync aborted with exit code %s. No further syncs are scheduled.', exchange.name, e.code)
+                return
+
+            missed_runs = int((self.time_function() - exchange.next_run) // self.interval_seconds)
+            if missed_runs > 0:
+                exchange.skipped_runs += missed_runs
+                logger.warning('%s: sync overran %d interval(s), they are skipped.', exchange.name, missed_runs)
+            self.log_exchange_status(exchange.name, exchange.get_status())
+
+    def get_status(self) -> Dict[str, dict]:
+        return {exchange.name: exchange.get_status() for exchange in self.exchanges}
+
+    @staticmethod
+    def log_exchange_status(name: str, status: dict):
+        logger.info('%s: runs %d, last duration %s, last error %s, running %s, skipped runs %d', name, status["runs"],
+                    '%.1fs' % status["last_duration"] if status["last_duration"] is not None else '-',
+                    status["last_error"] or '-', status["running"], status["skipped_runs"])
+
+    def log_status(self):
+        for name, status in self.get_status().items():
+            self.log_exchange_status(name, status)
+
+    def join(self):
+        for exchange in self.exchanges:
+            while exchange.thread is not None and exchange.thread.is_alive():
+                exchange.thread.join(1)
+
+    def stop(self):
+        self.stop_event.set()
@@ -19,6 +19,14 @@ class SyncTimer(object):
         begin_of_sync_timestamp = config.sync_begin_timestamp
         self.sync_logic = SyncLogic(self.trading_platform)
 
+        resume_timestamp = self.sync_logic.checkpoints.get_resume_timestamp(self.trading_platform, self.sync_logic.streams)
+        if resume_timestamp is not None:
+            self.log.info("Resuming import from checkpoint " + str(datetime.datetime.fromtimestamp(resume_timestamp / 1000)))
+            self.last_sync_interval_begin_timestamp = resume_timestamp
+            self.last_sync_result = 'ok'
+            self.sync_interval(resume_timestamp, config.sync_inverval)
+            return
+
         try:
             self.last_sync_interval_begin_timestamp = self.import_all_from_exchange()
         except ExchangeUnderMaintenanceException as maintenance:
@@ -50,7 +58,7 @@ class SyncTimer(object):
 
         try:
             self.last_sync_result = self.sync_logic.interval_processor(previous_last_sync_interval_begin_timestamp, new_to_timestamp_in_millis, False)
-            self.last_sync_interval_begin_timestamp = new_to_timestamp_in_millis
+            self.last_sync_interval_begin_timestamp = self.get_next_interval_begin(previous_last_sync_interval_begin_timestamp)
         except ExchangeUnderMaintenanceException as maintenance:
             self.log.debug("Exchange under maintenance. Delaying import of movements.")
 
@@ -76,4 +84,10 @@ class SyncTimer(object):
         begin_timestamp = int(datetime.datetime.fromisoformat(config.sync_begin_timestamp).timestamp() * 1000)
         self.sync_logic.interval_processor(begin_timestamp, to_timestamp, True)
 
-        return to_timestamp
+        return self.get_next_interval_begin(begin_timestamp)
+
+    def get_next_interval_begin(self, begin_timestamp):
+        # the oldest checkpoint of all streams, a stream which was not committed (e.g. because trades could not be
+        # stored) is imported again from there, the other streams resume from their own checkpoints
+        resume_timestamp = self.sync_logic.checkpoints.get_resume_timestamp(self.trading_platform, self.sync_logic.streams)
+        return resume_timestamp if resume_timestamp is not None else begin_timestamp
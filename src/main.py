@@ -1,11 +1,14 @@
+import atexit
 import config
-import time
+import metrics
 import backends.exchanges as exchanges
 
 from backends.firefly import firefly_wrapper
+from backends.firefly.client_pool import client_pool
 import migrate_firefly_identifiers
 from importer.sync_logic import IntervalEnum
 from importer.sync_timer import SyncTimer
+from importer.sync_scheduler import SyncScheduler
 import logging
 
 
@@ -13,8 +16,17 @@ logger = logging.getLogger(__name__)
 
 firefly = firefly_wrapper.FireflyWrapper("binance")
 
+
+def shutdown():
+    client_pool.log_stats()
+    client_pool.close()
+
+
 def start():
     # migrate_firefly_identifiers.migrate_identifiers()
+    atexit.register(shutdown)
+    if config.metrics_port > 0:
+        metrics.start_http_server(config.metrics_port, config.metrics_host)
     try:
         impl_meta_class_instances = exchanges.get_impl_meta_class_instances()
         worker(impl_meta_class_instances)
@@ -38,29 +50,23 @@ def worker(meta_class_instances):
         logger.error("The configured interval is not supported. Use 'hourly' or 'daily' within your config.")
         exit(-749)
 
-    if all(map(lambda exchange: exchange.is_enabled(), meta_class_instances)):
+    if not any(map(lambda exchange: exchange.is_enabled(), meta_class_instances)):
         logger.error("There are no exchanges configured. Exit!")
         exit(0)
 
-    exchanges_list = []
+    scheduler = SyncScheduler(interval_seconds)
     for cls in meta_class_instances:
         if not cls.is_enabled():
             continue
 
         exchange_name = cls.get_exchange_name()
-        exchanges_list.append({ 'name': exchange_name, 'syncer': SyncTimer(exchange_name) })
+        scheduler.add(exchange_name, SyncTimer(exchange_name))
 
-    for exchange in exchanges_list:
-        exchange.get('syncer').initial_sync()
-
-    while True:
-        next_sync_at = time.time() + interval_seconds
-        local_next_sync_at = time.localtime(next_sync_at)
-        logger.info('Sleeping. Next sync will happen at %s', time.strftime('%Y-%m-%d %H:%M:%S', local_next_sync_at))
-        time.sleep(interval_seconds)
-
-        for exchange in exchanges_list:
-            logger.info('Syncing %s', exchange.get('name'))
-            exchange.get('syncer').sync()
+    scheduler.start()
+    try:
+        scheduler.join()
+    finally:
+        scheduler.stop()
+        scheduler.log_status()
 
 start()
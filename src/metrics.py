@@ -0,0 +1,173 @@
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Tuple
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+default_buckets = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0)
+
+
+def format_labels(labels: Tuple[Tuple[str, str], ...], extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    pairs = labels + extra
+    if len(pairs) == 0:
+        return ''
+    escaped = [name + '="' + str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"') + '"'
+               for name, value in pairs]
+    return '{' + ','.join(escaped) + '}'
+
+
+def format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter(object):
+    type = 'counter'
+
+    def __init__(self, name: str, documentation: str):
+        self.name = name
+        self.documentation = documentation
+        self.lock = threading.Lock()
+        self.values: Dict[Tuple[Tuple[str, str], ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def get(self, **labels) -> float:
+        with self.lock:
+            return self.values.get(tuple(sorted(labels.items())), 0)
+
+    def render(self):
+        with self.lock:
+            values = sorted(self.values.items())
+        for labels, value in values:
+            yield self.name + format_labels(labels) + ' ' + format_value(value)
+
+
+class Timer(object):
+    # a Prometheus histogram of durations in seconds
+    type = 'histogram'
+
+    def __init__(self, name: str, documentation: str, buckets=default_buckets):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+        self.lock = threading.Lock()
+        self.values: Dict[Tuple[Tuple[str, str], ...], list] = {}
+
+    def observe(self, seconds: float, **labels):
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            counts, total = self.values.setdefault(key, [[0] * len(self.buckets), 0.0])
+            for index, bucket in enumerate(self.buckets):
+                if seconds <= bucket:
+                    counts[index] += 1
+            self.values[key][1] = total + seconds
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def get(self, **labels) -> Tuple[int, float]:
+        # returns the count and the sum of the observed durations
+        with self.lock:
+            counts, total = self.values.get(tuple(sorted(labels.items())), [[0], 0.0])
+            return counts[-1], total
+
+    def render(self):
+        with self.lock:
+            values = sorted((labels, (list(counts), total)) for labels, (counts, total) in self.values.items())
+        for labels, (counts, total) in values:
+            for bucket, count in zip(self.buckets, counts):
+                yield self.name + '_bucket' + format_labels(labels, (('le', format_value(bucket)),)) + ' ' + str(count)
+            yield self.name + '_count' + format_labels(labels) + ' ' + str(counts[-1])
+            yield self.name + '_sum' + format_labels(labels) + ' ' + format_value(total)
+
+
+class Registry(object):
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.metrics = {}
+
+    def register(self, metric):
+        with self.lock:
+            return self.metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, documentation: str) -> Counter:
+        return self.register(Counter(name, documentation))
+
+    def timer(self, name: str, documentation: str, buckets=default_buckets) -> Timer:
+        return self.register(Timer(name, documentation, buckets))
+
+    def render(self) -> str:
+        # Prometheus text exposition format 0.0.4
+        lines = []
+        with self.lock:
+            metrics = sorted(self.metrics.values(), key=lambda metric: metric.name)
+        for metric in metrics:
+            lines.append('# HELP ' + metric.name + ' ' + metric.documentation)
+            lines.append('# TYPE ' + metric.name + ' ' + metric.type)
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+sync_step_seconds = registry.timer(
+    'sync_step_seconds', 'Duration of the steps of an import, by exchange, stream and step.')
+sync_interval_seconds = registry.timer(
+    'sync_interval_seconds', 'Duration of a whole sync interval, by exchange.')
+firefly_request_seconds = registry.timer(
+    'firefly_request_seconds', 'Duration of Firefly III API calls, by call.')
+exchange_request_seconds = registry.timer(
+    'exchange_request_seconds', 'Duration of exchange API calls, by exchange and endpoint.')
+exchange_rate_limited_total = registry.counter(
+    'exchange_rate_limited_total', 'Rate limited exchange API calls, by exchange and endpoint.')
+ledger_request_seconds = registry.timer(
+    'ledger_request_seconds', 'Duration of public ledger explorer calls, by ledger host and endpoint.')
+ledger_rate_limited_total = registry.counter(
+    'ledger_rate_limited_total', 'Rate limited public ledger explorer calls, by ledger host and endpoint.')
+records_total = registry.counter(
+    'sync_records_total', 'Records by exchange, kind and outcome (fetched, created, duplicate, error, skipped, known).')
+firefly_calls_saved_total = registry.counter(
+    'firefly_calls_saved_total', 'Firefly III account listings saved by the account index, by lookup.')
+ledger_cache_total = registry.counter(
+    'ledger_cache_total', 'Public ledger cache lookups by chain, kind and outcome (hit, miss, evicted).')
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        payload = registry.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+# Serves the metrics on http://<host>:<port>/metrics from a daemon thread, see METRICS_PORT.
+def start_http_server(port: int, host: str = '127.0.0.1') -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='metrics', daemon=True).start()
+    logger.info('Serving metrics on http://%s:%d/metrics', host, server.server_address[1])
+    return server
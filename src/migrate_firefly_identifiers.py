@@ -1,6 +1,7 @@
 import firefly_iii_client
 import config
 from backends.firefly import firefly_wrapper
+from backends.firefly.pagination import paginate
 
 LEGACY_ASSET_ACCOUNT_IDENTIFIER_v1 = "py1binance2firefly3:binance-fund"
 LEGACY_REVENUE_ACCOUNT_IDENTIFIER_v1 = "py1binance2firefly3:binance-interest"
@@ -31,13 +32,12 @@ def migrate_identifiers():
 
 
 def get_firefly_accounts():
-    with firefly_iii_client.ApiClient(firefly_wrapper.firefly_config) as api_client:
+    with firefly_wrapper.client_pool.client("migration_list_account") as api_client:
         account_api = firefly_iii_client.AccountsApi(api_client)
 
         list_of_accounts = []
         try:
-            list_of_all_accounts = account_api.list_account()
-            for account_read in list_of_all_accounts.data:
+            for account_read in paginate(account_api.list_account, limit=config.firefly_page_size):
                 list_of_accounts.append(account_read)
         except Exception as e:
             print("Migration: Cannot get Firefly-III accounts.", e)
@@ -77,7 +77,7 @@ def migrate_identifiers_on_accounts_v2tov3(list_of_accounts):
 
 
 def save_migrated_accounts(list_of_accounts):
-    with firefly_iii_client.ApiClient(firefly_wrapper.firefly_config) as api_client:
+    with firefly_wrapper.client_pool.client("migration_update_account") as api_client:
         account_api = firefly_iii_client.AccountsApi(api_client)
 
         try:
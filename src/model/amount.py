@@ -0,0 +1,12 @@
+from decimal import Decimal
+
+
+def to_decimal(value):
+    if value is None or isinstance(value, Decimal):
+        return value
+    return Decimal(str(value))
+
+
+def format_amount(value) -> str:
+    # Firefly III expects plain decimal strings, str(Decimal) may use the exponent notation (e.g. 1E-8)
+    return format(to_decimal(value), 'f')
@@ -2,7 +2,9 @@ from typing import List
 
 
 class LedgerTransaction:
-    def __init__(self, txId: str, ins: List[str], outs: List[str]):
+    def __init__(self, txId: str, ins: List[str], outs: List[str], confirmed: bool = True):
         self.txId = txId
         self.ins = ins
         self.outs = outs
+        # only confirmed transactions are final and may be cached
+        self.confirmed = confirmed
@@ -1,14 +1,9 @@
+from dataclasses import dataclass
 from datetime import datetime
+from decimal import Decimal
 from enum import Enum
 
-
-class InterestData(object):
-    def __init__(self, type, interest, interest_currency, date, due):
-        self.type: SavingsType = type
-        self.amount: str = interest
-        self.currency: str = interest_currency
-        self.date: datetime = date
-        self.due: InterestDue = due
+from model.amount import to_decimal
 
 
 class InterestDue(Enum):
@@ -20,3 +15,16 @@ class InterestDue(Enum):
 class SavingsType(Enum):
     STAKING = 1
     LENDING = 2
+
+
+@dataclass(frozen=True)
+class InterestData(object):
+    __slots__ = ('type', 'amount', 'currency', 'date', 'due')
+    type: SavingsType
+    amount: Decimal
+    currency: str
+    date: datetime
+    due: InterestDue
+
+    def __post_init__(self):
+        object.__setattr__(self, 'amount', to_decimal(self.amount))
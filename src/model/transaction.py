@@ -1,17 +1,8 @@
+from dataclasses import dataclass
+from decimal import Decimal
 from enum import Enum
 
-
-class TradeData(object):
-    def __init__(self, trading_platform, commission_amount, commission_asset, currency_amount, security_amount, trading_pair, type, trade_id, trade_time):
-        self.trading_platform = trading_platform
-        self.commission_amount = commission_amount
-        self.commission_asset = commission_asset
-        self.currency_amount = currency_amount
-        self.security_amount = security_amount
-        self.trading_pair = trading_pair
-        self.type: TransactionType = type
-        self.id = trade_id
-        self.time = trade_time
+from model.amount import to_decimal
 
 
 class TransactionType(Enum):
@@ -19,10 +10,36 @@ class TransactionType(Enum):
     SELL = 2
 
 
+@dataclass(frozen=True)
 class TradingPair(object):
-    def __init__(self, from_coin, to_coin):
-        self.security = from_coin if from_coin != 'OPC' else 'OP'
-        self.currency = to_coin if to_coin != 'OPC' else 'OP'
+    __slots__ = ('security', 'currency')
+    security: str
+    currency: str
+
+    def __post_init__(self):
+        object.__setattr__(self, 'security', self.security if self.security != 'OPC' else 'OP')
+        object.__setattr__(self, 'currency', self.currency if self.currency != 'OPC' else 'OP')
+
+
+@dataclass(frozen=True)
+class TradeData(object):
+    __slots__ = ('trading_platform', 'commission_amount', 'commission_asset', 'currency_amount', 'security_amount',
+                 'trading_pair', 'type', 'id', 'time')
+    trading_platform: str
+    commission_amount: Decimal
+    commission_asset: str
+    currency_amount: Decimal
+    security_amount: Decimal
+    trading_pair: TradingPair
+    type: TransactionType
+    id: int
+    time: int
+
+    def __post_init__(self):
+        # amounts are parsed once when the trade is ingested from the exchange
+        object.__setattr__(self, 'commission_amount', to_decimal(self.commission_amount))
+        object.__setattr__(self, 'currency_amount', to_decimal(self.currency_amount))
+        object.__setattr__(self, 'security_amount', to_decimal(self.security_amount))
 
 
 known_trading_pairs = []
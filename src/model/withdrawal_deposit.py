@@ -1,19 +1,34 @@
+from dataclasses import dataclass
+from decimal import Decimal
+
+from model.amount import to_decimal
+
+
+@dataclass(frozen=True)
 class WithdrawalData(object):
-    def __init__(self, trading_platform: str, amount: float, asset: str, target_address: str, timestamp: int, transaction_fee: float, transaction_id: str):
-        self.trading_platform = trading_platform
-        self.amount = amount
-        self.asset = asset
-        self.target_address = target_address
-        self.timestamp = timestamp
-        self.transaction_fee = transaction_fee
-        self.transaction_id = transaction_id
+    __slots__ = ('trading_platform', 'amount', 'asset', 'target_address', 'timestamp', 'transaction_fee', 'transaction_id')
+    trading_platform: str
+    amount: Decimal
+    asset: str
+    target_address: str
+    timestamp: int
+    transaction_fee: Decimal
+    transaction_id: str
 
+    def __post_init__(self):
+        object.__setattr__(self, 'amount', to_decimal(self.amount))
+        object.__setattr__(self, 'transaction_fee', to_decimal(self.transaction_fee))
 
+
+@dataclass(frozen=True)
 class DepositData(object):
-    def __init__(self, trading_platform: str, amount: float, asset: str, target_address: str, timestamp: int, transaction_id: str):
-        self.trading_platform = trading_platform
-        self.amount = amount
-        self.asset = asset
-        self.target_address = target_address
-        self.timestamp = timestamp
-        self.transaction_id = transaction_id
+    __slots__ = ('trading_platform', 'amount', 'asset', 'target_address', 'timestamp', 'transaction_id')
+    trading_platform: str
+    amount: Decimal
+    asset: str
+    target_address: str
+    timestamp: int
+    transaction_id: str
+
+    def __post_init__(self):
+        object.__setattr__(self, 'amount', to_decimal(self.amount))
@@ -0,0 +1,34 @@
+import sys
+
+import config
+import backends.exchanges as exchanges
+from backends.firefly import firefly_wrapper
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+# Seeds the local dedup ledger from the transactions already stored in Firefly III.
+# Usage: python src/rebuild_dedup_ledger.py [exchange name ...], defaults to all enabled exchanges.
+def rebuild(exchange_names):
+    firefly_wrapper.FireflyWrapper("binance").connect()
+
+    for exchange_name in exchange_names:
+        logger.info("Rebuilding the local dedup ledger of %s from Firefly III", exchange_name)
+        firefly_wrapper.FireflyWrapper(exchange_name).rebuild_dedup_ledger()
+
+
+def get_enabled_exchange_names():
+    return [
+        instance.get_exchange_name()
+        for instance in exchanges.get_impl_meta_class_instances()
+        if instance.is_enabled()
+    ]
+
+
+if __name__ == '__main__':
+    try:
+        rebuild(sys.argv[1:] if len(sys.argv) > 1 else get_enabled_exchange_names())
+    except Exception as e:
+        logger.error(str(e), exc_info=config.debug)
+        exit(-1)
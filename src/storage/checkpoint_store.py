@@ -0,0 +1,81 @@
+import sqlite3
+import threading
+import time
+from typing import List, Optional
+
+from storage.paths import state_path
+
+STREAM_TRADES = "trades"
+STREAM_DEPOSITS = "deposits"
+STREAM_WITHDRAWALS = "withdrawals"
+STREAM_INTERESTS = "interests"
+
+
+# Durable record of the last fully imported interval end (in milli-seconds), kept per exchange and per stream.
+class CheckpointStore(object):
+
+    def __init__(self, path: str = None):
+        self.path = path if path is not None else state_path("checkpoints.sqlite")
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(self.path, check_same_thread=False)
+        with self.lock, self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS checkpoints ("
+                " exchange TEXT NOT NULL,"
+                " stream TEXT NOT NULL,"
+                " timestamp INTEGER NOT NULL,"
+                " committed_at REAL NOT NULL,"
+                " PRIMARY KEY (exchange, stream))"
+            )
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS cursors ("
+                " exchange TEXT NOT NULL,"
+                " name TEXT NOT NULL,"
+                " value INTEGER NOT NULL,"
+                " PRIMARY KEY (exchange, name))"
+            )
+
+    def get(self, exchange: str, stream: str) -> Optional[int]:
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT timestamp FROM checkpoints WHERE exchange = ? AND stream = ?",
+                (exchange.lower(), stream)
+            ).fetchone()
+        return None if row is None else row[0]
+
+    def commit(self, exchange: str, stream: str, timestamp: int):
+        # a checkpoint never moves backwards, re-importing an older interval must not lose progress
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT INTO checkpoints (exchange, stream, timestamp, committed_at) VALUES (?, ?, ?, ?)"
+                " ON CONFLICT (exchange, stream) DO UPDATE SET"
+                " timestamp = max(timestamp, excluded.timestamp), committed_at = excluded.committed_at",
+                (exchange.lower(), stream, int(timestamp), time.time())
+            )
+
+    def get_resume_timestamp(self, exchange: str, streams: List[str]) -> Optional[int]:
+        # the oldest checkpoint of all streams, or None as long as one of them was never committed
+        timestamps = [self.get(exchange, stream) for stream in streams]
+        if len(timestamps) == 0 or any(timestamp is None for timestamp in timestamps):
+            return None
+        return min(timestamps)
+
+    # cursors are exchange specific positions, e.g. the last seen trade id of a symbol, which only move forward as well
+    def get_cursor(self, exchange: str, name: str) -> Optional[int]:
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT value FROM cursors WHERE exchange = ? AND name = ?", (exchange.lower(), name)
+            ).fetchone()
+        return None if row is None else row[0]
+
+    def set_cursor(self, exchange: str, name: str, value: int):
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT INTO cursors (exchange, name, value) VALUES (?, ?, ?)"
+                " ON CONFLICT (exchange, name) DO UPDATE SET value = max(value, excluded.value)",
+                (exchange.lower(), name, int(value))
+            )
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
@@ -0,0 +1,70 @@
+import sqlite3
+import threading
+import time
+from typing import Iterable, Tuple
+
+from storage.paths import state_path
+
+RECORD_TRADE = "trade"
+RECORD_COMMISSION = "commission"
+RECORD_WITHDRAWAL = "withdrawal"
+RECORD_DEPOSIT = "deposit"
+RECORD_INTEREST = "interest"
+
+
+# Local index of the records already written to Firefly III, keyed on exchange, record kind and external id.
+# Records found in here are skipped before a payload is built, instead of waiting for Firefly III to answer 422.
+class DedupLedger(object):
+    def __init__(self, path: str = None):
+        self.path = path if path is not None else state_path("dedup_ledger.sqlite")
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(self.path, check_same_thread=False)
+        with self.lock, self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS written_records ("
+                " exchange TEXT NOT NULL,"
+                " kind TEXT NOT NULL,"
+                " external_id TEXT NOT NULL,"
+                " written_at REAL NOT NULL,"
+                " PRIMARY KEY (exchange, kind, external_id))"
+            )
+
+    def contains(self, exchange: str, kind: str, external_id) -> bool:
+        if external_id is None or str(external_id) == '':
+            return False
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT 1 FROM written_records WHERE exchange = ? AND kind = ? AND external_id = ?",
+                (exchange.lower(), kind, str(external_id))
+            ).fetchone()
+        return row is not None
+
+    def add(self, exchange: str, kind: str, external_id):
+        self.add_many([(exchange, kind, external_id)])
+
+    def add_many(self, records: Iterable[Tuple[str, str, object]]):
+        rows = [
+            (exchange.lower(), kind, str(external_id), time.time())
+            for exchange, kind, external_id in records
+            if external_id is not None and str(external_id) != ''
+        ]
+        with self.lock, self.connection:
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO written_records (exchange, kind, external_id, written_at) VALUES (?, ?, ?, ?)",
+                rows
+            )
+
+    def count(self, exchange: str) -> int:
+        with self.lock:
+            [count] = self.connection.execute(
+                "SELECT count(*) FROM written_records WHERE exchange = ?", (exchange.lower(),)
+            ).fetchone()
+        return count
+
+    def clear(self, exchange: str):
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM written_records WHERE exchange = ?", (exchange.lower(),))
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
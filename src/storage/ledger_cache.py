@@ -0,0 +1,160 @@
+import json
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+from model.ledger_transaction import LedgerTransaction
+from storage.paths import state_path
+import metrics
+import logging
+
+logger = logging.getLogger(__name__)
+
+KIND_TRANSACTION = "transaction"
+KIND_ADDRESSES = "addresses"
+
+
+# Local copy of public ledger data. Confirmed transactions never change, so they are kept by chain and transaction id.
+# The addresses derived from an xpub (or any other account identifier) are kept together with the number of ledger
+# transactions they were collected from, so that the next pass only has to walk the transactions added since.
+# Both tables are bounded to max_entries rows each, the least recently used rows are evicted first.
+class LedgerCache(object):
+
+    def __init__(self, path: str = None, max_entries: int = None):
+        self.path = path if path is not None else state_path("ledger_cache.sqlite")
+        if max_entries is None:
+            # imported here, the storage modules have to stay importable without the Firefly III settings
+            import config
+            max_entries = config.ledger_cache_max_entries
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.stats: Dict[Tuple[str, str], int] = {}
+        self.connection = sqlite3.connect(self.path, check_same_thread=False)
+        with self.lock, self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS ledger_transactions ("
+                " chain TEXT NOT NULL,"
+                " tx_id TEXT NOT NULL,"
+                " ins TEXT NOT NULL,"
+                " outs TEXT NOT NULL,"
+                " used_at REAL NOT NULL,"
+                " PRIMARY KEY (chain, tx_id))"
+            )
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS address_sets ("
+                " chain TEXT NOT NULL,"
+                " address TEXT NOT NULL,"
+                " addresses TEXT NOT NULL,"
+                " seen_transactions INTEGER NOT NULL,"
+                " used_at REAL NOT NULL,"
+                " PRIMARY KEY (chain, address))"
+            )
+            self.connection.execute("CREATE INDEX IF NOT EXISTS ledger_transactions_used_at ON ledger_transactions (used_at)")
+            self.connection.execute("CREATE INDEX IF NOT EXISTS address_sets_used_at ON address_sets (used_at)")
+
+    def count(self, chain: str, kind: str, outcome: str, amount: int = 1):
+        if amount == 0:
+            return
+        with self.lock:
+            self.stats[(kind, outcome)] = self.stats.get((kind, outcome), 0) + amount
+        metrics.ledger_cache_total.inc(amount, chain=chain, kind=kind, outcome=outcome)
+
+    def get_transactions(self, chain: str, tx_ids: Iterable[str]) -> Dict[str, LedgerTransaction]:
+        tx_ids = list(dict.fromkeys(tx_ids))
+        result = {}
+        with self.lock, self.connection:
+            for start in range(0, len(tx_ids), 500):
+                chunk = tx_ids[start:start + 500]
+                rows = self.connection.execute(
+                    "SELECT tx_id, ins, outs FROM ledger_transactions WHERE chain = ? AND tx_id IN (" +
+                    ",".join("?" * len(chunk)) + ")",
+                    [chain.lower()] + chunk
+                ).fetchall()
+                for tx_id, ins, outs in rows:
+                    result[tx_id] = LedgerTransaction(txId=tx_id, ins=json.loads(ins), outs=json.loads(outs))
+            self.connection.executemany(
+                "UPDATE ledger_transactions SET used_at = ? WHERE chain = ? AND tx_id = ?",
+                [(time.time(), chain.lower(), tx_id) for tx_id in result]
+            )
+        self.count(chain, KIND_TRANSACTION, "hit", len(result))
+        self.count(chain, KIND_TRANSACTION, "miss", len(tx_ids) - len(result))
+        return result
+
+    def get_transaction(self, chain: str, tx_id: str) -> Optional[LedgerTransaction]:
+        return self.get_transactions(chain, [tx_id]).get(tx_id)
+
+    def put_transactions(self, chain: str, transactions: Dict[str, LedgerTransaction]):
+        # keyed by the requested id, unconfirmed transactions may still change or disappear and are looked up again
+        rows = [
+            (chain.lower(), tx_id, json.dumps(transaction.ins), json.dumps(transaction.outs), time.time())
+            for tx_id, transaction in transactions.items()
+            if transaction.confirmed and tx_id
+        ]
+        if len(rows) == 0:
+            return
+        with self.lock, self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO ledger_transactions (chain, tx_id, ins, outs, used_at) VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+            evicted = self.evict("ledger_transactions")
+        self.count(chain, KIND_TRANSACTION, "evicted", evicted)
+
+    def get_addresses(self, chain: str, address: str) -> Tuple[Set[str], int]:
+        # the cached addresses and the number of ledger transactions they were collected from
+        with self.lock, self.connection:
+            row = self.connection.execute(
+                "SELECT addresses, seen_transactions FROM address_sets WHERE chain = ? AND address = ?",
+                (chain.lower(), address)
+            ).fetchone()
+            if row is not None:
+                self.connection.execute(
+                    "UPDATE address_sets SET used_at = ? WHERE chain = ? AND address = ?",
+                    (time.time(), chain.lower(), address)
+                )
+        self.count(chain, KIND_ADDRESSES, "miss" if row is None else "hit")
+        if row is None:
+            return set(), 0
+        return set(json.loads(row[0])), row[1]
+
+    def put_addresses(self, chain: str, address: str, addresses: Iterable[str], seen_transactions: int):
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO address_sets (chain, address, addresses, seen_transactions, used_at)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (chain.lower(), address, json.dumps(sorted(addresses)), int(seen_transactions), time.time())
+            )
+            evicted = self.evict("address_sets")
+        self.count(chain, KIND_ADDRESSES, "evicted", evicted)
+
+    def evict(self, table: str) -> int:
+        # called with the lock held, returns the number of evicted rows
+        [count] = self.connection.execute("SELECT count(*) FROM " + table).fetchone()
+        if count <= self.max_entries:
+            return 0
+        self.connection.execute(
+            "DELETE FROM " + table + " WHERE rowid IN (SELECT rowid FROM " + table + " ORDER BY used_at LIMIT ?)",
+            (count - self.max_entries,)
+        )
+        return count - self.max_entries
+
+    def get_stats(self) -> Dict[str, Dict[str, int]]:
+        with self.lock:
+            stats = dict(self.stats)
+        result = {}
+        for (kind, outcome), value in stats.items():
+            result.setdefault(kind, {})[outcome] = value
+        return result
+
+    def log_stats(self):
+        for kind, stats in sorted(self.get_stats().items()):
+            hits, misses = stats.get("hit", 0), stats.get("miss", 0)
+            if hits + misses == 0:
+                continue
+            logger.info('Ledger cache %s: %d hits, %d misses (%.0f%% hit rate), %d evicted', kind, hits, misses,
+                        100.0 * hits / (hits + misses), stats.get("evicted", 0))
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
@@ -0,0 +1,13 @@
+import os
+
+default_state_dir = "state"
+
+
+def get_state_dir() -> str:
+    return os.environ.get('SYNC_STATE_DIR', default_state_dir)
+
+
+def state_path(file_name: str) -> str:
+    state_dir = get_state_dir()
+    os.makedirs(state_dir, exist_ok=True)
+    return os.path.join(state_dir, file_name)
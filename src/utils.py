@@ -18,6 +18,17 @@ def human_readable_interval_ts(from_timestamp, to_timestamp):
 def days_ms(timestamp, days=90):
     return timestamp + days * one_day
 
+def windows_ms(from_timestamp, to_timestamp, days=90):
+    # contiguous [begin, end] windows in milli-seconds, end inclusive, covering [from_timestamp, to_timestamp)
+    result = []
+    window_length = to_ms(days * one_day)
+    begin = from_timestamp
+    while begin < to_timestamp:
+        end = min(begin + window_length, to_timestamp)
+        result.append((begin, end - 1))
+        begin = end
+    return result
+
 def interval(from_timestamp, to_timestamp, days=90):
     from_datetime = datetime.fromtimestamp(from_ms(from_timestamp))
     to_datetime = from_datetime + relativedelta(days=days)
@@ -0,0 +1,356 @@
+import hashlib
+import json
+import random
+import re
+import shlex
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+
+# In-process stand-in for the parts of the Firefly III API v1 the importer uses:
+#   GET    /api/v1/about
+#   GET    /api/v1/accounts?type=&page=&limit=      POST /api/v1/accounts
+#   GET    /api/v1/transactions?type=&start=&end=&page=&limit=
+#   POST   /api/v1/transactions                     (422 "Duplicate of transaction" with error_if_duplicate_hash)
+#   DELETE /api/v1/transactions/<id>
+#   GET    /api/v1/search/transactions?query=&page=&limit=
+# Latency and errors can be injected to load test the importer offline, e.g.
+#   with FakeFireflyServer(latency_seconds=0.01, error_rate=0.05) as server:
+#       ... point FIREFLY_HOST to server.api_url ...
+class FakeFirefly(object):
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.accounts: Dict[str, dict] = {}
+        self.groups: Dict[str, dict] = {}
+        self.hashes: Dict[str, str] = {}
+        self.next_account_id = 1
+        self.next_group_id = 1
+        self.next_journal_id = 1
+        self.version = 0
+        self.listings = {}
+
+    def add_account(self, name: str, type: str = 'asset', currency_code: str = 'EUR', currency_symbol: str = None,
+                    notes: str = None, **attributes) -> dict:
+        with self.lock:
+            account_id = str(self.next_account_id)
+            self.next_account_id += 1
+            now = get_now()
+            account = {
+                "type": "accounts",
+                "id": account_id,
+                "attributes": dict({
+                    "created_at": now,
+                    "updated_at": now,
+                    "active": True,
+                    "name": name,
+                    "type": type,
+                    "account_role": "defaultAsset" if type == 'asset' else None,
+                    "currency_id": "1",
+                    "currency_code": currency_code,
+                    "currency_symbol": currency_symbol if currency_symbol is not None else currency_code,
+                    "currency_decimal_places": 8,
+                    "current_balance": "0",
+                    "current_balance_date": now,
+                    "notes": notes,
+                    "iban": None,
+                    "bic": None,
+                    "account_number": None,
+                    "opening_balance": "0",
+                    "virtual_balance": "0",
+                    "include_net_worth": True,
+                }, **attributes),
+            }
+            self.accounts[account_id] = account
+            return account
+
+    def list_accounts(self, type: Optional[str]) -> List[dict]:
+        with self.lock:
+            return [account for account in self.accounts.values()
+                    if type in (None, '', 'all') or account["attributes"]["type"] == type]
+
+    def store_transaction(self, payload: dict):
+        # returns (status, body) like the Firefly III API
+        splits = payload.get("transactions") or []
+        if len(splits) == 0:
+            return 422, {"message": "The given data was invalid.", "errors": {"transactions": ["Need at least one transaction."]}}
+
+        with self.lock:
+            hashes = [get_split_hash(split) for split in splits]
+            if payload.get("error_if_duplicate_hash"):
+                for index, split_hash in enumerate(hashes):
+                    duplicate_id = self.hashes.get(split_hash)
+                    if duplicate_id is not None:
+                        message = "Duplicate of transaction #" + duplicate_id + "."
+                        return 422, {"message": "The given data was invalid.",
+                                     "errors": {"transactions." + str(index) + ".description": [message]}}
+
+            group_id = str(self.next_group_id)
+            self.next_group_id += 1
+            now = get_now()
+            group = {
+                "type": "transactions",
+                "id": group_id,
+                "attributes": {
+                    "created_at": now,
+                    "updated_at": now,
+                    "user": "1",
+                    "group_title": payload.get("group_title"),
+                    "transactions": [self.create_split(split) for split in splits],
+                },
+                "links": {"self": "/api/v1/transactions/" + group_id},
+            }
+            self.groups[group_id] = group
+            for split_hash in hashes:
+                self.hashes[split_hash] = group_id
+            self.version += 1
+            return 200, {"data": group}
+
+    def create_split(self, split: dict) -> dict:
+        journal_id = str(self.next_journal_id)
+        self.next_journal_id += 1
+        source = self.accounts.get(str(split.get("source_id")))
+        destination = self.accounts.get(str(split.get("destination_id")))
+        result = dict(split)
+        result.update({
+            "transaction_journal_id": journal_id,
+            "source_id": source["id"] if source else split.get("source_id"),
+            "source_name": source["attributes"]["name"] if source else split.get("source_name"),
+            "destination_id": destination["id"] if destination else split.get("destination_id"),
+            "destination_name": destination["attributes"]["name"] if destination else split.get("destination_name"),
+            "currency_code": split.get("currency_code") or (source or destination or {}).get("attributes", {}).get("currency_code"),
+            "tags": split.get("tags") or [],
+            "notes": split.get("notes"),
+            "external_id": split.get("external_id"),
+        })
+        return result
+
+    def delete_transaction(self, group_id: str) -> bool:
+        with self.lock:
+            group = self.groups.pop(group_id, None)
+            if group is None:
+                return False
+            for split_hash in [split_hash for split_hash, owner in self.hashes.items() if owner == group_id]:
+                del self.hashes[split_hash]
+            self.version += 1
+            return True
+
+    def list_transactions(self, type: Optional[str], start: Optional[str] = None, end: Optional[str] = None) -> List[dict]:
+        # listings are cached per type until the next write, so paging through 1M transactions stays linear
+        with self.lock:
+            key = (type or 'all', self.version)
+            listing = self.listings.get(key)
+            if listing is None:
+                listing = [group for group in self.groups.values()
+                           if type in (None, '', 'all') or group["attributes"]["transactions"][0].get("type") == type]
+                self.listings = {key: listing}
+
+        if start is None and end is None:
+            return listing
+        return [group for group in listing if is_in_range(group["attributes"]["transactions"][0].get("date"), start, end)]
+
+    def search_transactions(self, query: str) -> List[dict]:
+        matchers = [get_query_matcher(term) for term in shlex.split(query)]
+        with self.lock:
+            groups = list(self.groups.values())
+        return [group for group in groups
+                if any(all(matcher(split) for matcher in matchers) for split in group["attributes"]["transactions"])]
+
+
+def get_now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def get_split_hash(split: dict) -> str:
+    return hashlib.sha256(json.dumps(split, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+def is_in_range(date: Optional[str], start: Optional[str], end: Optional[str]) -> bool:
+    day = (date or '')[:10]
+    return (start is None or day >= start) and (end is None or day <= end)
+
+
+def get_query_matcher(term: str):
+    field, _, value = term.partition(':')
+    if value == '':
+        return lambda split: term.lower() in (split.get("description") or '').lower() or \
+                             term.lower() in (split.get("notes") or '').lower()
+    if field == 'external_id_is':
+        return lambda split: split.get("external_id") == value
+    if field == 'notes_contains':
+        return lambda split: value.lower() in (split.get("notes") or '').lower()
+    if field == 'description_contains':
+        return lambda split: value.lower() in (split.get("description") or '').lower()
+    if field == 'date_after':
+        return lambda split: (split.get("date") or '')[:10] >= value
+    if field == 'date_before':
+        return lambda split: (split.get("date") or '')[:10] <= value
+    return lambda split: False
+
+
+def get_page(items: List[dict], query: dict, path: str):
+    limit = max(int(query.get("limit", 50)), 1)
+    page = max(int(query.get("page", 1)), 1)
+    total_pages = max((len(items) + limit - 1) // limit, 1)
+    data = items[(page - 1) * limit:page * limit]
+    return {
+        "data": data,
+        "meta": {"pagination": {"total": len(items), "count": len(data), "per_page": limit,
+                                "current_page": page, "total_pages": total_pages}},
+        "links": {"self": path + "?page=" + str(page), "first": path + "?page=1",
+                  "last": path + "?page=" + str(total_pages)},
+    }
+
+
+class FakeFireflyHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # headers and body are written separately, without this every response waits for the delayed ACK of the client
+    disable_nagle_algorithm = True
+    server: "FakeFireflyHTTPServer"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.handle_request("GET")
+
+    def do_POST(self):
+        self.handle_request("POST")
+
+    def do_DELETE(self):
+        self.handle_request("DELETE")
+
+    def handle_request(self, method: str):
+        url = urlparse(self.path)
+        query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length > 0 else b''
+        fake_server = self.server.fake_server
+
+        route = re.sub(r'/\d+$', '/{id}', url.path)
+        fake_server.count_request(method + " " + route)
+        fake_server.delay()
+
+        injected = fake_server.get_injected_error()
+        if injected is not None:
+            status, retry_after = injected
+            self.respond(status, {"message": "Injected error"},
+                         {"Retry-After": str(retry_after)} if retry_after is not None else None)
+            return
+
+        access_token = fake_server.access_token
+        if access_token is not None and self.headers.get("Authorization") != "Bearer " + access_token:
+            self.respond(401, {"message": "Unauthenticated."})
+            return
+
+        firefly = fake_server.firefly
+        if method == "GET" and url.path == "/api/v1/about":
+            self.respond(200, {"data": {"version": "5.7.18", "api_version": "1.5.6", "php_version": "8.1",
+                                        "os": "Linux", "driver": "sqlite"}})
+        elif method == "GET" and url.path == "/api/v1/accounts":
+            self.respond(200, get_page(firefly.list_accounts(query.get("type")), query, url.path))
+        elif method == "POST" and url.path == "/api/v1/accounts":
+            attributes = json.loads(body or b'{}')
+            self.respond(200, {"data": firefly.add_account(**attributes)})
+        elif method == "GET" and url.path == "/api/v1/transactions":
+            groups = firefly.list_transactions(query.get("type"), query.get("start"), query.get("end"))
+            self.respond(200, get_page(groups, query, url.path))
+        elif method == "POST" and url.path == "/api/v1/transactions":
+            status, response = firefly.store_transaction(json.loads(body or b'{}'))
+            self.respond(status, response)
+        elif method == "DELETE" and route == "/api/v1/transactions/{id}":
+            if firefly.delete_transaction(url.path.rsplit('/', 1)[1]):
+                self.respond(204, None)
+            else:
+                self.respond(404, {"message": "Resource not found"})
+        elif method == "GET" and url.path == "/api/v1/search/transactions":
+            self.respond(200, get_page(firefly.search_transactions(query.get("query", "")), query, url.path))
+        else:
+            self.respond(404, {"message": "Resource not found"})
+
+    def respond(self, status: int, body: Optional[dict], headers: dict = None):
+        payload = json.dumps(body).encode('utf-8') if body is not None else b''
+        self.send_response(status)
+        self.send_header("Content-Type", "application/vnd.api+json")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+class FakeFireflyHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    fake_server: "FakeFireflyServer" = None
+
+
+class FakeFireflyServer(object):
+
+    def __init__(self, firefly: FakeFirefly = None, latency_seconds: float = 0.0, error_rate: float = 0.0,
+                 error_status: int = 500, retry_after: int = None, access_token: str = None, seed: int = 0):
+        self.firefly = firefly if firefly is not None else FakeFirefly()
+        self.latency_seconds = latency_seconds
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.retry_after = retry_after
+        self.access_token = access_token
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.planned_errors = []
+        self.requests: Dict[str, int] = {}
+        self.http_server = None
+        self.thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.http_server.server_address[:2]
+        return "http://" + host + ":" + str(port)
+
+    @property
+    def api_url(self) -> str:
+        # the Firefly III client appends /v1/... to its host
+        return self.url + "/api"
+
+    def start(self) -> "FakeFireflyServer":
+        self.http_server = FakeFireflyHTTPServer(("127.0.0.1", 0), FakeFireflyHandler)
+        self.http_server.fake_server = self
+        self.thread = threading.Thread(target=self.http_server.serve_forever, kwargs={"poll_interval": 0.05},
+                                       name="fake-firefly", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        if self.http_server is not None:
+            self.http_server.shutdown()
+            self.http_server.server_close()
+            self.http_server = None
+
+    def __enter__(self) -> "FakeFireflyServer":
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def fail_next(self, status: int, count: int = 1, retry_after: int = None):
+        with self.lock:
+            self.planned_errors.extend([(status, retry_after)] * count)
+
+    def get_injected_error(self):
+        with self.lock:
+            if self.planned_errors:
+                return self.planned_errors.pop(0)
+            if self.error_rate > 0 and self.random.random() < self.error_rate:
+                return self.error_status, self.retry_after
+        return None
+
+    def delay(self):
+        if self.latency_seconds > 0:
+            time.sleep(self.latency_seconds)
+
+    def count_request(self, name: str):
+        with self.lock:
+            self.requests[name] = self.requests.get(name, 0) + 1
@@ -0,0 +1,33 @@
+from contextlib import contextmanager
+from unittest.mock import patch
+
+from support.fake_firefly import FakeFireflyServer
+
+
+# Points the importer at a FakeFireflyServer for the duration of a test. config reads the .env file when it is first
+# imported, the required settings are handed to it in its place; the Firefly III settings are patched per test.
+@contextmanager
+def connected_to_fake_firefly(monkeypatch, state_dir):
+    monkeypatch.setenv('SYNC_STATE_DIR', str(state_dir))
+    with patch('dotenv.dotenv_values', return_value={'FIREFLY_HOST': 'http://localhost', 'FIREFLY_ACCESS_TOKEN': 'token',
+                                                      'SYNC_BEGIN_TIMESTAMP': '2021-01-01',
+                                                      'SYNC_TRADES_INTERVAL': 'daily'}):
+        import config
+    from backends.firefly import firefly_wrapper
+    from backends.firefly.client_pool import client_pool
+
+    with FakeFireflyServer(access_token='token') as server:
+        monkeypatch.setattr(config, 'firefly_host', server.api_url)
+        monkeypatch.setattr(config, 'firefly_access_token', 'token')
+        monkeypatch.setattr(config, 'firefly_dedup_ledger', False)
+        monkeypatch.setattr(firefly_wrapper, 'firefly_config', None)
+        monkeypatch.setattr(client_pool, 'configuration', None)
+        monkeypatch.setattr(client_pool, 'api_client', None)
+        yield server
+
+
+def add_exchange_accounts(server: FakeFireflyServer, exchange_name: str, fund_key: str, codes):
+    for code in codes:
+        server.firefly.add_account(exchange_name + ' ' + code, currency_code=code, notes=fund_key)
+    server.firefly.add_account(exchange_name + ' fees', type='expense', notes=fund_key)
+    server.firefly.add_account(exchange_name + ' revenue', type='revenue', notes=fund_key)
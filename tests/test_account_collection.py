@@ -0,0 +1,37 @@
+from types import SimpleNamespace
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from backends.firefly.account_collection import AccountCollection, AccountCollectionIndex
+
+
+def account_collection(security, currency_code, currency_symbol):
+    asset_account = SimpleNamespace(attributes=SimpleNamespace(currency_code=currency_code, currency_symbol=currency_symbol))
+    return AccountCollection(security, asset_account, SimpleNamespace(), SimpleNamespace())
+
+
+def test_index_resolves_securities_and_commission_assets_exactly():
+    btc = account_collection("BTC", "BTC", "₿")
+    bnb = account_collection("BNB", "BNB", "BNB")
+    index = AccountCollectionIndex([btc, bnb])
+
+    assert index.get_by_security("BTC") is btc
+    assert index.get_by_commission_asset("₿") is btc
+    assert index.get_by_commission_asset("BNB") is bnb
+    assert index.get_by_commission_asset("B") is None
+    assert list(index) == [btc, bnb]
+    assert len(index) == 2
+
+
+def test_op_commissions_resolve_an_opc_account():
+    op = account_collection("OP", "OPC", None)
+    eur = account_collection("EUR", "EUR", "€")
+    index = AccountCollectionIndex([op, eur])
+
+    assert index.get_by_security("OP") is op
+    assert index.get_by_security("OPC") is op
+    assert index.get_by_commission_asset("OP") is op
+    assert index.get_by_commission_asset("OPC") is op
+    assert index.get_by_commission_asset("EUR") is eur
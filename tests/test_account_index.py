@@ -0,0 +1,70 @@
+from types import SimpleNamespace
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from backends.firefly.account_index import AccountIndex
+
+
+def account(name, account_type, currency_code, currency_symbol, notes):
+    return SimpleNamespace(attributes=SimpleNamespace(name=name, type=account_type, currency_code=currency_code,
+                                                      currency_symbol=currency_symbol, notes=notes))
+
+
+accounts = [
+    account("BTC wallet", "asset", "BTC", "₿", "crypto-trades-firefly-iii:binance"),
+    account("ETH wallet", "asset", "ETH", "Ξ", "crypto-trades-firefly-iii:binance"),
+    account("ETH private", "asset", "ETH", "Ξ", None),
+    account("Fees", "expense", "EUR", "€", "crypto-trades-firefly-iii:binance"),
+]
+
+
+def test_lookups_are_served_from_one_listing():
+    listings = []
+
+    def load_accounts():
+        listings.append(1)
+        return accounts
+
+    index = AccountIndex(load_accounts, ttl_seconds=600)
+    assert index.find("asset", "crypto-trades-firefly-iii:binance", "BTC").attributes.name == "BTC wallet"
+    assert index.find("asset", "crypto-trades-firefly-iii:binance", "Ξ").attributes.name == "ETH wallet"
+    assert index.find("expense", "crypto-trades-firefly-iii:binance").attributes.name == "Fees"
+    assert index.find("asset", "crypto-trades-firefly-iii:binance", "BTC").attributes.name == "BTC wallet"
+    assert index.find("asset", "crypto-trades-firefly-iii:kraken", "BTC") is None
+    assert len(listings) == 1
+    assert index.get_stats() == {"loads": 1, "hits": 1, "misses": 4}
+
+
+def test_invalidate_reloads_accounts():
+    listings = []
+
+    def load_accounts():
+        listings.append(1)
+        return accounts
+
+    index = AccountIndex(load_accounts, ttl_seconds=600)
+    index.find("asset", "crypto-trades-firefly-iii:binance", "BTC")
+    index.invalidate()
+    index.find("asset", "crypto-trades-firefly-iii:binance", "BTC")
+    assert len(listings) == 2
+
+
+def test_memoized_values_live_until_the_next_listing():
+    computations = []
+
+    def compute():
+        computations.append(1)
+        return tuple(account.attributes.currency_code for account in index.find_all("asset", "crypto-trades-firefly-iii:binance"))
+
+    index = AccountIndex(lambda: accounts, ttl_seconds=600)
+    assert index.memoize("symbols", compute) == ("BTC", "ETH")
+    assert index.memoize("symbols", compute) == ("BTC", "ETH")
+    assert len(computations) == 1
+    assert index.saved_calls == 1
+
+    index.invalidate()
+    index.memoize("symbols", compute)
+    assert len(computations) == 2
+    assert index.saved_calls == 0
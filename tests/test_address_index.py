@@ -0,0 +1,31 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from backends.firefly.address_index import AddressIndex
+
+
+def get_mapping():
+    return {
+        "Ledger BTC": {"addresses": {"a1", "a2"}, "account": "ledger", "code": "BTC"},
+        "Trezor BTC": {"addresses": {"a2", "a3"}, "account": "trezor", "code": "BTC"},
+        "Neo wallet": {"addresses": {"n1"}, "account": "neo", "code": "NEO"},
+    }
+
+
+def test_index_finds_account_of_any_ledger_address():
+    index = AddressIndex(get_mapping())
+
+    assert index.find(["x", "a3"], ("BTC", "₿"))["account"] == "trezor"
+    assert index.find(["n1"], ("NEO", None))["account"] == "neo"
+    assert index.find(["x", "y"], ("BTC", None)) is None
+    assert len(index) == 4
+
+
+def test_index_keeps_first_matching_account_and_checks_currency():
+    index = AddressIndex(get_mapping())
+
+    # a3 only belongs to the second account, but a2 belongs to the first one as well
+    assert index.find(["a3", "a2"], ("BTC", None))["account"] == "ledger"
+    assert index.find(["a1", "n1"], ("NEO", None))["account"] == "neo"
+    assert index.find(["a1"], ("ETH", "ETH")) is None
@@ -1,5 +1,6 @@
 from unittest.mock import patch, MagicMock
 from datetime import datetime
+from decimal import Decimal
 
 import sys
 import os
@@ -21,7 +22,7 @@ def test_binance_config_init():
 def test_get_interest_data_from_binance_data():
     binance_data = {'interest': '0.5', 'asset': 'BTC', 'time': str(int(datetime.now().timestamp() * 1000))}
     result = binance.get_interest_data_from_data(binance_data, 'LENDING', 'DAILY')
-    assert result.amount == '0.5'
+    assert result.amount == Decimal('0.5')
     assert result.currency == 'BTC'
     assert result.type == 'LENDING'
     assert result.due == 'DAILY'
@@ -34,3 +35,94 @@ def test_binance_client_connect(mock_client):
     mock_client.return_value = mock_instance
     client = binance.Client()
     assert client.get_account_status()['data'] == 'Normal' 
+
+
+def create_client_class(mock_client, monkeypatch, state_dir):
+    monkeypatch.setenv('SYNC_STATE_DIR', str(state_dir))
+    mock_instance = MagicMock()
+    mock_instance.get_account_status.return_value = {'data': 'Normal'}
+    mock_instance.response.headers = {'X-MBX-USED-WEIGHT-1M': '40'}
+    mock_client.return_value = mock_instance
+    return binance.ClientClass(), mock_instance
+
+
+def create_trade(trade_id, time, symbol='BTCEUR'):
+    return {'id': trade_id, 'symbol': symbol, 'time': time, 'isBuyer': True, 'qty': '1', 'quoteQty': '2',
+            'commission': '0.1', 'commissionAsset': 'BNB'}
+
+
+@patch('backends.exchanges.impls.binance.Client')
+def test_get_trades_keeps_trading_pair_order(mock_client, monkeypatch, tmp_path):
+    client, mock_instance = create_client_class(mock_client, monkeypatch, tmp_path)
+    client.config.max_in_flight = 4
+    mock_instance.get_my_trades.side_effect = lambda symbol, **kwargs: [create_trade(1, 1000, symbol)]
+
+    pairs = [binance.TradingPair('BTC', 'EUR'), binance.TradingPair('ETH', 'BTC'), binance.TradingPair('BNB', 'EUR')]
+    trades = client.get_trades(0, 60 * 60 * 1000, pairs)
+
+    assert [trade.trading_pair.security + trade.trading_pair.currency for trade in trades] == ['BTCEUR', 'ETHBTC', 'BNBEUR']
+    assert client.rate_limiter.get_stats()['get_my_trades']['weight'] >= 3 * binance.my_trades_weight
+
+
+@patch('backends.exchanges.impls.binance.Client')
+def test_trade_history_is_walked_by_id_and_resumed_from_cursor(mock_client, monkeypatch, tmp_path):
+    client, mock_instance = create_client_class(mock_client, monkeypatch, tmp_path)
+    history = [create_trade(trade_id, 1000 + trade_id) for trade_id in range(2500)]
+
+    def get_my_trades(symbol, fromId, limit):
+        return [trade for trade in history if trade.get('id') >= fromId][:limit]
+    mock_instance.get_my_trades.side_effect = get_my_trades
+
+    pair = binance.TradingPair('BTC', 'EUR')
+    ten_days = 10 * 24 * 60 * 60 * 1000
+    trades = client.get_trades(0, ten_days, [pair])
+    assert [trade.id for trade in trades] == list(range(2500))
+    assert [call.kwargs.get('fromId') for call in mock_instance.get_my_trades.call_args_list] == [0, 1000, 2000]
+
+    client.commit_cursors()
+
+    # the cursor is only moved once the trades were stored
+    history.append(create_trade(2500, 5000))
+    for _ in range(2):
+        trades = client.get_trades(4000, ten_days, [pair])
+        assert [trade.id for trade in trades] == [2500]
+        assert mock_instance.get_my_trades.call_args_list[-1].kwargs.get('fromId') == 2500
+    client.commit_cursors()
+
+    history.append(create_trade(2501, 20000))
+    trades = client.get_trades(10000, ten_days, [pair])
+    assert [trade.id for trade in trades] == [2501]
+    assert mock_instance.get_my_trades.call_args_list[-1].kwargs.get('fromId') == 2501
+
+
+@patch('backends.exchanges.impls.binance.Client')
+def test_trade_cursor_ahead_of_the_interval_is_ignored(mock_client, monkeypatch, tmp_path):
+    client, mock_instance = create_client_class(mock_client, monkeypatch, tmp_path)
+    history = [create_trade(trade_id, 1000 + trade_id) for trade_id in range(10)]
+    mock_instance.get_my_trades.side_effect = \
+        lambda symbol, fromId, limit: [trade for trade in history if trade.get('id') >= fromId][:limit]
+
+    pair = binance.TradingPair('BTC', 'EUR')
+    ten_days = 10 * 24 * 60 * 60 * 1000
+    client.get_trades(1005, ten_days, [pair])
+    client.commit_cursors()
+
+    # a backfill from an earlier begin walks the history from the first trade again
+    trades = client.get_trades(0, ten_days, [pair])
+    assert [trade.id for trade in trades] == list(range(10))
+
+
+@patch('backends.exchanges.impls.binance.Client')
+def test_deposit_history_splits_full_windows_and_deduplicates(mock_client, monkeypatch, tmp_path):
+    client, mock_instance = create_client_class(mock_client, monkeypatch, tmp_path)
+    deposits = [{'txId': 'tx' + str(i), 'amount': '1', 'asset': 'BTC', 'insertTime': 1000 + i, 'address': 'a'}
+                for i in range(1500)]
+    deposits.append(dict(deposits[0]))
+
+    def get_deposit_history(startTime, endTime, limit):
+        return [deposit for deposit in deposits if startTime <= deposit.get('insertTime') <= endTime][:limit]
+    mock_instance.get_deposit_history.side_effect = get_deposit_history
+
+    result = client.get_deposits(0, 10 * 24 * 60 * 60 * 1000)
+
+    assert [deposit.transaction_id for deposit in result] == ['tx' + str(i) for i in range(1500)]
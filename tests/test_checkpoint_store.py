@@ -0,0 +1,33 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from storage.checkpoint_store import CheckpointStore, STREAM_TRADES, STREAM_DEPOSITS
+
+
+def test_checkpoint_survives_reopen(tmp_path):
+    path = str(tmp_path / "checkpoints.sqlite")
+    store = CheckpointStore(path)
+    store.commit("Binance", STREAM_TRADES, 1000)
+    store.close()
+
+    reopened = CheckpointStore(path)
+    assert reopened.get("Binance", STREAM_TRADES) == 1000
+    assert reopened.get("Crypto.com", STREAM_TRADES) is None
+
+
+def test_checkpoint_never_moves_backwards(tmp_path):
+    store = CheckpointStore(str(tmp_path / "checkpoints.sqlite"))
+    store.commit("Binance", STREAM_TRADES, 2000)
+    store.commit("Binance", STREAM_TRADES, 1000)
+    assert store.get("Binance", STREAM_TRADES) == 2000
+
+
+def test_resume_timestamp_requires_all_streams(tmp_path):
+    store = CheckpointStore(str(tmp_path / "checkpoints.sqlite"))
+    streams = [STREAM_TRADES, STREAM_DEPOSITS]
+    store.commit("Binance", STREAM_TRADES, 2000)
+    assert store.get_resume_timestamp("Binance", streams) is None
+
+    store.commit("Binance", STREAM_DEPOSITS, 1500)
+    assert store.get_resume_timestamp("Binance", streams) == 1500
@@ -0,0 +1,25 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from storage.dedup_ledger import DedupLedger, RECORD_TRADE, RECORD_COMMISSION
+
+
+def test_ledger_keys_on_exchange_kind_and_external_id(tmp_path):
+    ledger = DedupLedger(str(tmp_path / "dedup_ledger.sqlite"))
+    ledger.add("Binance", RECORD_TRADE, 42)
+
+    assert ledger.contains("Binance", RECORD_TRADE, "42")
+    assert ledger.contains("binance", RECORD_TRADE, 42)
+    assert not ledger.contains("Binance", RECORD_COMMISSION, 42)
+    assert not ledger.contains("Crypto.com", RECORD_TRADE, 42)
+
+
+def test_ledger_ignores_records_without_external_id(tmp_path):
+    ledger = DedupLedger(str(tmp_path / "dedup_ledger.sqlite"))
+    ledger.add_many([("Binance", RECORD_TRADE, None), ("Binance", RECORD_TRADE, ""), ("Binance", RECORD_TRADE, 1)])
+
+    assert ledger.count("Binance") == 1
+    assert not ledger.contains("Binance", RECORD_TRADE, None)
+    ledger.clear("Binance")
+    assert ledger.count("Binance") == 0
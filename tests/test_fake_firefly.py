@@ -0,0 +1,103 @@
+import sys
+import os
+import json
+import urllib.error
+import urllib.request
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+import pytest
+
+from support.fake_firefly import FakeFireflyServer
+
+
+def request(server, method, path, body=None):
+    data = json.dumps(body).encode('utf-8') if body is not None else None
+    http_request = urllib.request.Request(server.url + path, data=data, method=method,
+                                          headers={"Authorization": "Bearer token", "Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(http_request) as response:
+            payload = response.read()
+            return response.status, json.loads(payload) if payload else None, response.headers
+    except urllib.error.HTTPError as e:
+        payload = e.read()
+        return e.code, json.loads(payload) if payload else None, e.headers
+
+
+def create_transaction(description, source_id, destination_id):
+    return {"error_if_duplicate_hash": True, "apply_rules": False, "transactions": [{
+        "type": "transfer", "date": "2021-05-01T10:00:00+00:00", "amount": "1.5", "description": description,
+        "source_id": source_id, "destination_id": destination_id, "notes": "crypto-trades-firefly-iii:binance",
+        "external_id": description}]}
+
+
+@pytest.fixture
+def server():
+    with FakeFireflyServer(access_token="token") as fake_server:
+        yield fake_server
+
+
+def test_accounts_are_paginated_and_filtered_by_type(server):
+    for i in range(5):
+        server.firefly.add_account("Binance BTC " + str(i), currency_code="BTC", currency_symbol="₿")
+    server.firefly.add_account("Binance fees", type="expense")
+
+    status, page, _ = request(server, "GET", "/api/v1/accounts?type=asset&limit=2&page=3")
+    assert status == 200
+    assert page["meta"]["pagination"]["total_pages"] == 3
+    assert [account["attributes"]["name"] for account in page["data"]] == ["Binance BTC 4"]
+
+    _, page, _ = request(server, "GET", "/api/v1/accounts?type=expense")
+    assert [account["attributes"]["name"] for account in page["data"]] == ["Binance fees"]
+
+
+def test_duplicate_hash_is_rejected_until_deleted(server):
+    source = server.firefly.add_account("Binance EUR")
+    destination = server.firefly.add_account("Binance BTC", currency_code="BTC")
+    transaction = create_transaction("trade 1", source["id"], destination["id"])
+
+    status, created, _ = request(server, "POST", "/api/v1/transactions", transaction)
+    assert status == 200
+    assert created["data"]["attributes"]["transactions"][0]["source_name"] == "Binance EUR"
+
+    status, error, _ = request(server, "POST", "/api/v1/transactions", transaction)
+    assert status == 422
+    assert "Duplicate of transaction #" + created["data"]["id"] in json.dumps(error)
+
+    status, _, _ = request(server, "DELETE", "/api/v1/transactions/" + created["data"]["id"])
+    assert status == 204
+    status, _, _ = request(server, "POST", "/api/v1/transactions", transaction)
+    assert status == 200
+
+
+def test_transactions_are_listed_and_searched(server):
+    source = server.firefly.add_account("Binance EUR")
+    destination = server.firefly.add_account("Binance BTC", currency_code="BTC")
+    for i in range(3):
+        request(server, "POST", "/api/v1/transactions", create_transaction("trade " + str(i), source["id"], destination["id"]))
+
+    _, page, _ = request(server, "GET", "/api/v1/transactions?type=all&limit=2&page=2")
+    assert page["meta"]["pagination"]["total"] == 3
+    assert len(page["data"]) == 1
+
+    _, page, _ = request(server, "GET", "/api/v1/search/transactions?query=external_id_is:%22trade%201%22%20notes_contains:binance")
+    assert [group["attributes"]["transactions"][0]["description"] for group in page["data"]] == ["trade 1"]
+
+
+def test_errors_are_injected(server):
+    server.fail_next(429, retry_after=3)
+    status, _, headers = request(server, "GET", "/api/v1/about")
+    assert status == 429
+    assert headers.get("Retry-After") == "3"
+
+    status, about, _ = request(server, "GET", "/api/v1/about")
+    assert status == 200
+    assert about["data"]["version"]
+    assert server.requests["GET /api/v1/about"] == 2
+
+
+def test_requests_without_token_are_rejected(server):
+    http_request = urllib.request.Request(server.url + "/api/v1/about")
+    with pytest.raises(urllib.error.HTTPError) as error:
+        urllib.request.urlopen(http_request)
+    assert error.value.code == 401
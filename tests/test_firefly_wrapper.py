@@ -0,0 +1,79 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+import pytest
+
+pytest.importorskip('firefly_iii_client')
+
+from support.importer import connected_to_fake_firefly, add_exchange_accounts
+from model.transaction import TradeData, TradingPair, TransactionType
+from storage.dedup_ledger import DedupLedger, RECORD_TRADE, RECORD_COMMISSION
+
+
+@pytest.fixture
+def firefly(monkeypatch, tmp_path):
+    with connected_to_fake_firefly(monkeypatch, tmp_path) as server:
+        from importer.sync_logic import SyncLogic
+        sync_logic = SyncLogic('Binance')
+        add_exchange_accounts(server, 'Binance', sync_logic.firefly.get_acc_fund_key(), ('BTC', 'EUR', 'BNB'))
+        assert sync_logic.firefly.connect()
+        yield server, sync_logic
+
+
+def create_trade(trade_id, trading_pair=None, commission_amount='0.1'):
+    return TradeData(trading_platform='Binance', commission_amount=commission_amount, commission_asset='BNB',
+                     currency_amount='20000', security_amount='0.5', trading_pair=trading_pair or TradingPair('BTC', 'EUR'),
+                     type=TransactionType.BUY, id=trade_id, time=1622505600000 + trade_id)
+
+
+def test_trades_are_written_and_duplicates_are_reported(firefly):
+    server, sync_logic = firefly
+    wrapper = sync_logic.firefly
+    pairs = [TradingPair('BTC', 'EUR'), TradingPair('BNB', 'EUR')]
+    collections = wrapper.get_firefly_account_collections_for_pairs(pairs)
+
+    for trade_id in (1, 2):
+        wrapper.write_new_transaction(sync_logic.map_trade_to_transaction_collection(create_trade(trade_id), collections))
+    assert wrapper.flush_writes() == []
+    assert wrapper.writer.get_stats().get('created') == 4
+    assert len(server.firefly.groups) == 4
+
+    # the stand-in answers a trade stored twice with the 422 of Firefly III, its commission is not written again
+    wrapper.writer.reset_stats()
+    wrapper.write_new_transaction(sync_logic.map_trade_to_transaction_collection(create_trade(1), collections))
+    assert wrapper.flush_writes() == []
+    stats = wrapper.writer.get_stats()
+    assert stats.get('duplicate') == 1
+    assert stats.get('skipped') == 1
+    assert len(server.firefly.groups) == 4
+
+
+def test_dedup_ledger_keeps_trade_ids_of_different_pairs_apart(firefly, tmp_path):
+    server, sync_logic = firefly
+    wrapper = sync_logic.firefly
+    wrapper.dedup_ledger = DedupLedger(str(tmp_path / 'dedup_ledger.sqlite'))
+    pairs = [TradingPair('BTC', 'EUR'), TradingPair('BNB', 'EUR')]
+    collections = wrapper.get_firefly_account_collections_for_pairs(pairs)
+
+    # both pairs have a trade #1, the second one is written as well
+    trades = [create_trade(1, pair, commission_amount) for pair, commission_amount in zip(pairs, ('0.1', '0.2'))]
+    for trade in trades:
+        wrapper.write_new_transaction(sync_logic.map_trade_to_transaction_collection(trade, collections))
+    assert wrapper.flush_writes() == []
+    assert wrapper.writer.get_stats().get('created') == 4
+    assert len(server.firefly.groups) == 4
+
+    # the ledger rebuilt from Firefly III uses the same keys
+    wrapper.dedup_ledger.clear('Binance')
+    assert wrapper.rebuild_dedup_ledger() == 4
+    for ticker in ('BTCEUR', 'BNBEUR'):
+        assert wrapper.dedup_ledger.contains('Binance', RECORD_TRADE, ticker + ':1')
+        assert wrapper.dedup_ledger.contains('Binance', RECORD_COMMISSION, ticker + ':1')
+
+    for trade in trades:
+        wrapper.write_new_transaction(sync_logic.map_trade_to_transaction_collection(trade, collections))
+    assert wrapper.flush_writes() == []
+    assert wrapper.known_records_skipped == 2
+    assert len(server.firefly.groups) == 4
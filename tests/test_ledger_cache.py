@@ -0,0 +1,44 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from model.ledger_transaction import LedgerTransaction
+from storage.ledger_cache import LedgerCache, KIND_TRANSACTION, KIND_ADDRESSES
+
+
+def test_cache_keeps_confirmed_transactions_only(tmp_path):
+    cache = LedgerCache(str(tmp_path / "ledger_cache.sqlite"), max_entries=100)
+    cache.put_transactions("Bitcoin", {
+        "a": LedgerTransaction("a", ["in1"], ["out1", "out2"]),
+        "b": LedgerTransaction("b", ["in2"], ["out3"], confirmed=False),
+    })
+
+    result = cache.get_transactions("Bitcoin", ["a", "b", "a"])
+
+    assert list(result.keys()) == ["a"]
+    assert result["a"].ins == ["in1"] and result["a"].outs == ["out1", "out2"]
+    assert cache.get_transaction("Neo", "a") is None
+    assert cache.get_stats()[KIND_TRANSACTION] == {"hit": 1, "miss": 2}
+
+
+def test_cache_evicts_least_recently_used_entries(tmp_path):
+    cache = LedgerCache(str(tmp_path / "ledger_cache.sqlite"), max_entries=2)
+    cache.put_transactions("Bitcoin", {"a": LedgerTransaction("a", [], [])})
+    cache.put_transactions("Bitcoin", {"b": LedgerTransaction("b", [], [])})
+    cache.get_transaction("Bitcoin", "a")
+    cache.put_transactions("Bitcoin", {"c": LedgerTransaction("c", [], [])})
+
+    assert set(cache.get_transactions("Bitcoin", ["a", "b", "c"]).keys()) == {"a", "c"}
+    assert cache.get_stats()[KIND_TRANSACTION]["evicted"] == 1
+
+
+def test_cache_keeps_address_sets_with_their_offset(tmp_path):
+    path = str(tmp_path / "ledger_cache.sqlite")
+    cache = LedgerCache(path, max_entries=100)
+    assert cache.get_addresses("Bitcoin", "xpub1") == (set(), 0)
+
+    cache.put_addresses("Bitcoin", "xpub1", {"addr1", "addr2"}, 120)
+    cache.close()
+
+    assert LedgerCache(path, max_entries=100).get_addresses("bitcoin", "xpub1") == ({"addr1", "addr2"}, 120)
+    assert cache.get_stats()[KIND_ADDRESSES] == {"miss": 1}
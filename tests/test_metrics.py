@@ -0,0 +1,54 @@
+import sys
+import os
+import urllib.request
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+import metrics
+
+
+def test_counter_and_timer_are_rendered_in_prometheus_format():
+    registry = metrics.Registry()
+    records = registry.counter('test_records_total', 'Records.')
+    step_seconds = registry.timer('test_step_seconds', 'Steps.', buckets=(0.1, 1.0))
+    records.inc(3, exchange="Binance", outcome="fetched")
+    records.inc(exchange="Binance", outcome="fetched")
+    step_seconds.observe(0.5, step="fetch")
+    step_seconds.observe(2.0, step="fetch")
+
+    text = registry.render()
+    assert '# TYPE test_records_total counter' in text
+    assert 'test_records_total{exchange="Binance",outcome="fetched"} 4' in text
+    assert '# TYPE test_step_seconds histogram' in text
+    assert 'test_step_seconds_bucket{step="fetch",le="0.1"} 0' in text
+    assert 'test_step_seconds_bucket{step="fetch",le="1.0"} 1' in text
+    assert 'test_step_seconds_bucket{step="fetch",le="+Inf"} 2' in text
+    assert 'test_step_seconds_count{step="fetch"} 2' in text
+    assert 'test_step_seconds_sum{step="fetch"} 2.5' in text
+
+
+def test_timer_context_manager_records_duration():
+    registry = metrics.Registry()
+    step_seconds = registry.timer('test_context_seconds', 'Steps.')
+    with step_seconds.time(step="write"):
+        pass
+    count, total = step_seconds.get(step="write")
+    assert count == 1
+    assert total >= 0
+
+
+def test_label_values_are_escaped():
+    registry = metrics.Registry()
+    registry.counter('test_escaped_total', 'Escaped.').inc(endpoint='say "hi"\n')
+    assert 'test_escaped_total{endpoint="say \\"hi\\"\\n"} 1' in registry.render()
+
+
+def test_metrics_endpoint_serves_the_registry():
+    metrics.records_total.inc(exchange="Test", kind="trade", outcome="created")
+    server = metrics.start_http_server(0)
+    try:
+        with urllib.request.urlopen("http://127.0.0.1:" + str(server.server_address[1]) + "/metrics") as response:
+            body = response.read().decode('utf-8')
+        assert 'sync_records_total{exchange="Test",kind="trade",outcome="created"}' in body
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,30 @@
+from types import SimpleNamespace
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from backends.firefly.pagination import paginate
+
+
+def fake_list_endpoint(items, calls):
+    def list_function(page, limit=50, **filters):
+        calls.append(dict(page=page, limit=limit, **filters))
+        total_pages = max((len(items) + limit - 1) // limit, 1)
+        data = items[(page - 1) * limit:page * limit]
+        return SimpleNamespace(data=data, meta=SimpleNamespace(pagination=SimpleNamespace(total_pages=total_pages)))
+    return list_function
+
+
+def test_paginate_streams_every_page():
+    calls = []
+    result = list(paginate(fake_list_endpoint(list(range(120)), calls), limit=50, type='asset'))
+    assert result == list(range(120))
+    assert [call.get('page') for call in calls] == [1, 2, 3]
+    assert all(call.get('type') == 'asset' and call.get('limit') == 50 for call in calls)
+
+
+def test_paginate_skips_unset_filters_and_stops_on_empty_result():
+    calls = []
+    assert list(paginate(fake_list_endpoint([], calls), type=None)) == []
+    assert calls == [{'page': 1, 'limit': 50}]
@@ -0,0 +1,69 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from backends.plugin_registry import PluginRegistry, read_plugin_metadata
+
+
+class FakeModuleClass(object):
+    pass
+
+
+def write_package(tmp_path, package_name, modules):
+    impls_dir = tmp_path / package_name / "impls"
+    impls_dir.mkdir(parents=True)
+    (tmp_path / package_name / "__init__.py").write_text("")
+    (impls_dir / "__init__.py").write_text("")
+    for module_name, source in modules.items():
+        (impls_dir / (module_name + ".py")).write_text(source)
+    sys.path.insert(0, str(tmp_path))
+    return str(tmp_path / package_name)
+
+
+plugin_source = """
+from test_plugin_registry import FakeModuleClass
+
+plugin_required_env = ['FAKE_PLUGIN_KEY']
+
+
+class EnabledModule(FakeModuleClass):
+    @staticmethod
+    def get_instance():
+        return EnabledModule()
+"""
+
+
+def test_registry_imports_only_enabled_plugins(tmp_path, monkeypatch):
+    monkeypatch.setenv("FAKE_PLUGIN_KEY", "key")
+    monkeypatch.delenv("FAKE_PLUGIN_FLAG", raising=False)
+    package_dir = write_package(tmp_path, "fake_plugins_enabled", {
+        "enabled": plugin_source,
+        "disabled": "plugin_enabled_env = 'FAKE_PLUGIN_FLAG'\nraise ImportError('must not be imported')\n",
+        "broken": "raise ImportError('missing client library')\n",
+    })
+    registry = PluginRegistry("fake_plugins_enabled", package_dir, FakeModuleClass)
+
+    instances = registry.get_instances()
+
+    assert [type(instance).__name__ for instance in instances] == ["EnabledModule"]
+    assert registry.get_instances() is instances
+    assert {name: outcome for name, (outcome, _) in registry.timings.items()} == \
+           {"enabled": "imported", "disabled": "disabled", "broken": "failed"}
+    assert "fake_plugins_enabled.impls.disabled" not in sys.modules
+
+
+def test_metadata_is_read_without_importing(tmp_path, monkeypatch):
+    path = tmp_path / "plugin.py"
+    path.write_text("import not_installed\nplugin_required_env = ['A', 'B']\nplugin_enabled_env = 'C'\n")
+    monkeypatch.setenv("A", "1")
+    monkeypatch.setenv("B", "1")
+    monkeypatch.setenv("C", "yes")
+
+    metadata = read_plugin_metadata(str(path))
+
+    assert metadata.required_env == ['A', 'B'] and metadata.enabled_env == 'C'
+    assert metadata.is_enabled()
+    monkeypatch.delenv("B")
+    assert not metadata.is_enabled()
+    path.write_text("name = 'no metadata'\n")
+    assert read_plugin_metadata(str(path)) is None
@@ -0,0 +1,28 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from backends.exchanges import product_index
+
+
+def test_match_returns_pairs_of_known_symbols_in_symbol_order():
+    index = product_index.ProductIndex([("BTC", "EUR"), ("ETH", "BTC"), ("ETH", "EUR"), ("XRP", "EUR"), ("BTC", "USDT")])
+    pairs = index.match(["EUR", "ETH", "BTC", "€"])
+    assert [(pair.security, pair.currency) for pair in pairs] == [("ETH", "EUR"), ("ETH", "BTC"), ("BTC", "EUR")]
+
+
+def test_products_are_cached_on_disk(tmp_path, monkeypatch):
+    monkeypatch.setenv('SYNC_STATE_DIR', str(tmp_path))
+    fetches = []
+
+    def fetch_products():
+        fetches.append(1)
+        return [("BTC", "EUR")]
+
+    product_index.load_product_index("Crypto.com", fetch_products, ttl_seconds=60)
+    index = product_index.load_product_index("Crypto.com", fetch_products, ttl_seconds=60)
+    assert index.get_products() == [("BTC", "EUR")]
+    assert len(fetches) == 1
+
+    product_index.load_product_index("Crypto.com", fetch_products, ttl_seconds=-1)
+    assert len(fetches) == 2
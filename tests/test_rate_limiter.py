@@ -0,0 +1,136 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+import threading
+
+import pytest
+
+from backends.exchanges.exchange_interface import ExchangeRateLimitException
+from backends.exchanges.rate_limiter import RateLimiter
+import metrics
+
+
+class FakeClock(object):
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class FakeResponse(object):
+
+    def __init__(self, headers):
+        self.headers = headers
+
+
+class RateLimitedError(Exception):
+
+    def __init__(self, status_code, retry_after=None):
+        super().__init__("rate limited")
+        self.status_code = status_code
+        self.response = FakeResponse({} if retry_after is None else {'Retry-After': str(retry_after)})
+
+
+def create_rate_limiter(clock, capacity=60, **kwargs):
+    return RateLimiter("Test", capacity, period_seconds=60, time_function=clock.time, sleep_function=clock.sleep, **kwargs)
+
+
+def test_bucket_waits_for_refill_when_empty():
+    clock = FakeClock()
+    rate_limiter = create_rate_limiter(clock)
+    rate_limiter.acquire("trades", 60)
+    assert clock.sleeps == []
+
+    rate_limiter.acquire("trades", 30)
+    assert clock.sleeps == [30.0]
+    assert rate_limiter.get_stats()["trades"]["weight"] == 90
+
+
+def test_server_weight_header_drains_bucket():
+    clock = FakeClock()
+    rate_limiter = create_rate_limiter(clock, weight_headers=['X-MBX-USED-WEIGHT-1M'])
+    rate_limiter.call("trades", 1, lambda: [], headers_function=lambda: {'X-MBX-USED-WEIGHT-1M': '60'})
+    rate_limiter.acquire("trades", 10)
+    assert clock.sleeps == [10.0]
+
+
+def test_retry_after_is_honored_and_call_retried():
+    clock = FakeClock()
+    rate_limiter = create_rate_limiter(clock)
+    responses = [RateLimitedError(429, retry_after=7), ["trade"]]
+
+    def fetch():
+        response = responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    assert rate_limiter.call("trades", 1, fetch) == ["trade"]
+    assert clock.sleeps == [7.0]
+    stats = rate_limiter.get_stats()["trades"]
+    assert stats["calls"] == 2
+    assert stats["rate_limited"] == 1
+    assert stats["retries"] == 1
+
+
+def test_backoff_gives_up_after_max_retries():
+    clock = FakeClock()
+    rate_limiter = create_rate_limiter(clock, max_retries=2, backoff_seconds=1)
+
+    def fetch():
+        raise RateLimitedError(418)
+
+    with pytest.raises(ExchangeRateLimitException):
+        rate_limiter.call("trades", 1, fetch)
+    assert len(clock.sleeps) == 2
+    assert 0.5 <= clock.sleeps[0] <= 1
+    assert 1 <= clock.sleeps[1] <= 2
+
+
+def test_other_errors_are_not_retried():
+    clock = FakeClock()
+    rate_limiter = create_rate_limiter(clock)
+
+    def fetch():
+        raise ValueError("bad request")
+
+    with pytest.raises(ValueError):
+        rate_limiter.call("trades", 1, fetch)
+    assert rate_limiter.get_stats()["trades"]["retries"] == 0
+
+
+def test_stats_of_concurrent_calls_add_up():
+    clock = FakeClock()
+    rate_limiter = create_rate_limiter(clock, capacity=100000)
+
+    def call_many():
+        for _ in range(1000):
+            rate_limiter.call('get_my_trades', 2, lambda: None)
+
+    threads = [threading.Thread(target=call_many) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    stats = rate_limiter.get_stats()['get_my_trades']
+    assert stats['calls'] == 8000
+    assert stats['weight'] == 16000
+
+
+def test_metrics_prefix_keeps_ledger_calls_apart_from_exchange_calls():
+    clock = FakeClock()
+    rate_limiter = create_rate_limiter(clock, metrics_prefix='ledger')
+
+    rate_limiter.call('transaction', 1, lambda: None)
+
+    assert metrics.ledger_request_seconds.get(ledger="Test", endpoint='transaction')[0] == 1
+    assert metrics.exchange_request_seconds.get(exchange="Test", endpoint='transaction')[0] == 0
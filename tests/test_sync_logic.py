@@ -0,0 +1,116 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+import pytest
+
+pytest.importorskip('firefly_iii_client')
+
+from support.importer import connected_to_fake_firefly, add_exchange_accounts
+from backends.exchanges.impls.synthetic import SyntheticClient, SyntheticConfig, get_synthetic_pairs, one_day_ms
+from backends.exchanges.rate_limiter import rate_limiters
+from storage.checkpoint_store import CheckpointStore, STREAM_TRADES, STREAM_DEPOSITS
+from support.fake_firefly import FakeFirefly
+
+history_end = 18800 * one_day_ms
+history_days = 2
+
+
+class FakeApiException(Exception):
+    def __init__(self, status, body=""):
+        self.status = status
+        self.body = body
+        self.headers = {}
+
+
+@pytest.fixture
+def synthetic(monkeypatch, tmp_path):
+    # SyncLogic of the synthetic exchange against the Firefly III stand-in, 3 pairs with 10 trades a day each
+    rate_limiters.clear()
+    exchange_config = SyntheticConfig()
+    exchange_config.enabled = True
+    exchange_config.history_end = history_end
+    exchange_config.history_days = history_days
+    exchange_config.pairs = 3
+    exchange_config.trades_per_day = 10
+    exchange_config.movements_per_day = 0
+    exchange = SyntheticClient(exchange_config)
+
+    with connected_to_fake_firefly(monkeypatch, tmp_path) as server:
+        from importer import sync_logic as sync_logic_module
+        monkeypatch.setattr(sync_logic_module.exchange_interface_factory, 'get_specific_exchange_interface',
+                            lambda trading_platform: exchange)
+        sync_logic = sync_logic_module.SyncLogic('Synthetic')
+        codes = list(dict.fromkeys(code for pair in get_synthetic_pairs(3) for code in (pair.security, pair.currency)))
+        add_exchange_accounts(server, 'Synthetic', sync_logic.firefly.get_acc_fund_key(), codes)
+        assert sync_logic.firefly.connect()
+        yield server, sync_logic
+
+
+def test_failed_trade_writes_keep_the_interval_for_the_next_sync(synthetic):
+    server, sync_logic = synthetic
+    store_transaction = sync_logic.firefly.writer.store_function
+    failures = [FakeApiException(400, "Bad request")]
+
+    def store_failing_once(payload):
+        if failures and payload.transactions[0].description.startswith('Synthetic | BUY'):
+            raise failures.pop(0)
+        store_transaction(payload)
+    sync_logic.firefly.writer.store_function = store_failing_once
+
+    begin = history_end - history_days * one_day_ms
+    sync_logic.interval_processor(begin, history_end, True)
+
+    assert sync_logic.trade_write_errors == 1
+    assert sync_logic.checkpoints.get('Synthetic', STREAM_TRADES) is None
+    assert sync_logic.checkpoints.get('Synthetic', STREAM_DEPOSITS) == history_end
+    assert sync_logic.checkpoints.get_resume_timestamp('Synthetic', sync_logic.streams) is None
+    # every trade and commission but the failed trade (its commission is skipped)
+    assert len(server.firefly.groups) == 2 * 60 - 2
+
+    sync_logic.interval_processor(begin, history_end, False)
+
+    assert sync_logic.trade_write_errors == 0
+    assert sync_logic.checkpoints.get('Synthetic', STREAM_TRADES) == history_end
+    assert len(server.firefly.groups) == 2 * 60
+    stats = sync_logic.firefly.writer.get_stats()
+    # the failed trade and its commission are written, the other trades are answered as duplicates
+    assert stats.get('created') == 2
+    assert stats.get('duplicate') == 59
+    assert stats.get('skipped') == 59
+
+
+def import_twice(server, sync_logic, state_dir):
+    # imports the whole history into an empty Firefly III and then once more, returns the writer stats of both runs
+    # and the trades checkpoint
+    server.firefly = FakeFirefly()
+    codes = list(dict.fromkeys(code for pair in get_synthetic_pairs(3) for code in (pair.security, pair.currency)))
+    add_exchange_accounts(server, 'Synthetic', sync_logic.firefly.get_acc_fund_key(), codes)
+
+    begin = history_end - history_days * one_day_ms
+    results = []
+    for init in (True, False):
+        # without checkpoints, the second run fetches every trade again
+        sync_logic.checkpoints = CheckpointStore(str(state_dir / ('checkpoints-' + str(init) + '.sqlite')))
+        sync_logic.interval_processor(begin, history_end, init)
+        stats = sync_logic.firefly.writer.get_stats()
+        results.append({outcome: stats.get(outcome) for outcome in ('created', 'duplicate', 'error', 'skipped')})
+    return results, sync_logic.checkpoints.get('Synthetic', STREAM_TRADES), len(server.firefly.groups)
+
+
+def test_streamed_trades_match_the_batch_import(synthetic, monkeypatch, tmp_path):
+    import config
+    server, sync_logic = synthetic
+
+    monkeypatch.setattr(config, 'sync_streaming', False)
+    (tmp_path / 'batch').mkdir()
+    batch = import_twice(server, sync_logic, tmp_path / 'batch')
+    monkeypatch.setattr(config, 'sync_streaming', True)
+    monkeypatch.setattr(SyntheticClient, 'get_trades', lambda *args: pytest.fail('trades are not streamed'))
+    (tmp_path / 'stream').mkdir()
+    streamed = import_twice(server, sync_logic, tmp_path / 'stream')
+
+    assert streamed == batch
+    assert batch == ([{'created': 120, 'duplicate': 0, 'error': 0, 'skipped': 0},
+                      {'created': 0, 'duplicate': 60, 'error': 0, 'skipped': 60}], history_end, 120)
@@ -0,0 +1,116 @@
+import sys
+import os
+import threading
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from importer.sync_scheduler import SyncScheduler, ScheduledExchange, get_next_boundary
+
+
+class FakeSyncer(object):
+
+    def __init__(self, release: threading.Event = None):
+        # a syncer with a release event blocks in every sync until it is set
+        self.release = release
+        self.initial_syncs = 0
+        self.syncs = 0
+        self.synced = threading.Event()
+
+    def initial_sync(self):
+        self.initial_syncs += 1
+        if self.release is not None:
+            self.release.wait(5)
+
+    def sync(self):
+        self.syncs += 1
+        self.synced.set()
+        if self.release is not None:
+            self.release.wait(5)
+
+
+class FakeClock(object):
+    # waiting moves the clock forward instead of sleeping
+
+    def __init__(self, scheduler_stop_event: threading.Event = None, now: float = 1000.0):
+        self.now = now
+        self.lock = threading.Lock()
+        self.stop_event = scheduler_stop_event
+
+    def time(self):
+        with self.lock:
+            return self.now
+
+    def wait(self, seconds):
+        with self.lock:
+            self.now += seconds
+        return self.stop_event.is_set()
+
+
+def create_scheduler(interval_seconds):
+    clock = FakeClock()
+    scheduler = SyncScheduler(interval_seconds, time_function=clock.time, wait_function=clock.wait)
+    clock.stop_event = scheduler.stop_event
+    return scheduler, clock
+
+
+def test_next_boundary_is_aligned_to_the_interval():
+    assert get_next_boundary(7200.0, 3600) == 10800
+    assert get_next_boundary(7255.5, 3600) == 10800
+    assert get_next_boundary(10799.9, 3600) == 10800
+
+
+def test_run_status_is_reported():
+    exchange = ScheduledExchange("Binance", FakeSyncer())
+
+    def failing_run():
+        assert exchange.get_status()["running"] is True
+        raise ValueError("boom")
+
+    exchange.run(failing_run)
+    status = exchange.get_status()
+    assert status["runs"] == 1
+    assert status["running"] is False
+    assert status["last_error"] == "boom"
+    assert status["last_duration"] is not None
+
+    exchange.run(lambda: None)
+    assert exchange.get_status()["last_error"] is None
+
+
+def test_slow_exchange_does_not_starve_others():
+    scheduler, clock = create_scheduler(1)
+    release = threading.Event()
+    slow = FakeSyncer(release)
+    fast = FakeSyncer()
+    scheduler.add("Slow", slow)
+    scheduler.add("Fast", fast)
+
+    scheduler.start()
+    try:
+        assert fast.synced.wait(5)
+        assert fast.initial_syncs == 1
+        assert slow.syncs == 0
+        status = scheduler.get_status()
+        assert status["Slow"]["running"] is True
+        assert status["Fast"]["next_run"] is not None
+    finally:
+        scheduler.stop()
+        release.set()
+        scheduler.join()
+
+
+def test_overrun_intervals_are_skipped():
+    scheduler, clock = create_scheduler(10)
+
+    class OverrunningSyncer(FakeSyncer):
+        def sync(self):
+            super().sync()
+            clock.wait(25)
+            scheduler.stop()
+
+    scheduler.add("Binance", OverrunningSyncer())
+    scheduler.start()
+    scheduler.join()
+
+    status = scheduler.get_status()["Binance"]
+    assert status["runs"] == 2
+    assert status["skipped_runs"] == 2
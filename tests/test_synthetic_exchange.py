@@ -0,0 +1,64 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from backends.exchanges.impls.synthetic import SyntheticClient, SyntheticConfig, one_day_ms
+from backends.exchanges.rate_limiter import rate_limiters
+
+
+def create_client(**settings):
+    rate_limiters.clear()
+    config = SyntheticConfig()
+    config.enabled = True
+    config.history_end = 100 * one_day_ms
+    config.history_days = 10
+    config.pairs = 3
+    config.trades_per_day = 50
+    for name, value in settings.items():
+        setattr(config, name, value)
+    return SyntheticClient(config)
+
+
+def test_trades_are_deterministic_and_independent_of_the_interval():
+    client = create_client()
+    pairs = client.get_trading_pairs(['BTC', 'ETH', 'EUR', 'USDT'])
+    assert len(pairs) == 3
+
+    begin = client.config.get_history_begin()
+    trades = client.get_trades(begin, client.config.history_end, pairs)
+    assert len(trades) == 3 * 10 * 50
+
+    first_half = client.get_trades(begin, begin + 5 * one_day_ms + 1234, pairs)
+    second_half = client.get_trades(begin + 5 * one_day_ms + 1234, client.config.history_end, pairs)
+    assert sorted(trade.id for trade in first_half + second_half) == sorted(trade.id for trade in trades)
+
+    same_seed = create_client().get_trades(begin, client.config.history_end, pairs)
+    assert [(trade.id, trade.currency_amount) for trade in same_seed] == [(trade.id, trade.currency_amount) for trade in trades]
+    other_seed = create_client(seed=7).get_trades(begin, client.config.history_end, pairs)
+    assert [trade.currency_amount for trade in other_seed] != [trade.currency_amount for trade in trades]
+
+
+def test_no_records_outside_the_history():
+    client = create_client()
+    pairs = client.get_trading_pairs(['BTC', 'EUR'])
+    assert client.get_trades(0, client.config.get_history_begin(), pairs) == []
+    assert client.get_deposits(client.config.history_end, client.config.history_end + one_day_ms) == []
+
+
+def test_movements_are_generated_per_day():
+    client = create_client(movements_per_day=2)
+    begin = client.config.get_history_begin()
+    deposits = client.get_deposits(begin, client.config.history_end)
+    withdrawals = client.get_withdrawals(begin, client.config.history_end)
+    assert len(deposits) == 20
+    assert len(withdrawals) == 20
+    assert len({deposit.transaction_id for deposit in deposits}) == 20
+
+
+def test_simulated_rate_limits_are_retried():
+    client = create_client(rate_limit_error_rate=0.3, retry_after_seconds=0)
+    pairs = client.get_trading_pairs(['BTC', 'ETH', 'EUR', 'USDT'])
+    trades = client.get_trades(client.config.get_history_begin(), client.config.history_end, pairs)
+    assert len(trades) == 3 * 10 * 50
+    stats = client.rate_limiter.get_stats()
+    assert sum(endpoint["rate_limited"] for endpoint in stats.values()) > 0
@@ -0,0 +1,107 @@
+import sys
+import os
+import threading
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from backends.firefly.transaction_writer import TransactionWriter, WriteStep, WriteOutcome
+
+
+class FakeApiException(Exception):
+    def __init__(self, status, body=""):
+        self.status = status
+        self.body = body
+        self.headers = {}
+
+
+def test_writer_reports_outcomes_and_skips_dependent_steps():
+    stored = []
+
+    def store(payload):
+        if payload == "duplicate-trade":
+            raise FakeApiException(422, '{"message": "Duplicate of transaction #12."}')
+        if payload == "broken":
+            raise FakeApiException(400, "Bad request")
+        stored.append(payload)
+
+    writer = TransactionWriter(store, max_workers=2, max_retries=0)
+    writer.submit([WriteStep("trade #1", "trade"), WriteStep("paid commission #1", "commission")])
+    writer.submit([WriteStep("trade #2", "duplicate-trade"), WriteStep("paid commission #2", "commission-2")])
+    writer.submit([WriteStep("deposit 'x'", "broken")])
+    errors = writer.flush()
+
+    assert [(error.label, error.outcome) for error in errors] == [("deposit 'x'", WriteOutcome.ERROR)]
+    assert sorted(stored) == ["commission", "trade"]
+    stats = writer.get_stats()
+    assert stats.get("records") == 4
+    assert stats.get("created") == 2
+    assert stats.get("duplicate") == 1
+    assert stats.get("skipped") == 1
+    assert writer.flush() == []
+
+
+def test_writer_retries_rate_limited_and_server_errors():
+    failures = [FakeApiException(429), FakeApiException(503)]
+
+    def store(payload):
+        if failures:
+            raise failures.pop(0)
+
+    writer = TransactionWriter(store, max_workers=1, max_retries=3, backoff_seconds=0)
+    results = []
+    writer.submit([WriteStep("trade #1", "trade", results.append)])
+    assert writer.flush() == []
+    [result] = results
+    assert result.outcome == WriteOutcome.CREATED
+    assert result.attempts == 3
+
+
+def test_submit_blocks_while_the_queue_is_full():
+    release = threading.Event()
+    submitted = []
+
+    def store(payload):
+        release.wait(timeout=5)
+
+    writer = TransactionWriter(store, max_workers=1, max_pending=1)
+    writer.submit([WriteStep("trade #1", "trade")])
+
+    def submit_second():
+        writer.submit([WriteStep("trade #2", "trade")])
+        submitted.append(2)
+
+    thread = threading.Thread(target=submit_second)
+    thread.start()
+    thread.join(timeout=0.2)
+    assert submitted == []
+
+    release.set()
+    thread.join(timeout=5)
+    assert submitted == [2]
+    assert writer.flush() == []
+    assert writer.get_stats().get("created") == 2
+
+
+def test_finished_jobs_are_not_kept_until_flush():
+    writer = TransactionWriter(lambda payload: None, max_workers=2)
+    for i in range(50):
+        writer.submit([WriteStep("trade #" + str(i), "trade")])
+    # the done callbacks have run once the workers are shut down
+    writer.close()
+
+    assert len(writer.pending) == 0
+    assert len(writer.errors) == 0
+    assert writer.get_stats().get("created") == 50
+
+
+def test_tracebacks_of_failed_writes_are_only_logged_with_debug(caplog):
+    def store(payload):
+        raise FakeApiException(400, "Bad request")
+
+    for debug in (False, True):
+        caplog.clear()
+        writer = TransactionWriter(store, max_workers=1, max_retries=0, debug=debug)
+        writer.submit([WriteStep("trade #1", "trade")])
+        writer.flush()
+        [record] = [record for record in caplog.records if record.levelname == "ERROR"]
+        assert "trade #1" in record.getMessage() and "Bad request" in record.getMessage()
+        assert bool(record.exc_info) == debug